@@ -1,9 +1,9 @@
-import sqlite3
-
 import dash_mantine_components as dmc
 import pandas as pd
 from dash import dash_table
 
+from utils.db_connection import get_reader
+
 
 def create_data_table(df, id_prefix):
     """Create a styled DataTable component"""
@@ -61,10 +61,7 @@ def create_data_table(df, id_prefix):
 def fetch_agent_data():
     """Fetch agent data from database"""
     try:
-        conn = sqlite3.connect("./src/data/swarm_squad.db")
-        query = "SELECT * FROM agent"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        df = get_reader().read_frame("SELECT * FROM agent")
 
         if df.empty:
             print("Agent table is empty.")
@@ -79,10 +76,7 @@ def fetch_agent_data():
 def fetch_mission_data():
     """Fetch mission data from database"""
     try:
-        conn = sqlite3.connect("./src/data/swarm_squad.db")
-        query = "SELECT * FROM mission"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        df = get_reader().read_frame("SELECT * FROM mission")
 
         if df.empty:
             print("Mission table is empty.")
@@ -97,10 +91,7 @@ def fetch_mission_data():
 def fetch_telemetry_data():
     """Fetch telemetry data from database"""
     try:
-        conn = sqlite3.connect("./src/data/swarm_squad.db")
-        query = "SELECT * FROM telemetry"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        df = get_reader().read_frame("SELECT * FROM telemetry")
 
         if df.empty:
             print("Telemetry table is empty.")
@@ -115,10 +106,7 @@ def fetch_telemetry_data():
 def fetch_system_data():
     """Fetch system data from database"""
     try:
-        conn = sqlite3.connect("./src/data/swarm_squad.db")
-        query = "SELECT * FROM system"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        df = get_reader().read_frame("SELECT * FROM system")
 
         if df.empty:
             print("System table is empty.")
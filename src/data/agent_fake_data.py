@@ -1,9 +1,16 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
 import random
-import sqlite3
 import time
 
 import pandas as pd
 
+from utils.db_connection import get_manager
+
 # Define the columns for the Agent List table
 agent_columns = ["Agent Name", "Agent Type", "Status", "Mode", "Alert Count"]
 
@@ -24,19 +31,13 @@ while True:
         columns=agent_columns,
     )
 
-    # Create a connection to the SQLite database
+    # Write the data to a table in the database over the shared connection
     # If the database does not exist, it will be created
-    conn = sqlite3.connect("./src/data/swarm_squad.db")
-
-    # Write the data to a table in the database
-    agent_df.to_sql("agent", conn, if_exists="replace", index=False)
+    get_manager().upsert_frame(agent_df, "agent")
 
     # Print confirmation message
     print("Agent table updated in the database.")
 
-    # Close the connection to the database
-    conn.close()
-
     # counter += 1
 
     # Pause for half second before the next update
@@ -1,9 +1,16 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
 import random
-import sqlite3
 import time
 
 import pandas as pd
 
+from utils.db_connection import get_manager
+
 # Define the columns for the Mission Details table
 mission_columns = ["Agent Name", "Status", "Mission", "Completion", "Duration"]
 
@@ -40,18 +47,12 @@ while True:
         columns=mission_columns,
     )
 
-    # Create a connection to the SQLite database
+    # Write the data to a table in the database over the shared connection
     # If the database does not exist, it will be created
-    conn = sqlite3.connect("./src/data/swarm_squad.db")
-
-    # Write the data to a table in the database
-    mission_df.to_sql("mission", conn, if_exists="replace", index=False)
+    get_manager().upsert_frame(mission_df, "mission")
 
     # Print confirmation message
     print("Mission table updated in the database.")
 
-    # Close the connection to the database
-    conn.close()
-
     # Pause for half second before the next update
     time.sleep(0.5)
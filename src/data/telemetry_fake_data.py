@@ -1,9 +1,17 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
 import random
-import sqlite3
 import time
 
 import pandas as pd
 
+from utils.db_connection import get_manager
+from utils.telemetry_history import get_history
+
 # Define the columns for the Telemetry Data table
 telemetry_columns = [
     "Agent Name",
@@ -71,18 +79,15 @@ while True:
         columns=telemetry_columns,
     )
 
-    # Create a connection to the SQLite database
+    # Write the data to a table in the database over the shared connection
     # If the database does not exist, it will be created
-    conn = sqlite3.connect("./src/data/swarm_squad.db")
-
-    # Write the data to a table in the database
-    telemetry_df.to_sql("telemetry", conn, if_exists="replace", index=False)
+    get_manager().upsert_frame(telemetry_df, "telemetry")
+    history = get_history()
+    if history is not None:
+        history.append(telemetry_df)
 
     # Print confirmation message
     print("Telemetry table updated in the database.")
 
-    # Close the connection to the database
-    conn.close()
-
     # Pause for half second before the next update
     time.sleep(0.5)
@@ -0,0 +1,96 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import time
+
+import numpy as np
+
+from utils.spatial_hash import SpatialHash, brute_force_pairs
+
+# Boids simulation volume (meters) and the largest rule radius
+BOUNDS = np.array([[0, 100], [0, 100], [0, 45]], dtype=float)
+RADIUS = 20.0
+
+
+def time_query(query, repeats):
+    """
+    Time a neighbor query, consuming every pair it yields
+
+    Parameters:
+        query (callable): Returns a fresh iterator of (i, j, diff, dist) chunks
+        repeats (int): The number of timed repetitions
+
+    Returns:
+        tuple: (best time in seconds, number of pairs found)
+    """
+    best = float("inf")
+    num_pairs = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        num_pairs = sum(len(i) for i, _, _, _ in query())
+        best = min(best, time.perf_counter() - start)
+    return best, num_pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare brute-force and spatial-hash neighbor search for boids"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[50, 100, 200, 400, 800, 1600, 3200, 6400, 12800],
+        help="Flock sizes to benchmark",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--max-brute",
+        type=int,
+        default=12800,
+        help="Skip the brute-force path above this flock size",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    grid = SpatialHash(RADIUS, BOUNDS)
+    crossover = None
+
+    print(
+        f"{'boids':>8} {'brute (ms)':>12} {'grid (ms)':>12} {'speedup':>8} {'pairs':>12}"
+    )
+    for num_boids in args.sizes:
+        positions = rng.random((num_boids, 3)) * (BOUNDS[:, 1] - BOUNDS[:, 0])
+
+        grid_time, num_pairs = time_query(
+            lambda: grid.build(positions).iter_pairs(RADIUS), args.repeats
+        )
+        if num_boids <= args.max_brute:
+            brute_time, _ = time_query(
+                lambda: brute_force_pairs(positions, RADIUS), args.repeats
+            )
+            speedup = brute_time / grid_time
+            if crossover is None and speedup > 1:
+                crossover = num_boids
+            print(
+                f"{num_boids:>8} {brute_time * 1e3:>12.2f} {grid_time * 1e3:>12.2f}"
+                f" {speedup:>8.2f} {num_pairs:>12}"
+            )
+        else:
+            print(
+                f"{num_boids:>8} {'-':>12} {grid_time * 1e3:>12.2f} {'-':>8} {num_pairs:>12}"
+            )
+
+    if crossover is None:
+        print("\nThe spatial hash did not beat brute force at the tested sizes")
+    else:
+        print(f"\nThe spatial hash is faster from {crossover} boids")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.db_connection import ConnectionManager
+from utils.db_write_behind import WriteBehindWriter
+from utils.telemetry_history import TelemetryHistory
+
+TABLE = "telemetry"
+
+
+def telemetry_frame(num_agents, rng):
+    """Return a telemetry table of num_agents agents with random values"""
+    lon = -81.0475 + rng.uniform(-0.003, 0.003, num_agents)
+    lat = 29.1880 + rng.uniform(-0.003, 0.003, num_agents)
+    altitude = rng.uniform(0, 50, num_agents)
+    return pd.DataFrame(
+        {
+            "Agent Name": np.arange(1, num_agents + 1),
+            "Location": [
+                f"{x:.4f}, {y:.4f}, {z}" for x, y, z in zip(lon, lat, altitude)
+            ],
+            "Destination": [f"{x:.4f}, {y:.4f}, 50" for x, y in zip(lon, lat)],
+            "Altitude": altitude,
+            "Pitch": np.full(num_agents, 90.0),
+            "Yaw": rng.uniform(0, 0.01, num_agents),
+            "Roll": rng.uniform(0, 0.01, num_agents),
+            "Airspeed/Velocity": rng.uniform(100, 200, num_agents),
+            "Acceleration": rng.uniform(0, 10, num_agents),
+            "Angular Velocity": rng.uniform(0, 1, num_agents),
+        }
+    )
+
+
+def time_writes(write, frames, repeats):
+    """
+    Time a table write, alternating between frames so every write has work
+
+    Parameters:
+        write (callable): Writes one DataFrame
+        frames (list): The DataFrames written in turn
+        repeats (int): The number of timed repetitions
+
+    Returns:
+        float: The best time in seconds
+    """
+    # The first write creates the table, time the steady state
+    write(frames[-1])
+    best = float("inf")
+    for k in range(repeats):
+        start = time.perf_counter()
+        write(frames[k % len(frames)])
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_ticks(directory, name, frames, ticks, write_behind):
+    """
+    Time the telemetry writes of a run, table and history, as the producer sees them
+
+    Parameters:
+        directory (str): The directory of the databases
+        name (str): The database file prefix
+        frames (list): The DataFrames written in turn, one per tick
+        ticks (int): The number of ticks
+        write_behind (bool): Queue the frames to a WriteBehindWriter instead of
+            writing them in the producer's thread
+
+    Returns:
+        tuple: (producer seconds per tick, total seconds until everything is written)
+    """
+    manager = ConnectionManager(os.path.join(directory, f"{name}.db"))
+    history = TelemetryHistory(os.path.join(directory, f"{name}_history.db"))
+    writer = WriteBehindWriter(manager, history).start() if write_behind else None
+
+    producer = 0.0
+    start = time.perf_counter()
+    for k in range(ticks):
+        tick_start = time.perf_counter()
+        if writer is None:
+            manager.upsert_frame(frames[k % len(frames)], TABLE)
+            history.append(frames[k % len(frames)])
+        else:
+            writer.submit(frames[k % len(frames)], TABLE)
+        producer += time.perf_counter() - tick_start
+    if writer is not None:
+        writer.close()
+    total = time.perf_counter() - start
+    manager.close_all()
+    history.close()
+    return producer / ticks, total
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare rewriting a dashboard table with upserting into it, "
+        "and per-tick writes with write-behind batches"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 1000, 100000],
+        help="Numbers of agents to benchmark",
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--tick-sizes",
+        type=int,
+        nargs="+",
+        default=[10, 1000],
+        help="Numbers of agents of the per-tick and write-behind comparison",
+    )
+    parser.add_argument(
+        "--ticks", type=int, default=200, help="Ticks of the write-behind comparison"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    print(
+        f"{'agents':>8} {'connect (ms)':>13} {'replace (ms)':>13}"
+        f" {'upsert (ms)':>12} {'upsert 1 (ms)':>14} {'speedup':>8}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for num_agents in args.sizes:
+            frame = telemetry_frame(num_agents, rng)
+            changed = telemetry_frame(num_agents, rng)
+            # The same table with a single agent moved
+            moved = frame.copy()
+            moved.loc[0, "Altitude"] += 1.0
+
+            def path(name):
+                return os.path.join(directory, f"{name}_{num_agents}.db")
+
+            def connect_write(df, database=path("connect")):
+                # The original writer: a new connection and table every tick
+                conn = sqlite3.connect(database)
+                df.to_sql(TABLE, conn, if_exists="replace", index=False)
+                conn.close()
+
+            pooled = ConnectionManager(path("replace"))
+            upserts = ConnectionManager(path("upsert"))
+            single = ConnectionManager(path("single"))
+
+            connect_time = time_writes(connect_write, [frame, changed], args.repeats)
+            replace_time = time_writes(
+                lambda df: pooled.write_frame(df, TABLE), [frame, changed], args.repeats
+            )
+            upsert_time = time_writes(
+                lambda df: upserts.upsert_frame(df, TABLE),
+                [frame, changed],
+                args.repeats,
+            )
+            single_time = time_writes(
+                lambda df: single.upsert_frame(df, TABLE), [frame, moved], args.repeats
+            )
+            for manager in (pooled, upserts, single):
+                manager.close_all()
+
+            print(
+                f"{num_agents:>8} {connect_time * 1e3:>13.2f} {replace_time * 1e3:>13.2f}"
+                f" {upsert_time * 1e3:>12.2f} {single_time * 1e3:>14.2f}"
+                f" {replace_time / single_time:>8.2f}"
+            )
+
+        print(
+            f"\n{'agents':>8} {'sync (ms/tick)':>15} {'queued (ms/tick)':>17}"
+            f" {'sync total (s)':>15} {'queued total (s)':>17}"
+        )
+        for num_agents in args.tick_sizes:
+            frames = [telemetry_frame(num_agents, rng) for _ in range(2)]
+            sync_tick, sync_total = time_ticks(
+                directory, f"sync_{num_agents}", frames, args.ticks, False
+            )
+            queued_tick, queued_total = time_ticks(
+                directory, f"queued_{num_agents}", frames, args.ticks, True
+            )
+            print(
+                f"{num_agents:>8} {sync_tick * 1e3:>15.3f} {queued_tick * 1e3:>17.3f}"
+                f" {sync_total:>15.2f} {queued_total:>17.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
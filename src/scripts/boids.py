@@ -5,7 +5,6 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 import matplotlib
-import numpy as np
 
 try:
     matplotlib.use("Qt5Agg")  # Try Qt5Agg first
@@ -14,163 +13,55 @@ except ImportError:
         matplotlib.use("TkAgg")  # Try TkAgg second
     except ImportError:
         matplotlib.use("Agg")  # Fall back to Agg if others fail
-import random
-
 import matplotlib.pyplot as plt
-
-# Write the data to the SQLite database and websocket
-import pandas as pd
 from matplotlib.animation import FuncAnimation
 from matplotlib.widgets import Button, Slider
 
-from utils.db_writer import telemetry_tbl_writer
-from utils.websocket_writer import ws_writer
-
-
-class Boid:
-    def __init__(self, position, velocity):
-        self.position = position
-        self.velocity = velocity
-
-
-class Flock:
-    def __init__(self, num_boids):
-        # Initialize in meters (100m x 100m x 45m space)
-        self.boids = [
-            Boid(np.random.rand(3) * np.array([100, 100, 45]), np.random.rand(3) - 0.5)
-            for _ in range(num_boids)
-        ]
-        # Store reference coordinates for conversion
-        self.ref_lat = 29.189  # center latitude
-        self.ref_lon = -81.050  # center longitude
-        self.min_alt = 30
-        self.max_alt = 100
-
-    def meters_to_latlon(self, position):
-        # Convert meters to lat/lon/alt
-        # Approximate conversion (at equator, 1 degree = 111,111 meters)
-        lat_offset = position[1] / 111111
-        lon_offset = position[0] / (111111 * np.cos(np.radians(self.ref_lat)))
-
-        lat = self.ref_lat + lat_offset
-        lon = self.ref_lon + lon_offset
-        alt = self.min_alt + (position[2] / 45) * (self.max_alt - self.min_alt)
-
-        return np.array([lat, lon, alt])
-
-    def update_boids(self, cohesion_weight, separation_weight, alignment_weight):
-        colors = []
-
-        for boid in self.boids:
-            # Calculate forces from each rule
-            v1 = self.rule1(boid) * cohesion_weight
-            v2 = self.rule2(boid) * separation_weight
-            v3 = self.rule3(boid) * alignment_weight
-            v4 = self.enforce_bounds(boid)
-
-            # Calculate magnitudes of each behavior
-            cohesion_mag = np.linalg.norm(v1)
-            separation_mag = np.linalg.norm(v2)
-            alignment_mag = np.linalg.norm(v3)
-
-            # Determine dominant behavior
-            max_mag = max(cohesion_mag, separation_mag, alignment_mag)
-            if max_mag == cohesion_mag:
-                colors.append("#98C379")  # Green for cohesion
-            elif max_mag == separation_mag:
-                colors.append("#E06C75")  # Red for separation
-            else:
-                colors.append("#E5C07B")  # Yellow for alignment
-
-            boid.velocity += v1 + v2 + v3 + v4
-
-            # Limit velocity (in meters per second)
-            speed = np.linalg.norm(boid.velocity)
-            max_speed = 15.0
-            min_speed = 5.0
-
-            if speed > max_speed:
-                boid.velocity = (boid.velocity / speed) * max_speed
-            elif speed < min_speed:
-                boid.velocity = (boid.velocity / speed) * min_speed
-
-            boid.position += boid.velocity * 0.5
-
-        # Create database entries with converted coordinates
-        data = {
-            "Agent Name": range(1, len(self.boids) + 1),
-            "Location": [
-                f"{pos[1]}, {pos[0]}, {pos[2]}"
-                for pos in [self.meters_to_latlon(boid.position) for boid in self.boids]
-            ],
-            "Destination": [
-                f"{pos[0]}, {pos[1] + random.uniform(0.0001, 0.001)}, 50"
-                for pos in [self.meters_to_latlon(boid.position) for boid in self.boids]
-            ],
-            "Altitude": [
-                self.meters_to_latlon(boid.position)[2] for boid in self.boids
-            ],
-            "Pitch": [45 for _ in self.boids],
-            "Yaw": [0 for _ in self.boids],
-            "Roll": [0 for _ in self.boids],
-            "Airspeed/Velocity": [np.linalg.norm(boid.velocity) for boid in self.boids],
-            "Acceleration": [0 for _ in self.boids],
-            "Angular Velocity": [0 for _ in self.boids],
-        }
-        telemetry_df = pd.DataFrame(data)
-        telemetry_tbl_writer(telemetry_df)
-        ws_writer(data)
-
-        return colors
-
-    def rule1(self, boid):
-        # Cohesion - steer towards center of mass of neighbors
-        neighbors = [
-            other_boid
-            for other_boid in self.boids
-            if other_boid != boid
-            and np.linalg.norm(other_boid.position - boid.position) < 20
-        ]
-        if neighbors:
-            center = np.mean([n.position for n in neighbors], axis=0)
-            return (center - boid.position) * 0.05  # Increased from 0.01 to 0.05
-        return np.zeros(3)
-
-    def rule2(self, boid):
-        # Separation - avoid crowding neighbors
-        separation = np.zeros(3)
-        for other in self.boids:
-            if other != boid:
-                diff = boid.position - other.position
-                dist = np.linalg.norm(diff)
-                if dist < 10:  # 10m minimum separation
-                    separation += diff / (dist * dist)
-        return separation * 0.05  # Increased from 0.01 to 0.05
-
-    def rule3(self, boid):
-        # Alignment - steer towards average heading of neighbors
-        neighbors = [
-            other_boid
-            for other_boid in self.boids
-            if other_boid != boid
-            and np.linalg.norm(other_boid.position - boid.position) < 15
-        ]
-        if neighbors:
-            avg_vel = np.mean([n.velocity for n in neighbors], axis=0)
-            return (avg_vel - boid.velocity) * 0.25  # Increased from 0.125 to 0.25
-        return np.zeros(3)
-
-    def enforce_bounds(self, boid):
-        # Keep boids within a 100m x 100m x 45m space
-        bounds = np.array([[0, 100], [0, 100], [0, 45]])
-        force = np.zeros(3)
-
-        for i in range(3):
-            if boid.position[i] < bounds[i][0]:
-                force[i] = 2.0  # Increased from 1.0 to 2.0
-            elif boid.position[i] > bounds[i][1]:
-                force[i] = -2.0  # Increased from -1.0 to -2.0
-        return force * 0.5
+# Write the data to the SQLite database and websocket
+from scripts.boids_sim import BEHAVIOR_COLORS, Flock
+from utils.sim_clock import SimulationClock
+from utils.telemetry_sinks import db_sink, ws_sink
+
+# Simulation steps per second and simulated seconds per step
+TICK_RATE = 10
+DT = 0.5
+
+# Milliseconds between rendered frames
+RENDER_INTERVAL = 50
+
+
+class FlockRenderer:
+    """Draw the flock with a single scatter artist that is updated in place"""
+
+    def __init__(self, ax):
+        self.ax = ax
+        # Fixed view, set once instead of on every frame
+        ax.set_xlim(-81.052, -81.048)
+        ax.set_ylim(29.187, 29.191)
+        ax.set_zlim(0, 150)
+        self.scatter = ax.scatter([], [], [])
+
+    def draw(self, flock, colors=None):
+        """
+        Move the scatter to the flock's current positions
+
+        Parameters:
+            flock (Flock): The flock to draw
+            colors (numpy.ndarray): The color of each boid, None for the cohesion color
+
+        Returns:
+            tuple: The artists that changed
+        """
+        positions = flock.meters_to_latlon(flock.positions)
+        self.scatter._offsets3d = (
+            positions[:, 1],  # longitude
+            positions[:, 0],  # latitude
+            positions[:, 2],  # altitude
+        )
+        if colors is None or len(colors) != len(positions):
+            colors = BEHAVIOR_COLORS[0]
+        self.scatter.set_color(colors)
+        return (self.scatter,)
 
 
 fig = plt.figure(figsize=(12, 8))
@@ -206,11 +97,20 @@ stop_button = Button(ax_stop, "Stop", color="#f9aeae")  # Red
 # Create a global variable to control the animation
 running = True
 
+# Rate (Hz) at which the telemetry is written to the database and websocket
+PUBLISH_RATE = 10
+
+
+def new_flock(num_boids):
+    """Create a flock that publishes its telemetry from a background thread"""
+    return Flock(num_boids, sinks=[db_sink, ws_sink], dt=DT, publish_rate=PUBLISH_RATE)
+
 
 def reset(event):
     global flock, running
     # Reset the flock to its initial state
-    flock = Flock(int(boids_slider.val))
+    flock.close()
+    flock = new_flock(int(boids_slider.val))
     # Reset the running variable to True
     running = True
     # Reset the slider values to their initial values
@@ -244,45 +144,56 @@ stop_button.on_clicked(stop)
 
 
 # Create the initial flock
-flock = Flock(int(boids_slider.val))
+flock = new_flock(int(boids_slider.val))
 
 
-def animate(i):
-    global running
+# Latest behavior colors, set by the simulation timer and read by the renderer
+colors = None
+
+
+def step():
+    global colors
+    colors = flock.update_boids(
+        cohesion_slider.val, separation_slider.val, alignment_slider.val
+    )
+
+
+def simulate():
     if running:
-        ax.clear()
-        colors = flock.update_boids(
-            cohesion_slider.val, separation_slider.val, alignment_slider.val
-        )
-        positions = [flock.meters_to_latlon(boid.position) for boid in flock.boids]
-        ax.scatter(
-            [pos[1] for pos in positions],  # longitude
-            [pos[0] for pos in positions],  # latitude
-            [pos[2] for pos in positions],  # altitude
-            c=colors,
-        )
-        ax.set_xlim(-81.052, -81.048)
-        ax.set_ylim(29.187, 29.191)
-        ax.set_zlim(0, 150)
+        clock.advance(step)
+
+
+def animate(i):
+    return renderer.draw(flock, colors)
 
 
 def update(val):
     global flock
-    flock = Flock(int(boids_slider.val))
+    flock.close()
+    flock = new_flock(int(boids_slider.val))
 
 
 boids_slider.on_changed(update)
 
-ani = FuncAnimation(fig, animate, frames=500, interval=100)
+renderer = FlockRenderer(ax)
 
-plt.show()
+# Step the simulation on its own clock so the render rate does not set the tick rate
+clock = SimulationClock(tick_rate=TICK_RATE, dt=DT)
+sim_timer = fig.canvas.new_timer(interval=1000 / TICK_RATE)
+sim_timer.add_callback(simulate)
+sim_timer.start()
 
-# Save the id of the figure
-fig_id = fig.number
+# No blitting: a 3D scatter is only projected when the whole axes draws
+ani = FuncAnimation(
+    fig,
+    animate,
+    interval=RENDER_INTERVAL,
+    blit=False,
+    cache_frame_data=False,
+)
 
-# Update the boids and write their data to the database every half second
-while True:
-    # If the figure doesn't exist, break the loop
-    if not plt.fignum_exists(fig_id):
-        break
-    flock.update_boids(cohesion_slider.val, separation_slider.val, alignment_slider.val)
+# The timers above drive the simulation until the window is closed
+try:
+    plt.show()
+finally:
+    flock.close()
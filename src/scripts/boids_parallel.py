@@ -0,0 +1,227 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import multiprocessing as mp
+import os
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from scripts.boids_sim import (
+    BOUNDS,
+    COHESION_RADIUS,
+    GRID_MIN_BOIDS,
+    Flock,
+    flock_step,
+)
+from utils.spatial_hash import SpatialHash
+
+# Boids this close to a slab boundary are visible to the neighboring slab
+HALO_WIDTH = COHESION_RADIUS
+
+
+def _slab_worker(shm_name, num_boids, lower, upper, dt, neighbors, conn):
+    """
+    Step the boids owned by one slab until told to stop
+
+    The worker reads the previous state of its slab plus the halo boids of the
+    neighboring slabs straight from shared memory, and writes the new state of
+    the boids it owns into the other buffer.
+
+    Parameters:
+        shm_name (str): The name of the shared memory block holding the flock state
+        num_boids (int): The number of boids in the whole flock
+        lower (float): The lower x bound of the slab (inclusive)
+        upper (float): The upper x bound of the slab (exclusive)
+        dt (float): The time step in seconds
+        neighbors (str): The neighbor search, "brute", "grid" or "auto"
+        conn (multiprocessing.connection.Connection): The command pipe to the parent
+    """
+    shm = SharedMemory(name=shm_name)
+    state, behaviors = _state_views(shm, num_boids)
+    neighbor_index = (
+        SpatialHash(COHESION_RADIUS, BOUNDS) if neighbors != "brute" else None
+    )
+
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            src, weights = message
+            dst = 1 - src
+
+            x = state[src, :, 0]
+            local = np.flatnonzero((x >= lower - HALO_WIDTH) & (x < upper + HALO_WIDTH))
+            owned = (x[local] >= lower) & (x[local] < upper)
+
+            positions = state[src, local, :3].copy()
+            velocities = state[src, local, 3:].copy()
+            index = (
+                neighbor_index
+                if neighbors == "grid" or len(local) >= GRID_MIN_BOIDS
+                else None
+            )
+            local_behaviors = flock_step(
+                positions,
+                velocities,
+                *weights,
+                dt=dt,
+                neighbor_index=index,
+                targets=owned,
+            )
+
+            targets = local[owned]
+            state[dst, targets, :3] = positions[owned]
+            state[dst, targets, 3:] = velocities[owned]
+            behaviors[targets] = local_behaviors[owned]
+            conn.send(len(targets))
+    finally:
+        del state, behaviors
+        shm.close()
+
+
+def _state_views(shm, num_boids):
+    """Map the double-buffered (2, N, 6) state and the behavior codes onto shm"""
+    state = np.ndarray((2, num_boids, 6), dtype=np.float64, buffer=shm.buf)
+    behaviors = np.ndarray(
+        (num_boids,), dtype=np.int64, buffer=shm.buf, offset=state.nbytes
+    )
+    return state, behaviors
+
+
+class ParallelFlock(Flock):
+    """
+    Flock stepped by worker processes, each owning a slab of the volume along x
+
+    Results are deterministic for a fixed seed and worker count. They match the
+    serial Flock up to floating point summation order.
+    """
+
+    def __init__(
+        self,
+        num_boids,
+        workers=None,
+        neighbors="auto",
+        seed=None,
+        sinks=None,
+        dt=0.5,
+        publish_rate=None,
+    ):
+        """
+        Parameters:
+            num_boids (int): The number of boids
+            workers (int): The number of worker processes, defaults to the CPU count
+            neighbors (str): The neighbor search, "brute", "grid", or "auto" to pick by slab size
+            seed (int): The seed of the flock's random generator, None for a random seed
+            sinks (list): Callables that receive the telemetry data after every update
+            dt (float): The time step in seconds
+            publish_rate (float): Publish to the sinks from a background thread at this rate (Hz)
+        """
+        super().__init__(
+            num_boids,
+            neighbors="brute",
+            seed=seed,
+            sinks=sinks,
+            dt=dt,
+            publish_rate=publish_rate,
+        )
+        self.neighbors = neighbors
+        self.workers = workers or os.cpu_count()
+
+        nbytes = 2 * num_boids * 6 * 8 + num_boids * 8
+        self._shm = SharedMemory(create=True, size=max(nbytes, 1))
+        self._state, self._behaviors = _state_views(self._shm, num_boids)
+        self._state[0, :, :3] = self.positions
+        self._state[0, :, 3:] = self.velocities
+        self._src = 0
+        self._bind_views()
+
+        # Split the volume into equal slabs along x, the outer slabs extend to infinity
+        edges = np.linspace(BOUNDS[0, 0], BOUNDS[0, 1], self.workers + 1)
+        edges[0], edges[-1] = -np.inf, np.inf
+
+        self._pipes = []
+        self._processes = []
+        for k in range(self.workers):
+            parent_conn, child_conn = mp.Pipe()
+            process = mp.Process(
+                target=_slab_worker,
+                args=(
+                    self._shm.name,
+                    num_boids,
+                    edges[k],
+                    edges[k + 1],
+                    dt,
+                    neighbors,
+                    child_conn,
+                ),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._pipes.append(parent_conn)
+            self._processes.append(process)
+
+    def _load_state(self, arrays, meta):
+        super()._load_state(arrays, meta)
+        # Move the restored state into the shared buffer the workers read
+        self._state[self._src, :, :3] = self.positions
+        self._state[self._src, :, 3:] = self.velocities
+        self._bind_views()
+
+    def _bind_views(self):
+        """Point positions and velocities at the current buffer"""
+        self.positions = self._state[self._src, :, :3]
+        self.velocities = self._state[self._src, :, 3:]
+
+    def step(self, cohesion_weight, separation_weight, alignment_weight):
+        """
+        Advance the flock by one time step across all workers
+
+        Returns:
+            numpy.ndarray: The dominant behavior code of each boid
+        """
+        weights = (cohesion_weight, separation_weight, alignment_weight)
+        for conn in self._pipes:
+            conn.send((self._src, weights))
+        stepped = sum(conn.recv() for conn in self._pipes)
+        if stepped != len(self._behaviors):
+            raise RuntimeError(
+                f"Only {stepped} of {len(self._behaviors)} boids were stepped, "
+                "some positions are no longer finite"
+            )
+
+        self._src = 1 - self._src
+        self._bind_views()
+        self.tick += 1
+        return self._behaviors.copy()
+
+    def close(self):
+        """Stop the publisher and the workers, and release the shared memory"""
+        super().close()
+        if self._shm is None:
+            return
+        for conn in self._pipes:
+            conn.send(None)
+        for process in self._processes:
+            process.join()
+        for conn in self._pipes:
+            conn.close()
+
+        # Detach the numpy views before releasing the buffer
+        self.positions = self.positions.copy()
+        self.velocities = self.velocities.copy()
+        self._state = self._behaviors = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,481 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import time
+
+import numpy as np
+
+from utils.checkpoint import load_checkpoint, save_checkpoint
+from utils.geo_transform import LocalTangentPlane, format_coordinates
+from utils.sim_clock import SimulationClock
+from utils.spatial_hash import SpatialHash, brute_force_pairs
+from utils.telemetry_publisher import TelemetryPublisher
+from utils.telemetry_sinks import make_sink
+
+# Neighbourhood radii (meters) and gains for the three boids rules
+COHESION_RADIUS = 20.0
+SEPARATION_RADIUS = 10.0
+ALIGNMENT_RADIUS = 15.0
+COHESION_GAIN = 0.05  # Increased from 0.01 to 0.05
+SEPARATION_GAIN = 0.05  # Increased from 0.01 to 0.05
+ALIGNMENT_GAIN = 0.25  # Increased from 0.125 to 0.25
+
+# Keep boids within a 100m x 100m x 45m space
+BOUNDS = np.array([[0, 100], [0, 100], [0, 45]], dtype=float)
+BOUNDS_FORCE = 2.0 * 0.5  # Increased from 1.0 to 2.0
+
+# Speed limits (in meters per second)
+MAX_SPEED = 15.0
+MIN_SPEED = 5.0
+
+# Colors of the dominant behavior, indexed by the behavior code
+BEHAVIOR_COLORS = np.array(
+    [
+        "#98C379",  # Green for cohesion
+        "#E06C75",  # Red for separation
+        "#E5C07B",  # Yellow for alignment
+    ]
+)
+
+
+# Flocks at least this large use the spatial hash instead of the brute-force
+# pair search (see bench_boids_neighbors.py for the measured crossover)
+GRID_MIN_BOIDS = 400
+
+
+def flock_step(
+    positions,
+    velocities,
+    cohesion_weight,
+    separation_weight,
+    alignment_weight,
+    dt=0.5,
+    neighbor_index=None,
+    targets=None,
+):
+    """
+    Advance the whole flock by one step in a single batched pass
+
+    All rules are evaluated against the same snapshot of the flock, so the
+    result does not depend on the order of the boids.
+
+    Parameters:
+        positions (numpy.ndarray): The N x 3 positions of the boids, updated in place
+        velocities (numpy.ndarray): The N x 3 velocities of the boids, updated in place
+        cohesion_weight (float): The weight of the cohesion rule
+        separation_weight (float): The weight of the separation rule
+        alignment_weight (float): The weight of the alignment rule
+        dt (float): The time step in seconds
+        neighbor_index (SpatialHash): The neighbor index to search with, or None for brute force
+        targets (numpy.ndarray): Boolean mask of the boids that need exact results, None for all.
+            Pairs between two non-target boids are skipped, so the others only act as neighbors
+
+    Returns:
+        numpy.ndarray: The dominant behavior code of each boid (0 cohesion, 1 separation, 2 alignment)
+    """
+    num_boids = positions.shape[0]
+
+    # Every rule radius is within the cohesion radius, so one search serves all three
+    if neighbor_index is None:
+        pairs = brute_force_pairs(positions, COHESION_RADIUS)
+    else:
+        pairs = neighbor_index.build(positions).iter_pairs(COHESION_RADIUS)
+
+    cohesion_count = np.zeros(num_boids)
+    cohesion_sum = np.zeros((num_boids, 3))
+    separation = np.zeros((num_boids, 3))
+    alignment_count = np.zeros(num_boids)
+    alignment_sum = np.zeros((num_boids, 3))
+
+    # Each pair (i, j) is reported once, with diff = p_i - p_j
+    for i, j, diff, dist in pairs:
+        if targets is not None:
+            keep = targets[i] | targets[j]
+            i, j, diff, dist = i[keep], j[keep], diff[keep], dist[keep]
+        both = np.concatenate([i, j])
+        other = np.concatenate([j, i])
+
+        cohesion_count += np.bincount(both, minlength=num_boids)
+        for k in range(3):
+            cohesion_sum[:, k] += np.bincount(
+                both, weights=positions[other, k], minlength=num_boids
+            )
+
+        close = (dist < SEPARATION_RADIUS) & (dist > 0)
+        push = diff[close] / (dist[close] ** 2)[:, None]
+        for k in range(3):
+            separation[:, k] += np.bincount(
+                i[close], weights=push[:, k], minlength=num_boids
+            ) - np.bincount(j[close], weights=push[:, k], minlength=num_boids)
+
+        near = np.concatenate([dist, dist]) < ALIGNMENT_RADIUS
+        alignment_count += np.bincount(both[near], minlength=num_boids)
+        for k in range(3):
+            alignment_sum[:, k] += np.bincount(
+                both[near], weights=velocities[other[near], k], minlength=num_boids
+            )
+
+    # Cohesion - steer towards center of mass of neighbors
+    center = cohesion_sum / np.maximum(cohesion_count, 1)[:, None]
+    v1 = np.where(
+        cohesion_count[:, None] > 0, (center - positions) * COHESION_GAIN, 0.0
+    )
+
+    # Separation - avoid crowding neighbors, weighted by 1 / dist^2
+    v2 = separation * SEPARATION_GAIN
+
+    # Alignment - steer towards average heading of neighbors
+    avg_vel = alignment_sum / np.maximum(alignment_count, 1)[:, None]
+    v3 = np.where(
+        alignment_count[:, None] > 0, (avg_vel - velocities) * ALIGNMENT_GAIN, 0.0
+    )
+
+    v1 *= cohesion_weight
+    v2 *= separation_weight
+    v3 *= alignment_weight
+
+    # Bounds - push boids back into the simulation volume
+    v4 = np.where(
+        positions < BOUNDS[:, 0],
+        BOUNDS_FORCE,
+        np.where(positions > BOUNDS[:, 1], -BOUNDS_FORCE, 0.0),
+    )
+
+    # Determine dominant behavior, ties resolve as cohesion > separation > alignment
+    cohesion_mag = np.linalg.norm(v1, axis=1)
+    separation_mag = np.linalg.norm(v2, axis=1)
+    alignment_mag = np.linalg.norm(v3, axis=1)
+    max_mag = np.maximum(np.maximum(cohesion_mag, separation_mag), alignment_mag)
+    behaviors = np.where(
+        max_mag == cohesion_mag, 0, np.where(max_mag == separation_mag, 1, 2)
+    )
+
+    velocities += v1 + v2 + v3 + v4
+
+    # Limit velocity (in meters per second)
+    speed = np.linalg.norm(velocities, axis=1)
+    clamped = np.clip(speed, MIN_SPEED, MAX_SPEED)
+    velocities *= (clamped / speed)[:, None]
+
+    positions += velocities * dt
+
+    return behaviors
+
+
+class Flock:
+    def __init__(
+        self,
+        num_boids,
+        neighbors="auto",
+        seed=None,
+        sinks=None,
+        dt=0.5,
+        publish_rate=None,
+    ):
+        """
+        Parameters:
+            num_boids (int): The number of boids
+            neighbors (str): The neighbor search, "brute", "grid", or "auto" to pick by flock size
+            seed (int): The seed of the flock's random generator, None for a random seed
+            sinks (list): Callables that receive the telemetry data after every update
+            dt (float): The time step in seconds
+            publish_rate (float): Publish to the sinks from a background thread at this
+                rate (Hz) instead of synchronously on every update
+        """
+        self.rng = np.random.default_rng(seed)
+        # Initialize in meters (100m x 100m x 45m space)
+        self.positions = self.rng.random((num_boids, 3)) * np.array([100, 100, 45])
+        self.velocities = self.rng.random((num_boids, 3)) - 0.5
+        # Separate stream for the telemetry, which may be formatted on another thread
+        self.telemetry_rng = self.rng.spawn(1)[0]
+        self.neighbors = neighbors
+        if neighbors == "auto":
+            neighbors = "grid" if num_boids >= GRID_MIN_BOIDS else "brute"
+        self.neighbor_index = (
+            SpatialHash(COHESION_RADIUS, BOUNDS) if neighbors == "grid" else None
+        )
+        self.sinks = [] if sinks is None else list(sinks)
+        self.publisher = (
+            TelemetryPublisher(self.format_telemetry, self.sinks, publish_rate).start()
+            if publish_rate and self.sinks
+            else None
+        )
+        self.dt = dt
+        self.tick = 0
+        # Store reference coordinates for conversion
+        self.ref_lat = 29.189  # center latitude
+        self.ref_lon = -81.050  # center longitude
+        self.min_alt = 30
+        self.max_alt = 100
+        self.geo = LocalTangentPlane(self.ref_lat, self.ref_lon)
+
+    def meters_to_latlon(self, position):
+        """Convert a position or an N x 3 array of positions in meters to lat/lon/alt"""
+        position = np.asarray(position)
+        geo = self.geo.to_geodetic(position[..., :2])
+        # Map the 0-45m simulation height onto the flight altitude band
+        geo[..., 2] = self.min_alt + (position[..., 2] / 45) * (
+            self.max_alt - self.min_alt
+        )
+        return geo
+
+    def step(self, cohesion_weight, separation_weight, alignment_weight):
+        """
+        Advance the flock by one time step without publishing anything
+
+        Returns:
+            numpy.ndarray: The dominant behavior code of each boid
+        """
+        behaviors = flock_step(
+            self.positions,
+            self.velocities,
+            cohesion_weight,
+            separation_weight,
+            alignment_weight,
+            dt=self.dt,
+            neighbor_index=self.neighbor_index,
+        )
+        self.tick += 1
+        return behaviors
+
+    def snapshot(self):
+        """Copy the state the telemetry is built from"""
+        return self.tick, self.positions.copy(), self.velocities.copy()
+
+    def telemetry(self):
+        """Build the telemetry table rows for the current state"""
+        return self.format_telemetry((self.tick, self.positions, self.velocities))
+
+    def format_telemetry(self, snapshot):
+        """
+        Build the telemetry table rows for a snapshot
+
+        Parameters:
+            snapshot (tuple): (tick, positions, velocities) as returned by snapshot()
+
+        Returns:
+            dict: The telemetry columns
+        """
+        _, positions, velocities = snapshot
+        # Create database entries with converted coordinates
+        num_boids = len(positions)
+        geo = self.meters_to_latlon(positions)
+        destination_offsets = self.telemetry_rng.uniform(0.0001, 0.001, num_boids)
+        return {
+            "Agent Name": range(1, num_boids + 1),
+            "Location": format_coordinates(geo[:, 1], geo[:, 0], geo[:, 2]),
+            "Destination": format_coordinates(
+                geo[:, 0], geo[:, 1] + destination_offsets, 50
+            ),
+            "Altitude": geo[:, 2].tolist(),
+            "Pitch": [45 for _ in range(num_boids)],
+            "Yaw": [0 for _ in range(num_boids)],
+            "Roll": [0 for _ in range(num_boids)],
+            "Airspeed/Velocity": np.linalg.norm(velocities, axis=1).tolist(),
+            "Acceleration": [0 for _ in range(num_boids)],
+            "Angular Velocity": [0 for _ in range(num_boids)],
+        }
+
+    def update_boids(self, cohesion_weight, separation_weight, alignment_weight):
+        """
+        Advance the flock by one time step and publish the telemetry to every sink
+
+        Returns:
+            numpy.ndarray: The color of each boid's dominant behavior
+        """
+        behaviors = self.step(cohesion_weight, separation_weight, alignment_weight)
+        if self.publisher is not None:
+            self.publisher.submit(self.snapshot())
+        elif self.sinks:
+            data = self.telemetry()
+            for sink in self.sinks:
+                sink(data)
+        return BEHAVIOR_COLORS[behaviors]
+
+    def close(self):
+        """Stop the background publisher, publishing the last pending snapshot"""
+        if self.publisher is not None:
+            self.publisher.stop()
+
+    def save(self, path):
+        """
+        Checkpoint the full simulation state to a memory-mappable file
+
+        Parameters:
+            path (str): The checkpoint file
+        """
+        save_checkpoint(
+            path,
+            {"positions": self.positions, "velocities": self.velocities},
+            {
+                "kind": "boids",
+                "tick": self.tick,
+                "dt": self.dt,
+                "neighbors": self.neighbors,
+                "rng_state": self.rng.bit_generator.state,
+                "telemetry_rng_state": self.telemetry_rng.bit_generator.state,
+                "ref_lat": self.ref_lat,
+                "ref_lon": self.ref_lon,
+                "min_alt": self.min_alt,
+                "max_alt": self.max_alt,
+            },
+        )
+
+    @classmethod
+    def restore(cls, path, mmap_mode="c", **kwargs):
+        """
+        Create a flock from a checkpoint written by save()
+
+        With the default copy-on-write mapping the arrays are paged in lazily,
+        and any number of flocks can be forked from the same file.
+
+        Parameters:
+            path (str): The checkpoint file
+            mmap_mode (str): How to map the arrays, see load_checkpoint
+            **kwargs: Extra constructor arguments, such as sinks or publish_rate
+
+        Returns:
+            Flock: The restored flock
+        """
+        arrays, meta = load_checkpoint(path, mmap_mode=mmap_mode)
+        if meta.get("kind") != "boids":
+            raise ValueError(f"{path} is not a boids checkpoint")
+        kwargs.setdefault("neighbors", meta["neighbors"])
+        flock = cls(len(arrays["positions"]), dt=meta["dt"], **kwargs)
+        flock._load_state(arrays, meta)
+        return flock
+
+    def _load_state(self, arrays, meta):
+        self.positions = arrays["positions"]
+        self.velocities = arrays["velocities"]
+        self.rng.bit_generator.state = meta["rng_state"]
+        self.telemetry_rng.bit_generator.state = meta["telemetry_rng_state"]
+        self.tick = meta["tick"]
+        self.ref_lat, self.ref_lon = meta["ref_lat"], meta["ref_lon"]
+        self.min_alt, self.max_alt = meta["min_alt"], meta["max_alt"]
+        self.geo = LocalTangentPlane(self.ref_lat, self.ref_lon)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the boids simulation headless at maximum speed"
+    )
+    parser.add_argument("--steps", type=int, default=1000, help="Steps to simulate")
+    parser.add_argument("--boids", type=int, default=50, help="Number of boids")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("--cohesion", type=float, default=0.2)
+    parser.add_argument("--separation", type=float, default=0.1)
+    parser.add_argument("--alignment", type=float, default=0.3)
+    parser.add_argument("--dt", type=float, default=0.5, help="Time step in seconds")
+    parser.add_argument(
+        "--neighbors", choices=["auto", "brute", "grid"], default="auto"
+    )
+    parser.add_argument(
+        "--tick-rate",
+        type=float,
+        default=None,
+        help="Pace the simulation at this many steps per second instead of maximum speed",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes, more than one steps the flock in parallel slabs",
+    )
+    parser.add_argument(
+        "--publish-rate",
+        type=float,
+        default=None,
+        help="Publish telemetry from a background thread at this rate (Hz)",
+    )
+    parser.add_argument(
+        "--sink",
+        action="append",
+        default=[],
+        help='Telemetry output, "db", "db-async" (batched in a background '
+        'thread), "ws" or "csv:<path>" (repeatable)',
+    )
+    parser.add_argument(
+        "--restore",
+        default=None,
+        help="Resume from a checkpoint, ignoring --boids, --seed and --dt",
+    )
+    parser.add_argument(
+        "--save", default=None, help="Write a checkpoint when the run ends"
+    )
+    args = parser.parse_args()
+
+    sinks = [make_sink(spec) for spec in args.sink]
+    flock_cls = Flock
+    options = {"sinks": sinks, "publish_rate": args.publish_rate}
+    if args.workers > 1:
+        from scripts.boids_parallel import ParallelFlock
+
+        flock_cls = ParallelFlock
+        options["workers"] = args.workers
+
+    if args.restore:
+        flock = flock_cls.restore(args.restore, **options)
+    else:
+        flock = flock_cls(
+            args.boids,
+            neighbors=args.neighbors,
+            seed=args.seed,
+            dt=args.dt,
+            **options,
+        )
+    start_tick = flock.tick
+
+    def step():
+        flock.update_boids(args.cohesion, args.separation, args.alignment)
+
+    clock = None
+    start = time.perf_counter()
+    try:
+        try:
+            if args.tick_rate:
+                clock = SimulationClock(tick_rate=args.tick_rate, dt=flock.dt)
+                clock.run(step, max_ticks=args.steps)
+            else:
+                for _ in range(args.steps):
+                    step()
+        except KeyboardInterrupt:
+            print("\n[INFO] Simulation stopped by user")
+        elapsed = time.perf_counter() - start
+        steps = flock.tick - start_tick
+        # Not reached when a step raised, a failed run is not checkpointed
+        if args.save:
+            flock.save(args.save)
+    finally:
+        # Stop the publisher and writer threads on every path
+        flock.close()
+        for sink in sinks:
+            if hasattr(sink, "close"):
+                sink.close()
+
+    print(
+        f"[INFO] {steps} steps of {len(flock.positions)} boids in {elapsed:.2f} s "
+        f"({steps / elapsed:.1f} steps/sec)"
+    )
+    if clock is not None:
+        stats = clock.stats()
+        print(
+            f"[INFO] Real-time factor {stats['real_time_factor']:.2f}, "
+            f"{stats['dropped_ticks']} ticks dropped, tick jitter "
+            f"{stats['jitter_mean'] * 1e3:.2f} ms mean / "
+            f"{stats['jitter_max'] * 1e3:.2f} ms max"
+        )
+    if flock.publisher is not None:
+        stats = flock.publisher.stats()
+        print(
+            f"[INFO] Published {stats['published']} of {stats['submitted']} frames "
+            f"({stats['coalesced']} coalesced, {stats['dropped']} dropped)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scripts.boids_sim import BOUNDS, Flock
+
+
+def nearest_neighbor_distance(positions, chunk_size=1024):
+    """
+    Calculate the mean distance from each boid to its nearest neighbor
+
+    Parameters:
+        positions (numpy.ndarray): The N x 3 positions of the boids
+        chunk_size (int): The number of boids compared against the flock at once
+
+    Returns:
+        float: The mean nearest-neighbor distance, nan for fewer than two boids
+    """
+    num_boids = len(positions)
+    if num_boids < 2:
+        return float("nan")
+    nearest = np.empty(num_boids)
+    for lo in range(0, num_boids, chunk_size):
+        hi = min(lo + chunk_size, num_boids)
+        diff = positions[lo:hi, None, :] - positions[None, :, :]
+        dist_sq = np.einsum("ijk,ijk->ij", diff, diff)
+        dist_sq[np.arange(hi - lo), np.arange(lo, hi)] = np.inf
+        nearest[lo:hi] = np.sqrt(dist_sq.min(axis=1))
+    return float(nearest.mean())
+
+
+def polarization(velocities):
+    """
+    Calculate the flock polarization, 1 when all boids fly the same heading
+
+    Parameters:
+        velocities (numpy.ndarray): The N x 3 velocities of the boids
+
+    Returns:
+        float: The norm of the mean unit heading
+    """
+    headings = velocities / np.linalg.norm(velocities, axis=1)[:, None]
+    return float(np.linalg.norm(headings.mean(axis=0)))
+
+
+def out_of_bounds_fraction(positions):
+    """Calculate the fraction of boids outside the simulation volume"""
+    outside = np.any((positions < BOUNDS[:, 0]) | (positions > BOUNDS[:, 1]), axis=1)
+    return float(outside.mean())
+
+
+def run_config(config):
+    """
+    Run one headless flock and summarize it
+
+    Parameters:
+        config (dict): cohesion, separation, alignment, boids, seed, steps and metrics_every
+
+    Returns:
+        dict: The configuration with its summary metrics
+    """
+    if config["steps"] < 1:
+        raise ValueError(f"A run needs at least one step, got {config['steps']}")
+    flock = Flock(config["boids"], seed=config["seed"])
+    weights = (config["cohesion"], config["separation"], config["alignment"])
+
+    nn_distances = []
+    polarizations = []
+    out_of_bounds = 0.0
+    step_time = 0.0
+    for step in range(config["steps"]):
+        start = time.perf_counter()
+        flock.step(*weights)
+        step_time += time.perf_counter() - start
+
+        out_of_bounds += out_of_bounds_fraction(flock.positions)
+        if step % config["metrics_every"] == 0 or step == config["steps"] - 1:
+            nn_distances.append(nearest_neighbor_distance(flock.positions))
+            polarizations.append(polarization(flock.velocities))
+
+    return {
+        **config,
+        "mean_nn_distance": float(np.mean(nn_distances)),
+        "final_nn_distance": nn_distances[-1],
+        "mean_polarization": float(np.mean(polarizations)),
+        "final_polarization": polarizations[-1],
+        "out_of_bounds_fraction": out_of_bounds / config["steps"],
+        "steps_per_sec": config["steps"] / step_time if step_time > 0 else np.inf,
+    }
+
+
+def grid_configs(cohesion, separation, alignment, boids, seeds):
+    """Yield every combination of the given weights, flock sizes and seeds"""
+    for c, s, a, n, seed in itertools.product(
+        cohesion, separation, alignment, boids, seeds
+    ):
+        yield {"cohesion": c, "separation": s, "alignment": a, "boids": n, "seed": seed}
+
+
+def random_configs(cohesion, separation, alignment, boids, samples, seed=None):
+    """
+    Yield configurations with weights drawn uniformly between the given extremes
+
+    Parameters:
+        cohesion (list): Values whose min and max bound the cohesion weight
+        separation (list): Values whose min and max bound the separation weight
+        alignment (list): Values whose min and max bound the alignment weight
+        boids (list): Flock sizes to choose from
+        samples (int): The number of configurations
+        seed (int): The seed of the sampler
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(samples):
+        yield {
+            "cohesion": float(rng.uniform(min(cohesion), max(cohesion))),
+            "separation": float(rng.uniform(min(separation), max(separation))),
+            "alignment": float(rng.uniform(min(alignment), max(alignment))),
+            "boids": int(rng.choice(boids)),
+            "seed": int(rng.integers(2**31)),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sweep boids weights, flock sizes and seeds over a process pool"
+    )
+    parser.add_argument("--cohesion", type=float, nargs="+", default=[0.2])
+    parser.add_argument("--separation", type=float, nargs="+", default=[0.1])
+    parser.add_argument("--alignment", type=float, nargs="+", default=[0.3])
+    parser.add_argument("--boids", type=int, nargs="+", default=[50])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=None,
+        help="Draw this many random configurations instead of the full grid",
+    )
+    parser.add_argument("--sampler-seed", type=int, default=None)
+    parser.add_argument("--steps", type=int, default=200, help="Steps per run")
+    parser.add_argument(
+        "--metrics-every",
+        type=int,
+        default=10,
+        help="Steps between nearest-neighbor and polarization samples",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default="boids_sweep.csv", help="Results CSV")
+    args = parser.parse_args()
+    # Every run needs a step to summarize and a sampling interval to divide by
+    if args.steps < 1:
+        parser.error("--steps must be at least 1")
+    if args.metrics_every < 1:
+        parser.error("--metrics-every must be at least 1")
+
+    if args.samples is None:
+        configs = grid_configs(
+            args.cohesion, args.separation, args.alignment, args.boids, args.seeds
+        )
+    else:
+        configs = random_configs(
+            args.cohesion,
+            args.separation,
+            args.alignment,
+            args.boids,
+            args.samples,
+            seed=args.sampler_seed,
+        )
+    configs = [
+        {**config, "steps": args.steps, "metrics_every": args.metrics_every}
+        for config in configs
+    ]
+
+    print(f"[INFO] Running {len(configs)} configurations on {args.workers} workers")
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for k, result in enumerate(executor.map(run_config, configs), start=1):
+            results.append(result)
+            print(
+                f"[{k}/{len(configs)}] cohesion={result['cohesion']:.3g} "
+                f"separation={result['separation']:.3g} "
+                f"alignment={result['alignment']:.3g} boids={result['boids']} "
+                f"seed={result['seed']} nn={result['mean_nn_distance']:.2f} "
+                f"polarization={result['mean_polarization']:.3f}"
+            )
+
+    pd.DataFrame(results).to_csv(args.output, index=False)
+    print(
+        f"[INFO] Wrote {len(results)} runs to {args.output} "
+        f"in {time.perf_counter() - start:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.formation_kernel import UPDATE_MODES, formation_step
+from scripts.formation_metrics import calculate_indicators
+from scripts.formation_sim import (
+    ALPHA,
+    CONVERGENCE_WINDOW,
+    DELTA,
+    INITIAL_POSITIONS,
+    JN_DECIMALS,
+    MAX_ITER,
+    PT,
+    R0,
+    ConvergenceDetector,
+    V,
+)
+
+
+def random_layouts(batch_size, base=INITIAL_POSITIONS, jitter=5.0, seed=None):
+    """
+    Draw initial layouts by moving every agent of a base layout at random
+
+    Parameters:
+        batch_size (int): The number of layouts B
+        base (numpy.ndarray): The N x 2 layout to perturb
+        jitter (float): The standard deviation of the offsets
+        seed (int): The random seed
+
+    Returns:
+        numpy.ndarray: The B x N x 2 initial positions
+    """
+    base = np.asarray(base, dtype=float)
+    rng = np.random.default_rng(seed)
+    return base + rng.normal(0.0, jitter, (batch_size, *base.shape))
+
+
+class FormationBatch:
+    """Run B independent formation swarms of N agents as one B x N x 2 array"""
+
+    def __init__(
+        self,
+        positions,
+        alpha=ALPHA,
+        delta=DELTA,
+        v=V,
+        r0=R0,
+        PT=PT,
+        mode="jacobi",
+        step_size=1.0,
+        convergence=None,
+    ):
+        """
+        Every iteration advances the swarms that have not converged yet in one
+        formation_step call; converged swarms are masked out and keep their
+        final state. Each swarm follows the same trajectory and converges at
+        the same iteration as a FormationController run on its own.
+
+        Parameters:
+            positions (numpy.ndarray): The B x N x 2 initial positions
+            alpha (float): System parameter about antenna characteristics
+            delta (float): The required application data rate
+            v (float): Path loss exponent
+            r0 (float): Reference distance value
+            PT (float): The reception probability threshold
+            mode (str): The update mode of formation_step, "jacobi" or "sequential"
+            step_size (float): The factor applied to the control input
+            convergence (ConvergenceDetector): The convergence test, None to wait for
+                CONVERGENCE_WINDOW identical Jn values rounded to JN_DECIMALS
+        """
+        self.initial_positions = np.array(positions, dtype=float)
+        if self.initial_positions.ndim != 3:
+            raise ValueError("Expected B x N x 2 initial positions")
+        self.alpha = alpha
+        self.delta = delta
+        self.v = v
+        self.r0 = r0
+        self.PT = PT
+        self.mode = mode
+        self.step_size = step_size
+        self.convergence = convergence
+        self.reset()
+
+    @property
+    def batch_size(self):
+        return self.positions.shape[0]
+
+    @property
+    def swarm_size(self):
+        return self.positions.shape[1]
+
+    @property
+    def converged(self):
+        """Whether each swarm has converged"""
+        return self.converged_at >= 0
+
+    @property
+    def Jn(self):
+        """The T x B unrounded Jn of every iteration, nan after a swarm converged"""
+        return np.array(self._Jn).reshape(-1, self.batch_size)
+
+    @property
+    def rn(self):
+        """The T x B unrounded rn of every iteration, nan after a swarm converged"""
+        return np.array(self._rn).reshape(-1, self.batch_size)
+
+    def reset(self):
+        """Move every swarm back to its initial positions and clear the history"""
+        self.positions = self.initial_positions.copy()
+        self.active = np.ones(len(self.positions), dtype=bool)
+        self.iteration = 0
+        self.converged_at = np.full(len(self.positions), -1)
+        self.convergence_time = np.full(len(self.positions), np.nan)
+        self._Jn = []
+        self._rn = []
+        self.start_time = time.time()
+
+    def step(self):
+        """
+        Run one iteration of every swarm that has not converged
+
+        Returns:
+            int: The number of swarms still running
+        """
+        active = np.flatnonzero(self.active)
+        if not len(active):
+            return 0
+        # Step in place while every swarm runs, on a compacted copy otherwise
+        everyone = len(active) == self.batch_size
+        positions = self.positions if everyone else self.positions[active]
+        _, distances, aij, qualities = formation_step(
+            positions,
+            self.alpha,
+            self.delta,
+            self.r0,
+            self.v,
+            self.PT,
+            mode=self.mode,
+            step_size=self.step_size,
+        )
+        if not everyone:
+            self.positions[active] = positions
+
+        Jn = np.full(self.batch_size, np.nan)
+        rn = np.full(self.batch_size, np.nan)
+        Jn[active], rn[active] = calculate_indicators(
+            distances, aij, qualities, self.PT
+        )
+        self._Jn.append(Jn)
+        self._rn.append(rn)
+        self.iteration += 1
+
+        done = active[self._converged(active)]
+        self.converged_at[done] = self.iteration
+        self.convergence_time[done] = time.time() - self.start_time
+        self.active[done] = False
+        return int(self.active.sum())
+
+    def run(self, max_iter=MAX_ITER):
+        """
+        Run until every swarm converges
+
+        Parameters:
+            max_iter (int): Stop once this many iterations have run in total
+
+        Returns:
+            numpy.ndarray: Whether each swarm has converged
+        """
+        while self.active.any() and self.iteration < max_iter:
+            self.step()
+        return self.converged
+
+    def series(self):
+        """Return the Jn and rn of every swarm and iteration it ran as a DataFrame"""
+        Jn, rn = self.Jn, self.rn
+        stop = np.where(self.converged, self.converged_at, self.iteration)
+        iteration, swarm = np.nonzero(np.arange(len(Jn))[:, None] < stop)
+        return pd.DataFrame(
+            {
+                "swarm": swarm,
+                "iteration": iteration,
+                "Jn": Jn[iteration, swarm],
+                "rn": rn[iteration, swarm],
+            }
+        ).sort_values(["swarm", "iteration"], ignore_index=True)
+
+    def summary(self):
+        """Return the outcome of every swarm as a DataFrame"""
+        Jn, rn = self.Jn, self.rn
+        iterations = np.where(self.converged, self.converged_at, self.iteration)
+        last = np.maximum(iterations - 1, 0)
+        swarms = np.arange(self.batch_size)
+        empty = not len(Jn)
+        return pd.DataFrame(
+            {
+                "swarm": swarms,
+                "converged": self.converged,
+                "iterations": iterations,
+                "convergence_time": self.convergence_time,
+                "Jn": np.full(self.batch_size, np.nan) if empty else Jn[last, swarms],
+                "rn": np.full(self.batch_size, np.nan) if empty else rn[last, swarms],
+            }
+        )
+
+    def _converged(self, active):
+        if self.convergence is None:
+            if len(self._Jn) < CONVERGENCE_WINDOW:
+                return np.zeros(len(active), dtype=bool)
+            window = np.round(
+                np.array(self._Jn[-CONVERGENCE_WINDOW:])[:, active], JN_DECIMALS
+            )
+            return (window == window[-1]).all(axis=0)
+
+        if len(self._Jn) < self.convergence.window:
+            return np.zeros(len(active), dtype=bool)
+        Jn = np.array(self._Jn[-self.convergence.window :])[:, active]
+        rn = np.array(self._rn[-self.convergence.window :])[:, active]
+        return (Jn.max(axis=0) - Jn.min(axis=0) <= self.convergence.jn_tol) & (
+            rn.max(axis=0) - rn.min(axis=0) <= self.convergence.rn_tol
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run many formation swarms at once as one batch"
+    )
+    parser.add_argument("--batch", type=int, default=64, help="Number of swarms")
+    parser.add_argument(
+        "--positions",
+        default=None,
+        help=".npy file of B x N x 2 initial positions, instead of random layouts",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=5.0,
+        help="Standard deviation of the random offsets from the default layout",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-iter", type=int, default=MAX_ITER)
+    parser.add_argument("--alpha", type=float, default=ALPHA)
+    parser.add_argument("--delta", type=float, default=DELTA)
+    parser.add_argument("--v", type=float, default=V, help="Path loss exponent")
+    parser.add_argument("--r0", type=float, default=R0, help="Reference distance")
+    parser.add_argument("--pt", type=float, default=PT, help="Reception threshold")
+    parser.add_argument("--update", choices=UPDATE_MODES, default="jacobi")
+    parser.add_argument("--step-size", type=float, default=1.0)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=None,
+        help="Converge once Jn varies less than this over --window iterations "
+        f"instead of after {CONVERGENCE_WINDOW} identical rounded values",
+    )
+    parser.add_argument("--rn-tolerance", type=float, default=1e-3)
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument(
+        "--series",
+        default="formation_batch_series.csv",
+        help="Output CSV of the Jn and rn of every swarm and iteration",
+    )
+    parser.add_argument(
+        "--summary",
+        default="formation_batch_summary.csv",
+        help="Output CSV of the outcome of every swarm",
+    )
+    args = parser.parse_args()
+
+    positions = (
+        random_layouts(args.batch, jitter=args.jitter, seed=args.seed)
+        if args.positions is None
+        else np.load(args.positions)
+    )
+    batch = FormationBatch(
+        positions,
+        alpha=args.alpha,
+        delta=args.delta,
+        v=args.v,
+        r0=args.r0,
+        PT=args.pt,
+        mode=args.update,
+        step_size=args.step_size,
+        convergence=(
+            None
+            if args.tolerance is None
+            else ConvergenceDetector(args.tolerance, args.rn_tolerance, args.window)
+        ),
+    )
+
+    start = time.perf_counter()
+    try:
+        batch.run(max_iter=args.max_iter)
+    except KeyboardInterrupt:
+        print("\n[INFO] Simulation stopped by user")
+    elapsed = time.perf_counter() - start
+
+    summary = batch.summary()
+    batch.series().to_csv(args.series, index=False)
+    summary.to_csv(args.summary, index=False)
+
+    converged = summary[summary["converged"]]
+    print(
+        f"[INFO] {len(converged)} of {batch.batch_size} swarms of "
+        f"{batch.swarm_size} agents converged"
+    )
+    if len(converged):
+        print(
+            f"[INFO] Iterations to converge: median {converged['iterations'].median():g}, "
+            f"max {converged['iterations'].max()}"
+        )
+    swarm_iterations = int(summary["iterations"].sum())
+    print(
+        f"[INFO] {swarm_iterations} swarm iterations in {elapsed:.2f} s "
+        f"({swarm_iterations / max(elapsed, 1e-9):.1f} per second)"
+    )
+    print(f"[INFO] Wrote {args.series} and {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
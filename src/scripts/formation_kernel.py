@@ -0,0 +1,348 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import math
+
+import numpy as np
+
+from utils.spatial_hash import SpatialHash
+
+# Update modes of formation_step
+UPDATE_MODES = ("sequential", "jacobi")
+
+
+def calculate_distance(agent_i, agent_j):
+    """
+    Calculate the distance between two agents
+
+    Parameters:
+        agent_i (list): The position of agent i
+        agent_j (list): The position of agent j
+
+    Returns:
+        float: The distance between agent i and agent j
+    """
+    return np.sqrt((agent_i[0] - agent_j[0]) ** 2 + (agent_i[1] - agent_j[1]) ** 2)
+
+
+def calculate_aij(alpha, delta, rij, r0, v):
+    """
+    Calculate the aij value
+
+    Parameters:
+        alpha (float): System parameter about antenna characteristics
+        delta (float): The required application data rate
+        rij (float): The distance between two agents
+        r0 (float): Reference distance value
+        v (float): Path loss exponent
+
+    Returns:
+        float: The calculated aij (communication quality in antenna far-field) value
+    """
+    return np.exp(-alpha * (2**delta - 1) * (rij / r0) ** v)
+
+
+def calculate_gij(rij, r0):
+    """
+    Calculate the gij value
+
+    Parameters:
+        rij (float): The distance between two agents
+        r0 (float): Reference distance value
+
+    Returns:
+        float: The calculated gij (communication quality in antenna near-field) value
+    """
+    return rij / np.sqrt(rij**2 + r0**2)
+
+
+def calculate_rho_ij(beta, v, rij, r0):
+    """
+    Calculate the rho_ij (the derivative of phi_ij) value
+
+    Parameters:
+        beta (float): alpha * (2**delta - 1)
+        v (float): Path loss exponent
+        rij (float): The distance between two agents
+        r0 (float): Reference distance value
+
+    Returns:
+        float: The calculated rho_ij value
+    """
+    return (
+        (-beta * v * rij ** (v + 2) - beta * v * (r0**2) * (rij**v) + r0 ** (v + 2))
+        * np.exp(-beta * (rij / r0) ** v)
+        / np.sqrt((rij**2 + r0**2) ** 3)
+    )
+
+
+# numpy's vectorized pow rounds differently from the C library pow behind the
+# scalar operations of the original loop, this applies the latter elementwise
+_libm_power = np.frompyfunc(math.pow, 2, 1)
+
+
+def _scalar_power(x, p):
+    return _libm_power(x, p).astype(float)
+
+
+def _pair_terms(diff, alpha, delta, r0, v, PT, others, power=np.power):
+    """
+    Evaluate the pair terms for a block of agent pairs
+
+    Mirrors calculate_distance, calculate_aij, calculate_gij and calculate_rho_ij
+    operation for operation, so with power=_scalar_power every entry rounds
+    exactly like the original per-pair loop.
+
+    Returns:
+        tuple: (rij, aij, gij, rho_ij) with rho_ij zeroed for non-neighbors and self-pairs
+    """
+    beta = alpha * (2**delta - 1)
+    rij = np.sqrt(power(diff[..., 0], 2) + power(diff[..., 1], 2))
+    scaled = power(rij / r0, v)
+    aij = np.exp(-beta * scaled)
+    near = power(rij, 2) + r0**2
+    gij = rij / np.sqrt(near)
+    rho_ij = (
+        (
+            -beta * v * power(rij, v + 2)
+            - beta * v * (r0**2) * power(rij, v)
+            + r0 ** (v + 2)
+        )
+        * np.exp(-beta * scaled)
+        / np.sqrt(power(near, 3))
+    )
+    rho_ij = np.where(others & (aij >= PT), rho_ij, 0.0)
+    return rij, aij, gij, rho_ij
+
+
+def _control_input(diff, rij, rho_ij, others):
+    """Sum rho_ij * e_ij over j, in order of j like the original loop"""
+    # e_ij = (qi - qj) / sqrt(rij), left at zero on the diagonal
+    eij = np.divide(
+        diff,
+        np.sqrt(rij)[..., None],
+        out=np.zeros_like(diff),
+        where=others[..., None],
+    )
+    # cumsum adds strictly left to right, np.sum would reorder the additions
+    return np.cumsum(rho_ij[..., None] * eij, axis=-2)[..., -1, :]
+
+
+def formation_step(
+    positions, alpha, delta, r0, v, PT, mode="jacobi", step_size=1.0, on_agent=None
+):
+    """
+    Advance the swarm by one formation control step
+
+    In "jacobi" mode every agent moves against the same snapshot of the swarm
+    and all pairs are evaluated as N x N array expressions. "sequential" mode
+    moves the agents one after another against the already-moved positions of
+    the earlier agents (Gauss-Seidel) like the original per-pair loop and
+    reproduces its trajectories bit for bit; each agent's row is still vectorized.
+
+    Leading axes are batch axes: a B x N x 2 array advances B independent
+    swarms at once, each as if it were stepped on its own.
+
+    Parameters:
+        positions (numpy.ndarray): The (...) x N x 2 positions of the swarm, updated in place
+        alpha (float): System parameter about antenna characteristics
+        delta (float): The required application data rate
+        r0 (float): Reference distance value
+        v (float): Path loss exponent
+        PT (float): The reception probability threshold
+        mode (str): "jacobi" or "sequential"
+        step_size (float): The factor applied to the control input before moving
+        on_agent (callable): Called in "sequential" mode as on_agent(i, distances_matrix,
+            neighbor_agent_matrix, communication_qualities_matrix) once agent i's row
+            is written and agent i has moved
+
+    Returns:
+        tuple: (control, distances_matrix, neighbor_agent_matrix, communication_qualities_matrix)
+            with control the (...) x N x 2 displacement applied to each agent and the
+            (...) x N x N matrices holding rij, aij and gij * aij (zero on the diagonal)
+    """
+    if mode not in UPDATE_MODES:
+        raise ValueError(
+            f"Unknown update mode {mode!r}, expected one of {UPDATE_MODES}"
+        )
+
+    swarm_size = positions.shape[-2]
+    others = ~np.eye(swarm_size, dtype=bool)
+
+    if mode == "jacobi":
+        diff = positions[..., :, None, :] - positions[..., None, :, :]
+        rij, aij, gij, rho_ij = _pair_terms(diff, alpha, delta, r0, v, PT, others)
+        control = step_size * _control_input(diff, rij, rho_ij, others)
+        positions += control
+        return (
+            control,
+            np.where(others, rij, 0.0),
+            np.where(others, aij, 0.0),
+            np.where(others, gij * aij, 0.0),
+        )
+
+    control = np.zeros(positions.shape)
+    pair_shape = positions.shape[:-2] + (swarm_size, swarm_size)
+    distances_matrix = np.zeros(pair_shape)
+    neighbor_agent_matrix = np.zeros(pair_shape)
+    communication_qualities_matrix = np.zeros(pair_shape)
+    for i in range(swarm_size):
+        diff = positions[..., i, None, :] - positions
+        rij, aij, gij, rho_ij = _pair_terms(
+            diff, alpha, delta, r0, v, PT, others[i], power=_scalar_power
+        )
+        control[..., i, :] = step_size * _control_input(diff, rij, rho_ij, others[i])
+
+        # Agent i's row overwrites the symmetric entries recorded by earlier agents
+        mask = others[i]
+        for matrix, values in (
+            (distances_matrix, rij),
+            (neighbor_agent_matrix, aij),
+            (communication_qualities_matrix, gij * aij),
+        ):
+            matrix[..., i, mask] = values[..., mask]
+            matrix[..., mask, i] = values[..., mask]
+
+        positions[..., i, :] += control[..., i, :]
+        if on_agent is not None:
+            on_agent(
+                i,
+                distances_matrix,
+                neighbor_agent_matrix,
+                communication_qualities_matrix,
+            )
+    return (
+        control,
+        distances_matrix,
+        neighbor_agent_matrix,
+        communication_qualities_matrix,
+    )
+
+
+def communication_radius(alpha, delta, r0, v, PT):
+    """
+    Calculate the distance beyond which aij drops below PT
+
+    Pairs further apart neither exert a control input nor count as neighbors.
+
+    Returns:
+        float: The radius r with aij(r) = PT
+    """
+    return r0 * (-np.log(PT) / (alpha * (2**delta - 1))) ** (1 / v)
+
+
+class CommunicationGraph:
+    """Sparse graph of the agent pairs within communication range, each pair once"""
+
+    def __init__(self, swarm_size, i, j, distances, aij, qualities):
+        """
+        Parameters:
+            swarm_size (int): The number of agents
+            i (numpy.ndarray): The first agent of each pair
+            j (numpy.ndarray): The second agent of each pair
+            distances (numpy.ndarray): The rij of each pair
+            aij (numpy.ndarray): The aij of each pair
+            qualities (numpy.ndarray): The gij * aij of each pair
+        """
+        self.swarm_size = swarm_size
+        self.i = i
+        self.j = j
+        self.distances = distances
+        self.aij = aij
+        self.qualities = qualities
+
+    def __len__(self):
+        return len(self.i)
+
+    def to_dense(self):
+        """
+        Expand the graph into N x N matrices, zero for pairs out of range
+
+        Returns:
+            tuple: (distances_matrix, neighbor_agent_matrix, communication_qualities_matrix)
+        """
+        matrices = []
+        for values in (self.distances, self.aij, self.qualities):
+            matrix = np.zeros((self.swarm_size, self.swarm_size))
+            matrix[self.i, self.j] = values
+            matrix[self.j, self.i] = values
+            matrices.append(matrix)
+        return tuple(matrices)
+
+
+def neighbor_pairs(positions, radius, max_candidates=1 << 20):
+    """
+    Find every pair of agents closer than radius with a cell list
+
+    Parameters:
+        positions (numpy.ndarray): The N x D positions
+        radius (float): The query radius
+        max_candidates (int): The maximum number of candidate pairs tested per chunk
+
+    Returns:
+        tuple: (i, j) with each pair once
+    """
+    if len(positions) < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Cover the swarm with cells no smaller than the radius, and no more cells
+    # than agents however far the swarm is spread
+    lower, upper = positions.min(axis=0), positions.max(axis=0)
+    span = upper - lower + radius
+    cell_size = max(radius, (np.prod(span) / len(positions)) ** (1 / len(span)))
+    index = SpatialHash(cell_size, np.stack([lower, upper], axis=1), max_candidates)
+
+    chunks = [(i, j) for i, j, _, _ in index.build(positions).iter_pairs(radius)]
+    if not chunks:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return (
+        np.concatenate([i for i, _ in chunks]),
+        np.concatenate([j for _, j in chunks]),
+    )
+
+
+def sparse_formation_step(positions, alpha, delta, r0, v, PT, step_size=1.0):
+    """
+    Advance the swarm by one synchronous (jacobi) step over the sparse pair graph
+
+    Only pairs within communication_radius are evaluated, found with a cell
+    list, so time and memory grow with the number of neighbor pairs instead
+    of N^2. Matches formation_step in "jacobi" mode up to floating-point
+    rounding.
+
+    Parameters:
+        positions (numpy.ndarray): The N x 2 positions of the swarm, updated in place
+        alpha (float): System parameter about antenna characteristics
+        delta (float): The required application data rate
+        r0 (float): Reference distance value
+        v (float): Path loss exponent
+        PT (float): The reception probability threshold
+        step_size (float): The factor applied to the control input before moving
+
+    Returns:
+        tuple: (control, graph) with control the N x 2 displacement applied to each
+            agent and graph the CommunicationGraph of the pairs in range
+    """
+    swarm_size = len(positions)
+    # Pad the radius so pairs at exactly aij = PT are not lost to rounding
+    radius = communication_radius(alpha, delta, r0, v, PT) * (1 + 1e-9)
+    i, j = neighbor_pairs(positions, radius)
+
+    diff = positions[i] - positions[j]
+    rij, aij, gij, rho_ij = _pair_terms(diff, alpha, delta, r0, v, PT, True)
+
+    # Each pair pushes i along e_ij and j along e_ji = -e_ij
+    force = rho_ij[:, None] * diff / np.sqrt(rij)[:, None]
+    control = step_size * np.stack(
+        [
+            np.bincount(i, force[:, k], swarm_size)
+            - np.bincount(j, force[:, k], swarm_size)
+            for k in range(positions.shape[1])
+        ],
+        axis=1,
+    )
+    positions += control
+    return control, CommunicationGraph(swarm_size, i, j, rij, aij, gij * aij)
@@ -0,0 +1,290 @@
+import numpy as np
+
+
+def _neighbor_mask(neighbor_agent_matrix, PT):
+    """Off-diagonal pairs whose aij is above the reception threshold"""
+    mask = neighbor_agent_matrix > PT
+    np.fill_diagonal(mask, False)
+    return mask
+
+
+def calculate_Jn(communication_qualities_matrix, neighbor_agent_matrix, PT):
+    """
+    Calculate the Jn (average communication performance indicator) value
+
+    Parameters:
+        communication_qualities_matrix (numpy.ndarray): The communication qualities matrix among agents
+        neighbor_agent_matrix (numpy.ndarray): The neighbor_agent matrix which is adjacency matrix of aij value
+        PT (float): The reception probability threshold
+
+    Returns:
+        float: The calculated Jn value, nan when no agent has a neighbor
+    """
+    mask = _neighbor_mask(neighbor_agent_matrix, PT)
+    count = np.count_nonzero(mask)
+    return communication_qualities_matrix[mask].sum() / count if count else np.nan
+
+
+def calculate_rn(distances_matrix, neighbor_agent_matrix, PT):
+    """
+    Calculate the rn (average neighboring distance performance indicator) value
+
+    Parameters:
+        distances_matrix (numpy.ndarray): The distances matrix among agents
+        neighbor_agent_matrix (numpy.ndarray): The neighbor_agent matrix which is adjacency matrix of aij value
+        PT (float): The reception probability threshold
+
+    Returns:
+        float: The calculated rn value, nan when no agent has a neighbor
+    """
+    mask = _neighbor_mask(neighbor_agent_matrix, PT)
+    count = np.count_nonzero(mask)
+    return distances_matrix[mask].sum() / count if count else np.nan
+
+
+def calculate_indicators(
+    distances_matrix, neighbor_agent_matrix, communication_qualities_matrix, PT
+):
+    """
+    Calculate Jn and rn of one swarm or of a batch of swarms at once
+
+    Sums each pair once over the upper triangle like FormationMetrics.update,
+    leading axes of the matrices are batch axes.
+
+    Parameters:
+        distances_matrix (numpy.ndarray): The (...) x N x N distances among agents
+        neighbor_agent_matrix (numpy.ndarray): The (...) x N x N aij values
+        communication_qualities_matrix (numpy.ndarray): The (...) x N x N gij * aij values
+        PT (float): The reception probability threshold
+
+    Returns:
+        tuple: (Jn, rn) with the shape of the leading axes, nan where no agent has a neighbor
+    """
+    upper = np.triu(np.ones(neighbor_agent_matrix.shape[-2:], dtype=bool), k=1)
+    neighbors = (neighbor_agent_matrix > PT) & upper
+    count = np.count_nonzero(neighbors, axis=(-2, -1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        Jn = (
+            np.where(neighbors, communication_qualities_matrix, 0.0).sum(axis=(-2, -1))
+            / count
+        )
+        rn = np.where(neighbors, distances_matrix, 0.0).sum(axis=(-2, -1)) / count
+    return Jn, rn
+
+
+class FormationMetrics:
+    """Track the Jn and rn performance indicators of a swarm as a streaming series"""
+
+    def __init__(self, PT, resync_every=1000):
+        """
+        Parameters:
+            PT (float): The reception probability threshold
+            resync_every (int): The number of incremental updates after which the
+                running sums are recomputed from scratch to shed rounding drift
+        """
+        self.PT = PT
+        self.resync_every = resync_every
+
+        # Per-pair contributions, only the upper triangle (i < j) is used
+        self._neighbors = None
+        self._qualities = None
+        self._distances = None
+        self._quality_sum = 0.0
+        self._distance_sum = 0.0
+        self._count = 0
+        self._updates = 0
+
+        self.t = []
+        self.Jn = []
+        self.rn = []
+        self._listeners = []
+
+    @property
+    def current(self):
+        """Return the (Jn, rn) of the latest update, nan when no agent has a neighbor"""
+        if not self._count:
+            return np.nan, np.nan
+        return (
+            float(self._quality_sum / self._count),
+            float(self._distance_sum / self._count),
+        )
+
+    def update(
+        self, distances_matrix, neighbor_agent_matrix, communication_qualities_matrix
+    ):
+        """
+        Recompute Jn and rn from the full pair matrices
+
+        Parameters:
+            distances_matrix (numpy.ndarray): The N x N distances among agents
+            neighbor_agent_matrix (numpy.ndarray): The N x N aij values
+            communication_qualities_matrix (numpy.ndarray): The N x N gij * aij values
+
+        Returns:
+            tuple: The current (Jn, rn)
+        """
+        upper = np.triu(np.ones(neighbor_agent_matrix.shape, dtype=bool), k=1)
+        self._neighbors = (neighbor_agent_matrix > self.PT) & upper
+        self._qualities = np.where(self._neighbors, communication_qualities_matrix, 0.0)
+        self._distances = np.where(self._neighbors, distances_matrix, 0.0)
+        self._resync()
+        return self.current
+
+    def update_graph(self, graph):
+        """
+        Recompute Jn and rn from a sparse CommunicationGraph
+
+        Costs O(pairs in range) time and memory. Keeps no per-pair state, so
+        update_pairs needs a dense update first.
+
+        Parameters:
+            graph (CommunicationGraph): The pairs within communication range
+
+        Returns:
+            tuple: The current (Jn, rn)
+        """
+        neighbors = graph.aij > self.PT
+        self._neighbors = self._qualities = self._distances = None
+        self._count = int(np.count_nonzero(neighbors))
+        self._quality_sum = float(graph.qualities[neighbors].sum())
+        self._distance_sum = float(graph.distances[neighbors].sum())
+        self._updates = 0
+        return self.current
+
+    def update_pairs(self, i, j, distances, aij, qualities):
+        """
+        Update Jn and rn from the pairs that changed since the last update
+
+        Costs O(1) per pair instead of a pass over the whole matrix. Either
+        orientation of a pair is accepted, duplicate pairs keep the last values.
+
+        Parameters:
+            i (numpy.ndarray): The first agent of each changed pair
+            j (numpy.ndarray): The second agent of each changed pair
+            distances (numpy.ndarray): The new rij of each pair
+            aij (numpy.ndarray): The new aij of each pair
+            qualities (numpy.ndarray): The new gij * aij of each pair
+
+        Returns:
+            tuple: The current (Jn, rn)
+        """
+        if self._neighbors is None:
+            raise RuntimeError("update_pairs needs a dense update first")
+
+        i, j = np.asarray(i), np.asarray(j)
+        lo, hi = np.minimum(i, j), np.maximum(i, j)
+        # Keep the last occurrence of every pair and drop self-pairs
+        keys = lo * len(self._neighbors) + hi
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = len(keys) - 1 - last
+        keep = keep[lo[keep] != hi[keep]]
+        return self._set_pairs(
+            lo[keep],
+            hi[keep],
+            np.asarray(distances)[keep],
+            np.asarray(aij)[keep],
+            np.asarray(qualities)[keep],
+        )
+
+    def update_agents(
+        self,
+        agents,
+        distances_matrix,
+        neighbor_agent_matrix,
+        communication_qualities_matrix,
+    ):
+        """
+        Update Jn and rn after the given agents moved
+
+        Only the pairs involving a moved agent are read from the matrices, so
+        after a single agent moved this costs O(N) instead of O(N^2).
+        FormationController calls it in sequential mode after every agent's move.
+
+        Parameters:
+            agents (list): The indices of the agents that moved, or a single index
+            distances_matrix (numpy.ndarray): The N x N distances among agents
+            neighbor_agent_matrix (numpy.ndarray): The N x N aij values
+            communication_qualities_matrix (numpy.ndarray): The N x N gij * aij values
+
+        Returns:
+            tuple: The current (Jn, rn)
+        """
+        if self._neighbors is None:
+            raise RuntimeError("update_agents needs a dense update first")
+
+        agents = np.unique(np.asarray(agents))
+        others = np.arange(len(distances_matrix))
+        moved = np.zeros(len(distances_matrix), dtype=bool)
+        moved[agents] = True
+        # Each pair once: with an agent that stayed, or with a later moved one
+        keep = ~moved[None, :] | (others[None, :] > agents[:, None])
+        i = np.broadcast_to(agents[:, None], keep.shape)[keep]
+        j = np.broadcast_to(others[None, :], keep.shape)[keep]
+        return self._set_pairs(
+            np.minimum(i, j),
+            np.maximum(i, j),
+            distances_matrix[i, j],
+            neighbor_agent_matrix[i, j],
+            communication_qualities_matrix[i, j],
+        )
+
+    def _set_pairs(self, lo, hi, distances, aij, qualities):
+        # Each (lo, hi) pair at most once, lo < hi
+        neighbors = aij > self.PT
+        new_qualities = np.where(neighbors, qualities, 0.0)
+        new_distances = np.where(neighbors, distances, 0.0)
+
+        self._count += int(neighbors.sum()) - int(self._neighbors[lo, hi].sum())
+        self._quality_sum += new_qualities.sum() - self._qualities[lo, hi].sum()
+        self._distance_sum += new_distances.sum() - self._distances[lo, hi].sum()
+        self._neighbors[lo, hi] = neighbors
+        self._qualities[lo, hi] = new_qualities
+        self._distances[lo, hi] = new_distances
+
+        self._updates += 1
+        if self._updates >= self.resync_every:
+            self._resync()
+        return self.current
+
+    def record(self, t=None):
+        """
+        Append the current Jn and rn to the series and notify the subscribers
+
+        Parameters:
+            t (float): The time stamp of the sample, defaults to its index
+
+        Returns:
+            tuple: The recorded (Jn, rn)
+        """
+        Jn, rn = self.current
+        t = len(self.t) if t is None else t
+        self.t.append(t)
+        self.Jn.append(Jn)
+        self.rn.append(rn)
+        for callback in self._listeners:
+            callback(t, Jn, rn)
+        return Jn, rn
+
+    def subscribe(self, callback):
+        """Call callback(t, Jn, rn) for every recorded sample"""
+        self._listeners.append(callback)
+
+    def series(self):
+        """Return the recorded samples as arrays t, Jn and rn"""
+        return {
+            "t": np.array(self.t, dtype=float),
+            "Jn": np.array(self.Jn, dtype=float),
+            "rn": np.array(self.rn, dtype=float),
+        }
+
+    def clear(self):
+        """Forget the recorded samples"""
+        self.t.clear()
+        self.Jn.clear()
+        self.rn.clear()
+
+    def _resync(self):
+        self._count = int(self._neighbors.sum())
+        self._quality_sum = float(self._qualities.sum())
+        self._distance_sum = float(self._distances.sum())
+        self._updates = 0
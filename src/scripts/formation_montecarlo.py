@@ -0,0 +1,456 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.formation_batch import FormationBatch, random_layouts
+from scripts.formation_kernel import UPDATE_MODES
+from scripts.formation_sim import (
+    ALPHA,
+    MAX_ITER,
+    PT,
+    R0,
+    ConvergenceDetector,
+    V,
+)
+from utils.checkpoint import load_checkpoint, save_checkpoint
+
+# Parameters drawn once per task as (low, high), alpha log-uniformly and the
+# others uniformly; equal bounds fix a parameter
+PARAMETER_RANGES = {
+    "alpha": (ALPHA / 2, ALPHA * 2),
+    "v": (V - 0.5, V + 0.5),
+    "r0": (R0 - 1.0, R0 + 1.0),
+    "PT": (PT - 0.04, PT + 0.02),
+}
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+RESULT_COLUMNS = {
+    "task": np.int64,
+    "swarm": np.int64,
+    "alpha": float,
+    "v": float,
+    "r0": float,
+    "PT": float,
+    "converged": bool,
+    "iterations": np.int64,
+    "convergence_time": float,
+    "Jn": float,
+    "rn": float,
+}
+
+
+def task_rng(seed, task):
+    """
+    Return the random generator of a task
+
+    The stream depends only on the sweep seed and the task number, not on the
+    number of tasks, workers or the order they finish in.
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(task,)))
+
+
+def draw_parameters(rng, ranges):
+    """
+    Draw one value of every parameter, alpha log-uniformly and the others uniformly
+
+    Parameters:
+        rng (numpy.random.Generator): The random generator
+        ranges (dict): The (low, high) range of each drawn parameter
+
+    Returns:
+        dict: The drawn parameters
+    """
+    params = {}
+    for name, (low, high) in ranges.items():
+        if name == "alpha":
+            params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            params[name] = float(rng.uniform(low, high))
+    return params
+
+
+def draw_task(seed, task, ranges, runs, jitter):
+    """
+    Draw the parameters and initial layouts of a task
+
+    Parameters:
+        seed (int): The sweep seed
+        task (int): The task number
+        ranges (dict): The (low, high) range of each drawn parameter
+        runs (int): The number of layouts
+        jitter (float): The standard deviation of the layout offsets
+
+    Returns:
+        tuple: (params, positions) with params a dict and positions B x N x 2
+    """
+    rng = task_rng(seed, task)
+    params = draw_parameters(rng, ranges)
+    return params, random_layouts(runs, jitter=jitter, seed=rng)
+
+
+def run_task(task, config):
+    """
+    Run the formation batch of one task in a worker
+
+    Parameters:
+        task (int): The task number
+        config (dict): The sweep configuration, see run_sweep
+
+    Returns:
+        dict: The result columns of the task's runs
+    """
+    params, positions = draw_task(
+        config["seed"],
+        task,
+        config["ranges"],
+        config["runs_per_task"],
+        config["jitter"],
+    )
+    tolerance = config["tolerance"]
+    batch = FormationBatch(
+        positions,
+        mode=config["mode"],
+        step_size=config["step_size"],
+        convergence=None if tolerance is None else ConvergenceDetector(*tolerance),
+        **params,
+    )
+    batch.run(max_iter=config["max_iter"])
+
+    summary = batch.summary()
+    runs = len(summary)
+    return {
+        "task": np.full(runs, task),
+        "swarm": summary["swarm"].to_numpy(),
+        **{name: np.full(runs, params.get(name, np.nan)) for name in PARAMETER_RANGES},
+        "converged": summary["converged"].to_numpy(),
+        "iterations": summary["iterations"].to_numpy(),
+        "convergence_time": summary["convergence_time"].to_numpy(),
+        "Jn": summary["Jn"].to_numpy(),
+        "rn": summary["rn"].to_numpy(),
+    }
+
+
+def _run_task(args):
+    return args[0], run_task(*args)
+
+
+def _concat(chunks):
+    return {
+        name: np.concatenate(
+            [np.asarray(chunk[name], dtype=dtype) for chunk in chunks]
+            or [np.zeros(0, dtype=dtype)]
+        )
+        for name, dtype in RESULT_COLUMNS.items()
+    }
+
+
+def _save(path, config, chunks, completed):
+    save_checkpoint(
+        path,
+        _concat(chunks),
+        {
+            "kind": "formation_montecarlo",
+            "config": config,
+            "completed": sorted(completed),
+        },
+    )
+
+
+def sweep_config(
+    runs_per_task=32,
+    seed=0,
+    ranges=None,
+    jitter=5.0,
+    max_iter=MAX_ITER,
+    mode="jacobi",
+    step_size=1.0,
+    tolerance=None,
+):
+    """
+    Collect the settings that decide the results of every task of a sweep
+
+    Takes the parameters of run_sweep that change the results, that is all but
+    tasks, workers and the checkpoint ones.
+
+    Returns:
+        dict: The JSON-serializable configuration stored with the checkpoint
+    """
+    return {
+        "seed": seed,
+        "runs_per_task": runs_per_task,
+        "ranges": {
+            name: [float(low), float(high)]
+            for name, (low, high) in (ranges or PARAMETER_RANGES).items()
+        },
+        "jitter": jitter,
+        "max_iter": max_iter,
+        "mode": mode,
+        "step_size": step_size,
+        "tolerance": None if tolerance is None else list(tolerance),
+    }
+
+
+def default_checkpoint(config):
+    """
+    Name the checkpoint of a sweep after its configuration
+
+    Sweeps with different settings get different files, so one never tries to
+    resume from the checkpoint of another.
+
+    Parameters:
+        config (dict): The configuration returned by sweep_config
+
+    Returns:
+        str: The checkpoint file name in the working directory
+    """
+    digest = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+    return f"formation_montecarlo-{digest[:12]}.ckpt"
+
+
+def run_sweep(
+    tasks,
+    runs_per_task=32,
+    seed=0,
+    ranges=None,
+    jitter=5.0,
+    max_iter=MAX_ITER,
+    mode="jacobi",
+    step_size=1.0,
+    tolerance=None,
+    workers=None,
+    checkpoint=None,
+    checkpoint_interval=10.0,
+):
+    """
+    Run formation batches over a process pool and collect one row per run
+
+    Every task draws one parameter set and runs_per_task initial layouts from
+    its own seed, so a sweep gives the same results however many workers run
+    it. With a checkpoint file, completed tasks are written to it at most
+    every checkpoint_interval seconds and when the sweep ends or is
+    interrupted, and a sweep started on an existing checkpoint only runs the
+    missing tasks.
+
+    Parameters:
+        tasks (int): The number of tasks
+        runs_per_task (int): The number of initial layouts per task
+        seed (int): The sweep seed
+        ranges (dict): The (low, high) range of each drawn parameter, PARAMETER_RANGES by default
+        jitter (float): The standard deviation of the layout offsets
+        max_iter (int): The most iterations of a run
+        mode (str): The update mode of formation_step
+        step_size (float): The factor applied to the control input
+        tolerance (tuple): (jn_tol, rn_tol, window) of a ConvergenceDetector, None for
+            the default convergence test
+        workers (int): The number of worker processes, defaults to the CPU count
+        checkpoint (str): The checkpoint file, None to keep results in memory only
+        checkpoint_interval (float): The least number of seconds between checkpoint writes
+
+    Returns:
+        pandas.DataFrame: One row per run with the RESULT_COLUMNS, sorted by task and swarm
+    """
+    config = sweep_config(
+        runs_per_task, seed, ranges, jitter, max_iter, mode, step_size, tolerance
+    )
+
+    chunks = []
+    completed = set()
+    if checkpoint is not None and os.path.exists(checkpoint):
+        arrays, meta = load_checkpoint(checkpoint, mmap_mode=None)
+        if meta.get("kind") != "formation_montecarlo":
+            raise ValueError(f"{checkpoint} is not a Monte-Carlo checkpoint")
+        if meta["config"] != config:
+            raise ValueError(
+                f"{checkpoint} was written by a sweep with a different configuration"
+            )
+        chunks.append(arrays)
+        completed = set(meta["completed"])
+
+    pending = [task for task in range(tasks) if task not in completed]
+    if pending:
+        workers = min(workers or os.cpu_count(), len(pending))
+        last_save = time.monotonic()
+        with mp.Pool(workers) as pool:
+            try:
+                for task, result in pool.imap_unordered(
+                    _run_task, [(task, config) for task in pending]
+                ):
+                    chunks.append(result)
+                    completed.add(task)
+                    now = time.monotonic()
+                    if (
+                        checkpoint is not None
+                        and now - last_save >= checkpoint_interval
+                    ):
+                        _save(checkpoint, config, chunks, completed)
+                        last_save = now
+            finally:
+                if checkpoint is not None:
+                    _save(checkpoint, config, chunks, completed)
+
+    results = pd.DataFrame(_concat(chunks))
+    results = results[results["task"] < tasks]
+    return results.sort_values(["task", "swarm"], ignore_index=True)
+
+
+def aggregate(results, percentiles=PERCENTILES):
+    """
+    Summarize the runs of a sweep
+
+    Parameters:
+        results (pandas.DataFrame): The runs returned by run_sweep
+        percentiles (tuple): The percentiles to report
+
+    Returns:
+        dict: The run counts, the failure-to-converge rate, and the count, mean, std
+            and percentiles of the iterations, convergence time, Jn and rn of the
+            converged runs
+    """
+    converged = results[results["converged"]]
+    statistics = {
+        "runs": len(results),
+        "tasks": int(results["task"].nunique()),
+        "converged": len(converged),
+        "failure_rate": 1 - len(converged) / len(results) if len(results) else None,
+        "metrics": {},
+    }
+    for name in ("iterations", "convergence_time", "Jn", "rn"):
+        values = converged[name].to_numpy(dtype=float)
+        values = values[np.isfinite(values)]
+        entry = {"count": len(values)}
+        if len(values):
+            entry["mean"] = float(values.mean())
+            entry["std"] = float(values.std())
+            for q, value in zip(percentiles, np.percentile(values, percentiles)):
+                entry[f"p{q}"] = float(value)
+        statistics["metrics"][name] = entry
+    return statistics
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Collect formation convergence statistics over random "
+        "initial layouts and parameters"
+    )
+    parser.add_argument("--tasks", type=int, default=100)
+    parser.add_argument(
+        "--runs-per-task",
+        type=int,
+        default=32,
+        help="Initial layouts run as one batch per parameter draw",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    for name, (low, high) in PARAMETER_RANGES.items():
+        parser.add_argument(
+            f"--{name.lower()}",
+            type=float,
+            nargs=2,
+            default=[low, high],
+            metavar=("LOW", "HIGH"),
+            help=f"Range of {name}"
+            + (", drawn log-uniformly" if name == "alpha" else ""),
+        )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=5.0,
+        help="Standard deviation of the random offsets from the default layout",
+    )
+    parser.add_argument("--max-iter", type=int, default=MAX_ITER)
+    parser.add_argument("--update", choices=UPDATE_MODES, default="jacobi")
+    parser.add_argument("--step-size", type=float, default=1.0)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=None,
+        help="Converge once Jn varies less than this over --window iterations",
+    )
+    parser.add_argument("--rn-tolerance", type=float, default=1e-3)
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Checkpoint of the completed tasks, an interrupted sweep resumes from it; "
+        "named after the sweep configuration by default",
+    )
+    parser.add_argument(
+        "--results",
+        default="formation_montecarlo.json",
+        help="Output JSON of the aggregated statistics",
+    )
+    parser.add_argument(
+        "--runs",
+        default=None,
+        help="Output CSV of every run, not written by default",
+    )
+    args = parser.parse_args()
+
+    settings = {
+        "runs_per_task": args.runs_per_task,
+        "seed": args.seed,
+        "ranges": {name: getattr(args, name.lower()) for name in PARAMETER_RANGES},
+        "jitter": args.jitter,
+        "max_iter": args.max_iter,
+        "mode": args.update,
+        "step_size": args.step_size,
+        "tolerance": (
+            None
+            if args.tolerance is None
+            else (args.tolerance, args.rn_tolerance, args.window)
+        ),
+    }
+    if args.checkpoint is None:
+        args.checkpoint = default_checkpoint(sweep_config(**settings))
+
+    start = time.perf_counter()
+    try:
+        results = run_sweep(
+            args.tasks,
+            workers=args.workers,
+            checkpoint=args.checkpoint,
+            **settings,
+        )
+    except KeyboardInterrupt:
+        print(f"\n[INFO] Sweep interrupted, rerun to resume from {args.checkpoint}")
+        return
+    elapsed = time.perf_counter() - start
+
+    statistics = aggregate(results)
+    with open(args.results, "w") as f:
+        json.dump(statistics, f, indent=2)
+    if args.runs:
+        results.to_csv(args.runs, index=False)
+
+    iterations = statistics["metrics"]["iterations"]
+    if statistics["runs"]:
+        print(
+            f"[INFO] {statistics['runs']} runs in {statistics['tasks']} tasks, "
+            f"{statistics['converged']} converged "
+            f"(failure rate {statistics['failure_rate']:.1%}) in {elapsed:.2f} s"
+        )
+    else:
+        print(f"[INFO] No runs in {elapsed:.2f} s")
+    if iterations["count"]:
+        print(
+            f"[INFO] Iterations to converge: median {iterations['p50']:g}, "
+            f"p95 {iterations['p95']:g}"
+        )
+    print(f"[INFO] Wrote {args.results}")
+
+
+if __name__ == "__main__":
+    main()
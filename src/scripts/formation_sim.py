@@ -0,0 +1,701 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.formation_kernel import (
+    UPDATE_MODES,
+    formation_step,
+    sparse_formation_step,
+)
+from scripts.formation_metrics import FormationMetrics
+from utils.checkpoint import load_checkpoint, save_checkpoint
+from utils.geo_transform import BoxTransform, format_coordinates
+from utils.telemetry_sinks import make_sink
+from utils.trajectory_store import TrajectoryStore
+
+# Default formation parameters
+ALPHA = 10 ** (-5)  # System parameter about antenna characteristics
+DELTA = 2  # Required application data rate
+V = 3  # Path loss exponent
+R0 = 5  # Reference distance
+PT = 0.94  # Threshold value for communication quality
+
+# Default initial agent positions and swarm destination
+INITIAL_POSITIONS = np.array(
+    [[-5, 14], [-5, -19], [0, 0], [35, -4], [68, 0], [72, 13], [72, -18]], dtype=float
+)
+DESTINATION = np.array([35, 100], dtype=float)
+
+MAX_ITER = 500  # Maximum number of iterations
+
+# Swarms at least this large keep only the pairs in communication range when
+# updating in jacobi mode (about 5x faster from 500 agents, 70x from 2000)
+SPARSE_MIN_AGENTS = 200
+
+# The formation is complete once this many consecutive Jn values, rounded to
+# JN_DECIMALS, are the same
+CONVERGENCE_WINDOW = 20
+JN_DECIMALS = 4
+
+
+class AdaptiveStepSize:
+    """Step-size schedule that grows while successive control inputs agree"""
+
+    def __init__(
+        self,
+        initial=1.0,
+        growth=1.2,
+        shrink=0.5,
+        min_step=1 / 64,
+        max_step=100.0,
+        agreement=0.5,
+    ):
+        """
+        Far from equilibrium the control input keeps its direction from one
+        iteration to the next, so the step grows. Near equilibrium, or when a
+        step overshoots, the input turns back and the step shrinks.
+
+        Parameters:
+            initial (float): The first step size
+            growth (float): The factor applied while the inputs agree
+            shrink (float): The factor applied when they do not
+            min_step (float): The smallest step size
+            max_step (float): The largest step size
+            agreement (float): The cosine between successive inputs above which they agree
+        """
+        self.initial = initial
+        self.growth = growth
+        self.shrink = shrink
+        self.min_step = min_step
+        self.max_step = max_step
+        self.agreement = agreement
+        self.reset()
+
+    def reset(self):
+        self.step = self.initial
+        self.previous = None
+
+    def update(self, control):
+        """
+        Adapt the step size to the latest applied control input
+
+        Parameters:
+            control (numpy.ndarray): The N x 2 displacement of the last iteration
+
+        Returns:
+            float: The step size for the next iteration
+        """
+        if self.previous is not None:
+            norm = np.linalg.norm(control) * np.linalg.norm(self.previous)
+            cosine = np.vdot(control, self.previous) / norm if norm > 0 else 1.0
+            if cosine > self.agreement:
+                self.step = min(self.step * self.growth, self.max_step)
+            else:
+                self.step = max(self.step * self.shrink, self.min_step)
+        self.previous = control.copy()
+        return self.step
+
+
+class ConvergenceDetector:
+    """Detect convergence once Jn and rn stay within a tolerance over a window"""
+
+    def __init__(self, jn_tol=1e-5, rn_tol=1e-3, window=5):
+        """
+        Parameters:
+            jn_tol (float): The largest spread of Jn over the window
+            rn_tol (float): The largest spread of rn over the window
+            window (int): The number of consecutive iterations compared
+        """
+        self.jn_tol = jn_tol
+        self.rn_tol = rn_tol
+        self.window = window
+
+    def __call__(self, Jn, rn):
+        """
+        Parameters:
+            Jn (list): The unrounded Jn of every iteration
+            rn (list): The unrounded rn of every iteration
+
+        Returns:
+            bool: Whether the formation has converged
+        """
+        if len(Jn) < self.window:
+            return False
+        Jn, rn = Jn[-self.window :], rn[-self.window :]
+        return max(Jn) - min(Jn) <= self.jn_tol and max(rn) - min(rn) <= self.rn_tol
+
+
+class CoordinateConverter(BoxTransform):
+    def __init__(self):
+        # Map the simulation bounds onto a 0.004 x 0.004 degree box
+        super().__init__(
+            x_range=(-40, 25),
+            y_range=(-25, 75),
+            lon_range=(-81.052, -81.048),
+            lat_range=(29.187, 29.191),
+        )
+        # Reference coordinates (center of the area)
+        self.ref_lat = 29.189  # center latitude
+        self.ref_lon = -81.050  # center longitude
+
+
+def find_closest_agent(swarm_position, swarm_centroid):
+    """
+    Find the index of the agent with the minimum distance to the destination
+
+    Parameters:
+        swarm_position (numpy.ndarray): The positions of the swarm
+        swarm_centroid (numpy.ndarray): The centroid of the swarm
+
+    Returns:
+        int: The index of the agent with the minimum distance to the destination
+    """
+    # Calculate the Euclidean distance from each agent to the destination
+    distances_matrix = np.sqrt(np.sum((swarm_position - swarm_centroid) ** 2, axis=1))
+
+    # Find the index of the agent with the minimum distance
+    closest_agent_index = np.argmin(distances_matrix)
+
+    return closest_agent_index
+
+
+class FormationController:
+    """Communication-aware formation controller, independent of any GUI"""
+
+    def __init__(
+        self,
+        positions=INITIAL_POSITIONS,
+        destination=DESTINATION,
+        alpha=ALPHA,
+        delta=DELTA,
+        v=V,
+        r0=R0,
+        PT=PT,
+        mode="sequential",
+        neighbors="auto",
+        step_size=1.0,
+        adaptive_step=False,
+        convergence=None,
+        trajectory_capacity=None,
+        decimate_trajectory=False,
+        sinks=None,
+        observers=None,
+    ):
+        """
+        Parameters:
+            positions (numpy.ndarray): The N x 2 initial positions of the agents
+            destination (numpy.ndarray): The destination of the swarm
+            alpha (float): System parameter about antenna characteristics
+            delta (float): The required application data rate
+            v (float): Path loss exponent
+            r0 (float): Reference distance value
+            PT (float): The reception probability threshold
+            mode (str): The update mode of formation_step, "sequential" or "jacobi"
+            neighbors (str): The pair representation, "dense" N x N matrices, a "sparse"
+                graph of the pairs in range (jacobi mode only), or "auto" to pick
+                by swarm size
+            step_size (float): The factor applied to the control input, the initial
+                one with adaptive_step
+            adaptive_step (bool): Adapt the step size with AdaptiveStepSize
+            convergence (ConvergenceDetector): The convergence test, None to wait for
+                CONVERGENCE_WINDOW identical Jn values rounded to JN_DECIMALS
+            trajectory_capacity (int): The most trajectory samples kept in paths,
+                None to keep every iteration
+            decimate_trajectory (bool): Once paths is full, thin out old samples
+                instead of dropping the oldest
+            sinks (list): Callables that receive the telemetry data after every iteration
+            observers (list): Callables that receive the controller after every iteration
+        """
+        self.initial_positions = np.array(positions, dtype=float)
+        self.destination = np.array(destination, dtype=float)
+        self.alpha = alpha
+        self.delta = delta
+        self.v = v
+        self.r0 = r0
+        self.PT = PT
+        self.mode = mode
+        self.neighbors = neighbors
+        if neighbors == "auto":
+            neighbors = (
+                "sparse"
+                if mode == "jacobi" and len(self.initial_positions) >= SPARSE_MIN_AGENTS
+                else "dense"
+            )
+        if neighbors == "sparse" and mode != "jacobi":
+            raise ValueError("The sparse neighbor graph needs the jacobi update mode")
+        self.sparse = neighbors == "sparse"
+        self.step_size = step_size
+        self.adaptive_step = AdaptiveStepSize(step_size) if adaptive_step else None
+        self.convergence = convergence
+        self.trajectory_capacity = trajectory_capacity
+        self.decimate_trajectory = decimate_trajectory
+        self.sinks = [] if sinks is None else list(sinks)
+        self.observers = [] if observers is None else list(observers)
+        self.converter = CoordinateConverter()
+        self.reset()
+
+    @property
+    def swarm_size(self):
+        return len(self.positions)
+
+    def reset(self):
+        """Move the agents back to their initial positions and clear the history"""
+        self.positions = self.initial_positions.copy()
+        self.control = np.zeros((self.swarm_size, 2))
+        # Sparse swarms only keep the graph, dense ones only the matrices
+        self.graph = None
+        if self.sparse:
+            self.distances_matrix = None
+            self.neighbor_agent_matrix = None
+            self.communication_qualities_matrix = None
+        else:
+            self.distances_matrix = np.zeros((self.swarm_size, self.swarm_size))
+            self.neighbor_agent_matrix = np.zeros((self.swarm_size, self.swarm_size))
+            self.communication_qualities_matrix = np.zeros(
+                (self.swarm_size, self.swarm_size)
+            )
+        self.metrics = FormationMetrics(self.PT)
+        if not self.sparse:
+            # Start the per-pair state from the empty matrices so that
+            # sequential steps can update it one agent at a time
+            self.metrics.update(
+                self.distances_matrix,
+                self.neighbor_agent_matrix,
+                self.communication_qualities_matrix,
+            )
+        self.Jn = []
+        self.rn = []
+        self.t_elapsed = []
+        self.paths = TrajectoryStore(
+            self.swarm_size,
+            capacity=self.trajectory_capacity,
+            decimate=self.decimate_trajectory,
+        )
+        self.iteration = 0
+        self.converged = False
+        self.converged_at = None
+        self.convergence_time = None
+        if self.adaptive_step is not None:
+            self.adaptive_step.reset()
+        self.start_time = time.time()
+
+    def step(self):
+        """
+        Run one iteration of the controller, then notify the observers and sinks
+
+        Returns:
+            bool: Whether the formation has converged
+        """
+        params = (self.alpha, self.delta, self.r0, self.v, self.PT)
+        step_size = self.step_size
+        if self.adaptive_step is not None:
+            step_size = self.adaptive_step.step
+        if self.sparse:
+            self.control, self.graph = sparse_formation_step(
+                self.positions, *params, step_size=step_size
+            )
+            self.metrics.update_graph(self.graph)
+        elif self.mode == "sequential":
+            # Only the moving agent's pairs change, so the metrics follow each move
+            (
+                self.control,
+                self.distances_matrix,
+                self.neighbor_agent_matrix,
+                self.communication_qualities_matrix,
+            ) = formation_step(
+                self.positions,
+                *params,
+                mode=self.mode,
+                step_size=step_size,
+                on_agent=self.metrics.update_agents,
+            )
+        else:
+            (
+                self.control,
+                self.distances_matrix,
+                self.neighbor_agent_matrix,
+                self.communication_qualities_matrix,
+            ) = formation_step(
+                self.positions, *params, mode=self.mode, step_size=step_size
+            )
+            self.metrics.update(
+                self.distances_matrix,
+                self.neighbor_agent_matrix,
+                self.communication_qualities_matrix,
+            )
+        Jn, rn = self.metrics.record(self.iteration)
+        if self.adaptive_step is not None:
+            self.adaptive_step.update(self.control)
+
+        # Record the performance indicators, elapsed time and trajectories
+        self.Jn.append(round(Jn, JN_DECIMALS))
+        self.rn.append(round(rn, JN_DECIMALS))
+        self.t_elapsed.append(time.time() - self.start_time)
+        self.paths.append(self.positions)
+        self.iteration += 1
+
+        # The formation is complete once Jn stops changing
+        if self.convergence is None:
+            window = self.Jn[-CONVERGENCE_WINDOW:]
+            converged = len(window) == CONVERGENCE_WINDOW and len(set(window)) == 1
+        else:
+            converged = self.convergence(self.metrics.Jn, self.metrics.rn)
+        if converged and not self.converged:
+            self.converged = True
+            self.converged_at = self.iteration
+            self.convergence_time = self.t_elapsed[-1]
+
+        for observer in self.observers:
+            observer(self)
+        if self.sinks:
+            data = self.telemetry()
+            for sink in self.sinks:
+                sink(data)
+        return self.converged
+
+    def run(self, max_iter=MAX_ITER, until=None):
+        """
+        Run the controller until the formation converges
+
+        Parameters:
+            max_iter (int): Stop once this many iterations have run in total
+            until (callable): Stop once this returns True, checked before every iteration
+
+        Returns:
+            bool: Whether the formation has converged
+        """
+        while (
+            not self.converged
+            and self.iteration < max_iter
+            and (until is None or not until())
+        ):
+            self.step()
+        return self.converged
+
+    def edges(self):
+        """
+        Return the communication links to draw, each once
+
+        Returns:
+            tuple: (i, j) of the pairs whose communication quality exceeds PT
+        """
+        if self.sparse:
+            if self.graph is None:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+            linked = self.graph.qualities > self.PT
+            return self.graph.i[linked], self.graph.j[linked]
+        return np.nonzero(np.triu(self.communication_qualities_matrix > self.PT, k=1))
+
+    def telemetry(self):
+        """Build the telemetry table rows for the current state"""
+        lats, lons = self.converter.sim_to_geo(
+            self.positions[:, 0], self.positions[:, 1]
+        )
+        destination_lat, destination_lon = self.converter.sim_to_geo(
+            self.destination[0], self.destination[1]
+        )
+        return {
+            "Agent Name": range(1, self.swarm_size + 1),
+            # Swapped order: lon, lat, alt
+            "Location": format_coordinates(lons, lats, 50),
+            "Destination": format_coordinates(
+                np.full(self.swarm_size, destination_lon), destination_lat, 50
+            ),
+            "Altitude": [50 for _ in range(self.swarm_size)],
+            "Pitch": [45 for _ in range(self.swarm_size)],
+            "Yaw": [0 for _ in range(self.swarm_size)],
+            "Roll": [0 for _ in range(self.swarm_size)],
+            "Airspeed/Velocity": np.linalg.norm(self.control, axis=1).tolist(),
+            "Acceleration": [0 for _ in range(self.swarm_size)],
+            "Angular Velocity": [0 for _ in range(self.swarm_size)],
+        }
+
+    def series(self):
+        """Return the Jn, rn and elapsed time of every iteration as a DataFrame"""
+        return pd.DataFrame(
+            {
+                "iteration": np.arange(len(self.Jn)),
+                "t": self.t_elapsed,
+                "Jn": self.Jn,
+                "rn": self.rn,
+            }
+        )
+
+    def save(self, path):
+        """
+        Checkpoint the controller state to a memory-mappable file
+
+        Parameters:
+            path (str): The checkpoint file
+        """
+        save_checkpoint(
+            path,
+            {
+                "initial_positions": self.initial_positions,
+                "swarm_position": self.positions,
+                "swarm_destination": self.destination,
+                "swarm_paths": self.paths.view(),
+                "swarm_path_steps": self.paths.steps(),
+                "Jn": np.array(self.Jn, dtype=float),
+                "rn": np.array(self.rn, dtype=float),
+                "t_elapsed": np.array(self.t_elapsed, dtype=float),
+                "Jn_raw": np.array(self.metrics.Jn, dtype=float),
+                "rn_raw": np.array(self.metrics.rn, dtype=float),
+                **(
+                    {}
+                    if self.adaptive_step is None or self.adaptive_step.previous is None
+                    else {"previous_control": self.adaptive_step.previous}
+                ),
+            },
+            {
+                "kind": "formation",
+                "iteration": self.iteration,
+                "alpha": self.alpha,
+                "delta": self.delta,
+                "v": self.v,
+                "r0": self.r0,
+                "PT": self.PT,
+                "mode": self.mode,
+                "neighbors": self.neighbors,
+                "step_size": self.step_size,
+                "adaptive_step": (
+                    None if self.adaptive_step is None else self.adaptive_step.step
+                ),
+                "trajectory": [
+                    self.trajectory_capacity,
+                    self.decimate_trajectory,
+                    self.paths.total,
+                    self.paths.stride,
+                ],
+                "convergence": (
+                    None
+                    if self.convergence is None
+                    else [
+                        self.convergence.jn_tol,
+                        self.convergence.rn_tol,
+                        self.convergence.window,
+                    ]
+                ),
+                "Jn_converged": self.converged,
+                "converged_at": self.converged_at,
+                "convergence_time": self.convergence_time,
+            },
+        )
+
+    @classmethod
+    def restore(cls, path, **kwargs):
+        """
+        Create a controller from a checkpoint written by save()
+
+        Parameters:
+            path (str): The checkpoint file
+            **kwargs: Extra constructor arguments, such as sinks or observers
+
+        Returns:
+            FormationController: The restored controller
+        """
+        arrays, meta = load_checkpoint(path, mmap_mode=None)
+        if meta.get("kind") != "formation":
+            raise ValueError(f"{path} is not a formation checkpoint")
+        kwargs.setdefault("mode", meta.get("mode", "sequential"))
+        kwargs.setdefault("neighbors", meta.get("neighbors", "auto"))
+        kwargs.setdefault("step_size", meta.get("step_size", 1.0))
+        kwargs.setdefault("adaptive_step", meta.get("adaptive_step") is not None)
+        if meta.get("convergence") is not None:
+            kwargs.setdefault("convergence", ConvergenceDetector(*meta["convergence"]))
+        capacity, decimate, total, stride = meta.get(
+            "trajectory", [None, False, None, None]
+        )
+        kwargs.setdefault("trajectory_capacity", capacity)
+        kwargs.setdefault("decimate_trajectory", decimate)
+        controller = cls(
+            arrays.get("initial_positions", arrays["swarm_position"]),
+            arrays["swarm_destination"],
+            **{k: meta[k] for k in ("alpha", "delta", "v", "r0", "PT")},
+            **kwargs,
+        )
+        controller.positions = arrays["swarm_position"]
+        controller.paths.load(
+            arrays["swarm_paths"], arrays.get("swarm_path_steps"), total, stride
+        )
+        controller.Jn = arrays["Jn"].tolist()
+        controller.rn = arrays["rn"].tolist()
+        controller.t_elapsed = arrays["t_elapsed"].tolist()
+        controller.iteration = meta["iteration"]
+        controller.converged = meta["Jn_converged"]
+        controller.converged_at = meta.get("converged_at")
+        controller.convergence_time = meta.get("convergence_time")
+        if controller.adaptive_step is not None and meta.get("adaptive_step"):
+            controller.adaptive_step.step = meta["adaptive_step"]
+            controller.adaptive_step.previous = arrays.get("previous_control")
+        if "Jn_raw" in arrays:
+            controller.metrics.Jn = arrays["Jn_raw"].tolist()
+            controller.metrics.rn = arrays["rn_raw"].tolist()
+            controller.metrics.t = list(range(len(controller.metrics.Jn)))
+        last = controller.t_elapsed[-1] if controller.t_elapsed else 0
+        controller.start_time = time.time() - last
+        return controller
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the formation controller headless until it converges"
+    )
+    parser.add_argument("--max-iter", type=int, default=MAX_ITER)
+    parser.add_argument("--alpha", type=float, default=ALPHA)
+    parser.add_argument("--delta", type=float, default=DELTA)
+    parser.add_argument("--v", type=float, default=V, help="Path loss exponent")
+    parser.add_argument("--r0", type=float, default=R0, help="Reference distance")
+    parser.add_argument("--pt", type=float, default=PT, help="Reception threshold")
+    parser.add_argument(
+        "--positions",
+        default=None,
+        help="CSV file of initial agent positions, one x,y row per agent",
+    )
+    parser.add_argument("--destination", type=float, nargs=2, default=list(DESTINATION))
+    parser.add_argument("--update", choices=UPDATE_MODES, default="sequential")
+    parser.add_argument(
+        "--neighbors",
+        choices=["auto", "dense", "sparse"],
+        default="auto",
+        help="Pair representation, sparse needs --update jacobi",
+    )
+    parser.add_argument(
+        "--step-size",
+        type=float,
+        default=1.0,
+        help="Factor applied to the control input, the initial one with --adaptive-step",
+    )
+    parser.add_argument(
+        "--adaptive-step",
+        action="store_true",
+        help="Grow the step while far from equilibrium and back off near it",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=None,
+        help="Converge once Jn varies less than this over --window iterations "
+        f"instead of after {CONVERGENCE_WINDOW} identical rounded values",
+    )
+    parser.add_argument("--rn-tolerance", type=float, default=1e-3)
+    parser.add_argument(
+        "--trajectory-capacity",
+        type=int,
+        default=None,
+        help="Keep at most this many trajectory samples in memory",
+    )
+    parser.add_argument(
+        "--decimate",
+        action="store_true",
+        help="Thin out the trajectory once full instead of dropping the oldest samples",
+    )
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument(
+        "--sink",
+        action="append",
+        default=[],
+        help='Telemetry output, "db", "db-async" (batched in a background '
+        'thread), "ws" or "csv:<path>" (repeatable)',
+    )
+    parser.add_argument(
+        "--series",
+        default="formation_series.csv",
+        help="Output CSV of the Jn, rn and elapsed time of every iteration",
+    )
+    parser.add_argument(
+        "--final",
+        default="formation_positions.csv",
+        help="Output CSV of the final agent positions",
+    )
+    parser.add_argument(
+        "--restore",
+        default=None,
+        help="Resume from a checkpoint, ignoring the formation parameters",
+    )
+    parser.add_argument(
+        "--save", default=None, help="Write a checkpoint when the run ends"
+    )
+    args = parser.parse_args()
+
+    sinks = [make_sink(spec) for spec in args.sink]
+    if args.restore:
+        controller = FormationController.restore(args.restore, sinks=sinks)
+    else:
+        positions = (
+            INITIAL_POSITIONS
+            if args.positions is None
+            else np.loadtxt(args.positions, delimiter=",", ndmin=2)
+        )
+        controller = FormationController(
+            positions,
+            args.destination,
+            alpha=args.alpha,
+            delta=args.delta,
+            v=args.v,
+            r0=args.r0,
+            PT=args.pt,
+            mode=args.update,
+            neighbors=args.neighbors,
+            step_size=args.step_size,
+            adaptive_step=args.adaptive_step,
+            convergence=(
+                None
+                if args.tolerance is None
+                else ConvergenceDetector(args.tolerance, args.rn_tolerance, args.window)
+            ),
+            trajectory_capacity=args.trajectory_capacity,
+            decimate_trajectory=args.decimate,
+            sinks=sinks,
+        )
+    start_iteration = controller.iteration
+
+    start = time.perf_counter()
+    try:
+        try:
+            controller.run(max_iter=args.max_iter)
+        except KeyboardInterrupt:
+            print("\n[INFO] Simulation stopped by user")
+        elapsed = time.perf_counter() - start
+        iterations = controller.iteration - start_iteration
+
+        # Not reached when an iteration raised, a failed run is not checkpointed
+        if args.save:
+            controller.save(args.save)
+    finally:
+        for sink in sinks:
+            if hasattr(sink, "close"):
+                sink.close()
+    controller.series().to_csv(args.series, index=False)
+    pd.DataFrame(controller.positions, columns=["x", "y"]).to_csv(
+        args.final, index_label="agent"
+    )
+
+    if controller.converged:
+        print(
+            f"[INFO] Formation converged after {controller.converged_at} iterations "
+            f"in {controller.convergence_time:.2f} s"
+        )
+    else:
+        print(
+            f"[INFO] Formation did not converge after {controller.iteration} iterations"
+        )
+    if controller.Jn:
+        print(f"[INFO] Jn={controller.Jn[-1]:.4f} rn={controller.rn[-1]:.4f}")
+    print(
+        f"[INFO] {iterations} iterations of {controller.swarm_size} agents in "
+        f"{elapsed:.2f} s ({iterations / max(elapsed, 1e-9):.1f} iterations/sec)"
+    )
+    print(f"[INFO] Wrote {args.series} and {args.final}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.formation_batch import FormationBatch, random_layouts
+from scripts.formation_kernel import UPDATE_MODES
+from scripts.formation_montecarlo import PARAMETER_RANGES, draw_parameters, task_rng
+from scripts.formation_sim import DELTA, MAX_ITER, ConvergenceDetector
+
+# Search space as (low, high), alpha is drawn log-uniformly
+TUNING_RANGES = {**PARAMETER_RANGES, "delta": (DELTA - 0.5, DELTA + 0.5)}
+
+# The least final Jn of a formation that counts as converged
+MIN_JN = 0.95
+
+
+def _advance(args):
+    index, batch, budget = args
+    batch.run(max_iter=budget)
+    return index, batch
+
+
+def score(batch, budget, max_iter=MAX_ITER, min_jn=MIN_JN):
+    """
+    Score a configuration by the mean iterations its layouts need to converge
+
+    A layout that converged with a final Jn of at least min_jn costs the
+    iterations it took. One still running costs the budget so far, a lower
+    bound on its final cost. One that converged below min_jn, or did not
+    converge within max_iter, costs 2 * max_iter.
+
+    Parameters:
+        batch (FormationBatch): The layouts run with the configuration
+        budget (int): The iterations the batch was allowed so far
+        max_iter (int): The most iterations of a full run
+        min_jn (float): The least final Jn of a feasible formation
+
+    Returns:
+        float: The mean cost, lower is better
+    """
+    summary = batch.summary()
+    feasible = summary["converged"] & (summary["Jn"] >= min_jn)
+    running = ~summary["converged"] & (budget < max_iter)
+    cost = np.where(
+        feasible, summary["iterations"], np.where(running, budget, 2 * max_iter)
+    )
+    return float(cost.mean())
+
+
+def tune(
+    configs=27,
+    layouts=8,
+    seed=0,
+    ranges=None,
+    eta=3,
+    min_budget=25,
+    max_iter=MAX_ITER,
+    min_jn=MIN_JN,
+    jitter=5.0,
+    mode="jacobi",
+    step_size=1.0,
+    tolerance=None,
+    workers=None,
+):
+    """
+    Search the formation parameters with successive halving
+
+    Every configuration runs the same initial layouts for min_budget
+    iterations, then only the best 1/eta of them continue for eta times as
+    many iterations, and so on up to max_iter. Batches resume where the
+    previous rung stopped and layouts stop as soon as they converge, so most
+    configurations are dropped after a few dozen iterations.
+
+    Parameters:
+        configs (int): The number of configurations drawn
+        layouts (int): The number of initial layouts every configuration runs
+        seed (int): The seed of the configurations and layouts
+        ranges (dict): The (low, high) range of each parameter, TUNING_RANGES by default
+        eta (int): The reduction factor between rungs
+        min_budget (int): The iterations of the first rung
+        max_iter (int): The iterations of the last rung
+        min_jn (float): The least final Jn of a feasible formation
+        jitter (float): The standard deviation of the layout offsets
+        mode (str): The update mode of formation_step
+        step_size (float): The factor applied to the control input
+        tolerance (tuple): (jn_tol, rn_tol, window) of a ConvergenceDetector, None for
+            the default convergence test
+        workers (int): The number of worker processes, defaults to the CPU count
+
+    Returns:
+        pandas.DataFrame: One row per configuration, best first, with its parameters,
+            the rung and budget it reached, its score, and the convergence rate,
+            mean iterations and mean final Jn of its layouts
+    """
+    ranges = ranges or TUNING_RANGES
+    positions = random_layouts(layouts, jitter=jitter, seed=seed)
+    params = [draw_parameters(task_rng(seed, k), ranges) for k in range(configs)]
+    batches = [
+        FormationBatch(
+            positions,
+            mode=mode,
+            step_size=step_size,
+            convergence=None if tolerance is None else ConvergenceDetector(*tolerance),
+            **p,
+        )
+        for p in params
+    ]
+    reached = np.zeros(configs, dtype=int)
+    budgets = np.zeros(configs, dtype=int)
+    scores = np.full(configs, np.inf)
+
+    survivors = list(range(configs))
+    budget, rung = min(min_budget, max_iter), 0
+    workers = workers or os.cpu_count()
+    with mp.Pool(min(workers, configs)) as pool:
+        while True:
+            for index, batch in pool.imap_unordered(
+                _advance, [(index, batches[index], budget) for index in survivors]
+            ):
+                batches[index] = batch
+                reached[index] = rung
+                budgets[index] = budget
+                scores[index] = score(batch, budget, max_iter, min_jn)
+            if budget >= max_iter or len(survivors) <= 1:
+                break
+            keep = max(1, len(survivors) // eta)
+            survivors = sorted(survivors, key=lambda index: scores[index])[:keep]
+            budget, rung = min(budget * eta, max_iter), rung + 1
+
+    rows = []
+    for index, batch in enumerate(batches):
+        summary = batch.summary()
+        converged = summary[summary["converged"]]
+        rows.append(
+            {
+                **params[index],
+                "rung": reached[index],
+                "budget": budgets[index],
+                "score": scores[index],
+                "converged": summary["converged"].mean(),
+                "iterations": converged["iterations"].mean(),
+                "Jn": converged["Jn"].mean(),
+                "swarm_iterations": int(
+                    np.where(
+                        summary["converged"], summary["iterations"], batch.iteration
+                    ).sum()
+                ),
+            }
+        )
+    report = pd.DataFrame(rows)
+    report.insert(0, "config", np.arange(configs))
+    return report.sort_values(
+        ["rung", "score"], ascending=[False, True], ignore_index=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Tune the formation parameters for fast convergence "
+        "with successive halving"
+    )
+    parser.add_argument("--configs", type=int, default=27)
+    parser.add_argument(
+        "--layouts", type=int, default=8, help="Initial layouts per configuration"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    for name, (low, high) in TUNING_RANGES.items():
+        parser.add_argument(
+            f"--{name.lower()}",
+            type=float,
+            nargs=2,
+            default=[low, high],
+            metavar=("LOW", "HIGH"),
+            help=f"Range of {name}"
+            + (", drawn log-uniformly" if name == "alpha" else ""),
+        )
+    parser.add_argument("--eta", type=int, default=3, help="Reduction factor")
+    parser.add_argument(
+        "--min-budget", type=int, default=25, help="Iterations of the first rung"
+    )
+    parser.add_argument("--max-iter", type=int, default=MAX_ITER)
+    parser.add_argument(
+        "--min-jn",
+        type=float,
+        default=MIN_JN,
+        help="Least final Jn of a formation that counts as converged",
+    )
+    parser.add_argument("--jitter", type=float, default=5.0)
+    parser.add_argument("--update", choices=UPDATE_MODES, default="jacobi")
+    parser.add_argument("--step-size", type=float, default=1.0)
+    parser.add_argument("--tolerance", type=float, default=None)
+    parser.add_argument("--rn-tolerance", type=float, default=1e-3)
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--report",
+        default="formation_tuning.csv",
+        help="Output CSV of every configuration, best first",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = tune(
+        args.configs,
+        layouts=args.layouts,
+        seed=args.seed,
+        ranges={name: getattr(args, name.lower()) for name in TUNING_RANGES},
+        eta=args.eta,
+        min_budget=args.min_budget,
+        max_iter=args.max_iter,
+        min_jn=args.min_jn,
+        jitter=args.jitter,
+        mode=args.update,
+        step_size=args.step_size,
+        tolerance=(
+            None
+            if args.tolerance is None
+            else (args.tolerance, args.rn_tolerance, args.window)
+        ),
+        workers=args.workers,
+    )
+    elapsed = time.perf_counter() - start
+    report.to_csv(args.report, index=False)
+
+    spent = report["swarm_iterations"].sum()
+    full = args.configs * args.layouts * args.max_iter
+    print(
+        f"[INFO] Evaluated {args.configs} configurations in {elapsed:.2f} s, "
+        f"{spent} swarm iterations ({spent / full:.1%} of running all to {args.max_iter})"
+    )
+    print(report.head(5).to_string(index=False))
+    best = report.iloc[0]
+    print(
+        "[INFO] Best: python src/scripts/formation_sim.py "
+        f"--alpha {best['alpha']:.6g} --delta {best['delta']:.6g} --v {best['v']:.6g} "
+        f"--r0 {best['r0']:.6g} --pt {best['PT']:.6g}"
+    )
+    print(f"[INFO] Wrote {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+# File layout: magic, header length, JSON header, then each array's raw bytes
+# at an aligned offset so it can be memory-mapped in place
+MAGIC = b"SWCKPT01"
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save_checkpoint(path, arrays, meta=None):
+    """
+    Write arrays and metadata to a memory-mappable checkpoint file
+
+    The file is written next to the target and moved into place, so readers
+    never see a partial checkpoint.
+
+    Parameters:
+        path (str): The checkpoint file
+        arrays (dict): Named numpy arrays
+        meta (dict): JSON-serializable metadata (parameters, RNG state, counters)
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # Lay out the arrays, offsets are relative to the start of the data section
+    directory = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        directory[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset += array.nbytes
+
+    header = json.dumps({"meta": meta or {}, "arrays": directory}).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + directory[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, mmap_mode="c"):
+    """
+    Open a checkpoint written by save_checkpoint
+
+    Parameters:
+        path (str): The checkpoint file
+        mmap_mode (str): "c" maps the arrays copy-on-write, so every run restored
+            from the same file gets private pages only where it writes; "r" maps
+            them read-only; None reads them into memory
+
+    Returns:
+        tuple: (arrays, meta) with arrays a dict of numpy arrays or memmaps
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a checkpoint file")
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length))
+        data_start = _align(len(MAGIC) + 8 + header_length)
+
+        arrays = {}
+        for name, entry in header["arrays"].items():
+            dtype = np.dtype(entry["dtype"])
+            shape = tuple(entry["shape"])
+            offset = data_start + entry["offset"]
+            if mmap_mode is not None and int(np.prod(shape)) > 0:
+                arrays[name] = np.memmap(
+                    path, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape
+                )
+            else:
+                f.seek(offset)
+                arrays[name] = np.fromfile(
+                    f, dtype=dtype, count=int(np.prod(shape))
+                ).reshape(shape)
+    return arrays, header["meta"]
@@ -0,0 +1,311 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from utils.db_schema import PRIMARY_KEY, ensure_table, prune_sql, upsert_sql
+
+# The database shared by the simulators, the dashboard and the websocket
+# server, relative to the repository root like the scripts are run from
+DEFAULT_DB_PATH = "./src/data/swarm_squad.db"
+
+# Environment variable that overrides DEFAULT_DB_PATH
+DB_PATH_ENV = "SWARM_SQUAD_DB"
+
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+
+class ConnectionManager:
+    """
+    Long-lived SQLite connections to one database file, one per thread
+
+    A connection is opened on first use in a thread and kept until the thread
+    exits or the manager is closed, so repeated reads and writes skip the connect and schema
+    load, and sqlite3 reuses the compiled statement whenever the same SQL text
+    runs again on it. A process forked from the owner opens its own
+    connections instead of sharing the parent's.
+
+    The database is kept in WAL mode, where readers see the last committed
+    state without blocking the writer and the writer never waits for them;
+    writers still take turns, waiting up to timeout for each other. A
+    read-only manager opens its connections with mode=ro, so a poll loop can
+    never hold a write lock.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        timeout=5.0,
+        cached_statements=128,
+        readonly=False,
+        synchronous="NORMAL",
+        wal_autocheckpoint=1000,
+        journal_size_limit=64 * 1024 * 1024,
+    ):
+        """
+        Parameters:
+            path (str): The database file, defaults to $SWARM_SQUAD_DB or DEFAULT_DB_PATH
+            timeout (float): The busy timeout, the seconds to wait for a lock held
+                by another connection
+            cached_statements (int): The number of compiled statements kept per connection
+            readonly (bool): Open read-only connections
+            synchronous (str): The synchronous level of writing connections, with WAL
+                "NORMAL" only syncs at checkpoints and keeps the database consistent,
+                a power loss may drop the last commits
+            wal_autocheckpoint (int): The WAL size in pages that triggers a passive
+                checkpoint on commit, 0 to only checkpoint through checkpoint()
+            journal_size_limit (int): The bytes the WAL file is truncated to after a
+                checkpoint, -1 to leave it at its largest size
+        """
+        self.path = path or os.environ.get(DB_PATH_ENV, DEFAULT_DB_PATH)
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.readonly = readonly
+        self.synchronous = synchronous
+        self.wal_autocheckpoint = wal_autocheckpoint
+        self.journal_size_limit = journal_size_limit
+        self._prepared = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._tables = set()
+        self._pid = os.getpid()
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use"""
+        if self._pid != os.getpid():
+            # Connections must not cross a fork, start over in the child
+            self._local = threading.local()
+            self._connections = []
+            self._lock = threading.Lock()
+            self._tables = set()
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                # Close what threads that have since exited left behind
+                for thread, stale in self._connections:
+                    if not thread.is_alive():
+                        stale.close()
+                self._connections = [
+                    (thread, other)
+                    for thread, other in self._connections
+                    if thread.is_alive()
+                ]
+                self._connections.append((threading.current_thread(), conn))
+        return conn
+
+    def _open(self):
+        if self.readonly and not self._prepared:
+            # A read-only connection can neither create the database nor switch
+            # it to WAL, let a writing connection do it once
+            ConnectionManager(self.path, timeout=self.timeout)._open().close()
+            self._prepared = True
+
+        if self.readonly:
+            database = Path(self.path).resolve().as_uri() + "?mode=ro"
+        else:
+            database = self.path
+        conn = sqlite3.connect(
+            database,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            # Only close_all touches a connection from another thread
+            check_same_thread=False,
+            uri=self.readonly,
+        )
+        if not self.readonly:
+            # WAL is a property of the file, the other settings of the connection
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute(f"PRAGMA wal_autocheckpoint={int(self.wal_autocheckpoint)}")
+            conn.execute(f"PRAGMA journal_size_limit={int(self.journal_size_limit)}")
+        return conn
+
+    def checkpoint(self, mode="PASSIVE"):
+        """
+        Copy the committed contents of the WAL into the database file
+
+        Parameters:
+            mode (str): One of CHECKPOINT_MODES, "PASSIVE" copies what it can without
+                waiting, "TRUNCATE" waits for readers and writers and empties the WAL
+
+        Returns:
+            tuple: (busy, frames in the WAL, frames checkpointed), busy is 1 when
+                the checkpoint could not complete
+        """
+        mode = mode.upper()
+        if mode not in CHECKPOINT_MODES:
+            raise ValueError(f"Unknown checkpoint mode {mode!r}")
+        return self.connection().execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+
+    def execute(self, sql, parameters=()):
+        """Run one statement on the calling thread's connection and commit"""
+        conn = self.connection()
+        with conn:
+            return conn.execute(sql, parameters)
+
+    def executemany(self, sql, rows):
+        """Run one statement for every row in a single transaction"""
+        conn = self.connection()
+        with conn:
+            return conn.executemany(sql, rows)
+
+    def read_frame(self, sql, params=None):
+        """
+        Run a query and return the result as a DataFrame
+
+        Parameters:
+            sql (str): The query
+            params (tuple): The query parameters
+
+        Returns:
+            pandas.DataFrame: The rows of the result
+        """
+        return pd.read_sql_query(sql, self.connection(), params=params)
+
+    def write_frame(self, df, table, if_exists="replace"):
+        """
+        Write a DataFrame to a table
+
+        Parameters:
+            df (pandas.DataFrame): The rows to write
+            table (str): The table name
+            if_exists (str): "replace", "append" or "fail", as for DataFrame.to_sql
+        """
+        df.to_sql(table, self.connection(), if_exists=if_exists, index=False)
+
+    def upsert_frame(self, df, table, prune=True):
+        """
+        Write a DataFrame to a declared table, one row per agent
+
+        Inserts new agents and updates the changed rows of known ones with a
+        single prepared INSERT ... ON CONFLICT DO UPDATE run for every row in
+        one transaction. The table keeps its schema, so readers' compiled
+        statements stay valid, and rows whose values did not change are left
+        alone, so a tick that moved one agent writes one row.
+
+        Parameters:
+            df (pandas.DataFrame): The rows to write, with the "Agent Name" column
+            table (str): The table name, a key of utils.db_schema.TABLES
+            prune (bool): Delete the agents missing from df, so the table holds
+                exactly its rows like a full rewrite would
+
+        Returns:
+            int: The number of rows inserted, updated or deleted
+        """
+        return self.upsert_frames([(df, table)], prune=prune)
+
+    def upsert_frames(self, frames, prune=True):
+        """
+        Write several DataFrames like upsert_frame, in a single transaction
+
+        Parameters:
+            frames (list): (df, table) pairs, written in order
+            prune (bool): Delete the agents missing from each df
+
+        Returns:
+            int: The number of rows inserted, updated or deleted
+        """
+        conn = self.connection()
+        for _, table in frames:
+            if table not in self._tables:
+                with self._lock:
+                    if table not in self._tables:
+                        ensure_table(conn, table)
+                        self._tables.add(table)
+
+        changed = 0
+        with conn:
+            for df, table in frames:
+                columns = tuple(df.columns)
+                # tolist() turns numpy scalars into the Python types sqlite3 binds
+                rows = zip(*(df[column].tolist() for column in columns))
+                changed += conn.executemany(upsert_sql(table, columns), rows).rowcount
+                if prune:
+                    keys = [int(key) for key in df[PRIMARY_KEY].tolist()]
+                    changed += conn.execute(
+                        prune_sql(table), (json.dumps(keys),)
+                    ).rowcount
+        return changed
+
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                self._connections = [
+                    (thread, other)
+                    for thread, other in self._connections
+                    if other is not conn
+                ]
+            conn.close()
+
+    def close_all(self):
+        """Close the connections of every thread, e.g. at shutdown"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for _, conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+_manager = None
+_reader = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    """Return the process-wide ConnectionManager, created on first use"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ConnectionManager()
+    return _manager
+
+
+def get_reader():
+    """Return the process-wide read-only ConnectionManager of the same database"""
+    global _reader
+    if _reader is None:
+        manager = get_manager()
+        with _manager_lock:
+            if _reader is None:
+                _reader = ConnectionManager(
+                    manager.path,
+                    timeout=manager.timeout,
+                    cached_statements=manager.cached_statements,
+                    readonly=True,
+                )
+    return _reader
+
+
+def configure(path=None, **kwargs):
+    """
+    Point the process-wide ConnectionManagers at a database
+
+    Closes the connections of the previous managers, get_reader() opens
+    read-only ones to the new database.
+
+    Parameters:
+        path (str): The database file, defaults to $SWARM_SQUAD_DB or DEFAULT_DB_PATH
+        **kwargs: Further ConnectionManager arguments
+
+    Returns:
+        ConnectionManager: The new manager
+    """
+    global _manager, _reader
+    with _manager_lock:
+        for previous in (_manager, _reader):
+            if previous is not None:
+                previous.close_all()
+        _manager = ConnectionManager(path, **kwargs)
+        _reader = None
+    return _manager
@@ -0,0 +1,144 @@
+from functools import lru_cache
+
+# Every dashboard table holds one row per agent
+PRIMARY_KEY = "Agent Name"
+
+# Column names and SQLite types of the dashboard tables, in display order
+TABLES = {
+    "agent": {
+        "Agent Name": "INTEGER",
+        "Agent Type": "TEXT",
+        "Status": "TEXT",
+        "Mode": "TEXT",
+        "Alert Count": "INTEGER",
+    },
+    "mission": {
+        "Agent Name": "INTEGER",
+        "Status": "TEXT",
+        "Mission": "TEXT",
+        "Completion": "INTEGER",
+        "Duration": "INTEGER",
+    },
+    "system": {
+        "Agent Name": "INTEGER",
+        "Battery Level": "INTEGER",
+        "GPS Accuracy": "INTEGER",
+        "Connection Strength/Quality": "INTEGER",
+        "Communication Status": "TEXT",
+    },
+    "telemetry": {
+        "Agent Name": "INTEGER",
+        "Location": "TEXT",
+        "Destination": "TEXT",
+        "Altitude": "REAL",
+        "Pitch": "REAL",
+        "Yaw": "REAL",
+        "Roll": "REAL",
+        "Airspeed/Velocity": "REAL",
+        "Acceleration": "REAL",
+        "Angular Velocity": "REAL",
+    },
+}
+
+
+def quote(name):
+    """Return a name quoted as an SQL identifier"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def create_table_sql(table, name=None):
+    """Return the CREATE TABLE statement of a declared table, optionally renamed"""
+    columns = [
+        f"{quote(column)} {kind}" + (" PRIMARY KEY" if column == PRIMARY_KEY else "")
+        for column, kind in TABLES[table].items()
+    ]
+    return f"CREATE TABLE {quote(name or table)} ({', '.join(columns)})"
+
+
+@lru_cache(maxsize=None)
+def upsert_sql(table, columns):
+    """
+    Return the statement that inserts a row or updates the agent's existing row
+
+    Rows whose values did not change are left alone, so an unchanged agent
+    costs no page write.
+
+    Parameters:
+        table (str): The declared table
+        columns (tuple): The columns supplied, including PRIMARY_KEY
+
+    Returns:
+        str: The INSERT ... ON CONFLICT DO UPDATE statement with one ? per column
+    """
+    unknown = set(columns) - set(TABLES[table])
+    if unknown:
+        raise ValueError(f"Unknown columns for the {table} table: {sorted(unknown)}")
+    if PRIMARY_KEY not in columns:
+        raise ValueError(f"The {table} table needs the {PRIMARY_KEY!r} column")
+
+    names = ", ".join(quote(column) for column in columns)
+    values = ", ".join("?" for _ in columns)
+    updated = [column for column in columns if column != PRIMARY_KEY]
+    sql = f"INSERT INTO {quote(table)} ({names}) VALUES ({values})"
+    if not updated:
+        return sql + f" ON CONFLICT({quote(PRIMARY_KEY)}) DO NOTHING"
+    assignments = ", ".join(
+        f"{quote(column)} = excluded.{quote(column)}" for column in updated
+    )
+    changed = " OR ".join(
+        f"{quote(column)} IS NOT excluded.{quote(column)}" for column in updated
+    )
+    return (
+        sql
+        + f" ON CONFLICT({quote(PRIMARY_KEY)}) DO UPDATE SET {assignments}"
+        + f" WHERE {changed}"
+    )
+
+
+def prune_sql(table):
+    """Return the statement that deletes the agents missing from a JSON array of keys"""
+    return (
+        f"DELETE FROM {quote(table)} WHERE {quote(PRIMARY_KEY)} "
+        "NOT IN (SELECT value FROM json_each(?))"
+    )
+
+
+def ensure_table(conn, table):
+    """
+    Create a declared table, or migrate one with a different layout
+
+    Tables written by DataFrame.to_sql have no primary key; their rows are
+    copied into the declared layout, the last row of an agent winning.
+
+    Parameters:
+        conn (sqlite3.Connection): The connection
+        table (str): The declared table
+    """
+    declared = TABLES[table]
+    info = conn.execute(f"PRAGMA table_info({quote(table)})").fetchall()
+    if not info:
+        with conn:
+            conn.execute(create_table_sql(table))
+        return
+
+    existing = {name: (kind.upper(), pk) for _, name, kind, _, _, pk in info}
+    expected = {
+        name: (kind, 1 if name == PRIMARY_KEY else 0) for name, kind in declared.items()
+    }
+    if existing == expected:
+        return
+
+    shared = ", ".join(quote(name) for name in declared if name in existing)
+    migrated = f"{table}_migrated"
+    with conn:
+        conn.execute("BEGIN")
+        conn.execute(f"DROP TABLE IF EXISTS {quote(migrated)}")
+        conn.execute(create_table_sql(table, migrated))
+        if PRIMARY_KEY in existing:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {quote(migrated)} ({shared}) "
+                f"SELECT {shared} FROM {quote(table)} "
+                f"WHERE {quote(PRIMARY_KEY)} IS NOT NULL ORDER BY rowid"
+            )
+        conn.execute(f"DROP TABLE {quote(table)}")
+        conn.execute(f"ALTER TABLE {quote(migrated)} RENAME TO {quote(table)}")
@@ -0,0 +1,214 @@
+import threading
+import time
+from collections import deque
+
+from utils.db_connection import get_manager
+
+
+class WriteBehindWriter:
+    """
+    Write table frames from a background thread, several ticks per transaction
+
+    Producers hand DataFrames to submit() and return at once; the writer
+    thread collects them for up to flush_interval seconds or max_batch
+    frames, then upserts the latest frame of every table and appends every
+    telemetry frame to the history in one transaction per database. The
+    queue holds at most max_queue frames, when it is full the oldest frame
+    is dropped instead of blocking the producer.
+    """
+
+    def __init__(
+        self,
+        manager=None,
+        history=None,
+        flush_interval=0.1,
+        max_batch=64,
+        max_queue=1024,
+    ):
+        """
+        Parameters:
+            manager (ConnectionManager): The database of the tables, defaults to
+                get_manager()
+            history (TelemetryHistory): The history every telemetry frame is appended
+                to, None to keep none
+            flush_interval (float): The most seconds a frame waits before its flush
+            max_batch (int): The most frames written per flush
+            max_queue (int): The most frames waiting, older ones are dropped beyond it
+        """
+        self.manager = manager or get_manager()
+        self.history = history
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._flushing = 0
+        self._thread = None
+
+        # Sequence numbers of the frames queued and of those written or dropped
+        self._queued = 0
+        self._done = 0
+
+        self.submitted = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.flushes = 0
+        self.rows = 0
+        self.max_depth = 0
+        self.flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.max_lag = 0.0
+        self.started = None
+
+    def start(self):
+        """Start the writer thread"""
+        # Under the lock, two producers submitting at once must not start two
+        # threads writing batches in no fixed order
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self.started = time.monotonic()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, df, table):
+        """
+        Queue a frame for a table without waiting for any I/O
+
+        Parameters:
+            df (pandas.DataFrame): The rows, as for ConnectionManager.upsert_frame
+            table (str): The table name
+
+        Returns:
+            bool: False if the queue was full and the oldest frame was dropped
+        """
+        with self._cond:
+            if self._thread is None:
+                self.start()
+            full = len(self._queue) >= self.max_queue
+            if full:
+                self._queue.popleft()
+                self.dropped += 1
+                self._done += 1
+            self._queue.append((df, table, time.time(), time.monotonic()))
+            self._queued += 1
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify_all()
+        return not full
+
+    def flush(self, timeout=None):
+        """
+        Wait until every frame submitted so far is written
+
+        Parameters:
+            timeout (float): The most seconds to wait, None for no limit
+
+        Returns:
+            bool: False if the timeout expired first or a batch failed to be
+                written while waiting
+        """
+        with self._cond:
+            target = self._queued
+            failed = self.failed
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                done = self._cond.wait_for(lambda: self._done >= target, timeout)
+            finally:
+                self._flushing -= 1
+            return done and self.failed == failed
+
+    def close(self, flush=True):
+        """Stop the writer thread, writing the queued frames first if flush is set"""
+        with self._cond:
+            self._stopped = True
+            if not flush:
+                self.dropped += len(self._queue)
+                self._done += len(self._queue)
+                self._queue.clear()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        """Return the queue depth, flush latency and throughput counters"""
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return {
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self.max_depth,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "rows": self.rows,
+            "rows_per_second": self.rows / elapsed if elapsed > 0 else 0.0,
+            "flush_latency_mean": (
+                self.flush_seconds / self.flushes if self.flushes else 0.0
+            ),
+            "flush_latency_max": self.max_flush_seconds,
+            "max_lag": self.max_lag,
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stopped)
+                if not self._queue:
+                    return
+                # Let ticks pile up until the oldest is due or the batch is full
+                deadline = self._queue[0][3] + self.flush_interval
+                self._cond.wait_for(
+                    lambda: len(self._queue) >= self.max_batch
+                    or self._stopped
+                    or self._flushing,
+                    max(0.0, deadline - time.monotonic()),
+                )
+                batch = [
+                    self._queue.popleft()
+                    for _ in range(min(self.max_batch, len(self._queue)))
+                ]
+
+            self._write(batch)
+            with self._cond:
+                self._done += len(batch)
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        start = time.monotonic()
+        # Only the newest frame of a table survives an upsert anyway
+        latest = {}
+        for df, table, _, _ in batch:
+            latest[table] = df
+        telemetry = [
+            (df, timestamp, None)
+            for df, table, timestamp, _ in batch
+            if table == "telemetry"
+        ]
+        try:
+            # Unchanged rows are skipped by the upsert, count the rows sent
+            rows = self.manager.upsert_frames(
+                [(df, table) for table, df in latest.items()]
+            )
+            if self.history is not None and telemetry:
+                self.history.extend(telemetry)
+                rows += sum(len(df) for df, _, _ in telemetry)
+        except Exception as e:
+            with self._cond:
+                self.failed += len(batch)
+            print(f"[ERROR] Failed to write {len(batch)} frames: {e}")
+            return
+
+        end = time.monotonic()
+        self.flushes += 1
+        self.coalesced += len(batch) - len(latest)
+        self.rows += rows
+        self.flush_seconds += end - start
+        self.max_flush_seconds = max(self.max_flush_seconds, end - start)
+        self.max_lag = max(self.max_lag, end - batch[0][3])
@@ -1,37 +1,34 @@
-import sqlite3
+from utils.db_connection import get_manager
+from utils.telemetry_history import get_history
 
 
 def agent_tbl_writer(df):
     # Write the data to the SQLite database
-    conn = sqlite3.connect("./src/data/swarm_squad.db")
-    df.to_sql("agent", conn, if_exists="replace", index=False)
-    conn.close()
+    get_manager().upsert_frame(df, "agent")
 
     print("Updated the agent table in the database")
 
 
 def mission_tbl_writer(df):
     # Write the data to the SQLite database
-    conn = sqlite3.connect("./src/data/swarm_squad.db")
-    df.to_sql("mission", conn, if_exists="replace", index=False)
-    conn.close()
+    get_manager().upsert_frame(df, "mission")
 
     print("Updated the mission table in the database")
 
 
 def system_tbl_writer(df):
     # Write the data to the SQLite database
-    conn = sqlite3.connect("./src/data/swarm_squad.db")
-    df.to_sql("system", conn, if_exists="replace", index=False)
-    conn.close()
+    get_manager().upsert_frame(df, "system")
 
     print("Updated the system table in the database")
 
 
 def telemetry_tbl_writer(df):
     # Write the data to the SQLite database
-    conn = sqlite3.connect("./src/data/swarm_squad.db")
-    df.to_sql("telemetry", conn, if_exists="replace", index=False)
-    conn.close()
+    get_manager().upsert_frame(df, "telemetry")
+    # Keep every snapshot in the history as well, when it is turned on
+    history = get_history()
+    if history is not None:
+        history.append(df)
 
     print("Updated the telemetry table in the database")
@@ -0,0 +1,203 @@
+import numpy as np
+
+# Meters per degree of latitude used by the flat-earth approximation
+METERS_PER_DEGREE = 111111
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+WGS84_EP2 = WGS84_E2 / (1 - WGS84_E2)
+
+
+def geodetic_to_ecef(lat, lon, alt):
+    """
+    Convert geodetic coordinates to Earth-centered, Earth-fixed coordinates
+
+    Parameters:
+        lat (numpy.ndarray): Latitudes in degrees
+        lon (numpy.ndarray): Longitudes in degrees
+        alt (numpy.ndarray): Heights above the ellipsoid in meters
+
+    Returns:
+        numpy.ndarray: The (..., 3) ECEF coordinates in meters
+    """
+    lat, lon = np.radians(lat), np.radians(lon)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat**2)
+    return np.stack(
+        [
+            (n + alt) * cos_lat * np.cos(lon),
+            (n + alt) * cos_lat * np.sin(lon),
+            (n * (1 - WGS84_E2) + alt) * sin_lat,
+        ],
+        axis=-1,
+    )
+
+
+def ecef_to_geodetic(ecef):
+    """
+    Convert Earth-centered, Earth-fixed coordinates to geodetic coordinates
+
+    Uses Bowring's formula, accurate to well below a millimeter near the surface.
+
+    Parameters:
+        ecef (numpy.ndarray): The (..., 3) ECEF coordinates in meters
+
+    Returns:
+        tuple: (lat, lon, alt) in degrees, degrees and meters
+    """
+    x, y, z = ecef[..., 0], ecef[..., 1], ecef[..., 2]
+    p = np.hypot(x, y)
+    theta = np.arctan2(z * WGS84_A, p * WGS84_B)
+    lat = np.arctan2(
+        z + WGS84_EP2 * WGS84_B * np.sin(theta) ** 3,
+        p - WGS84_E2 * WGS84_A * np.cos(theta) ** 3,
+    )
+    sin_lat = np.sin(lat)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat**2)
+    alt = p / np.cos(lat) - n
+    return np.degrees(lat), np.degrees(np.arctan2(y, x)), alt
+
+
+class LocalTangentPlane:
+    """Convert east/north/up offsets in meters around a reference point to lat/lon/alt"""
+
+    def __init__(self, ref_lat, ref_lon, ref_alt=0.0, accurate=False):
+        """
+        Parameters:
+            ref_lat (float): The latitude of the origin in degrees
+            ref_lon (float): The longitude of the origin in degrees
+            ref_alt (float): The altitude of the origin in meters
+            accurate (bool): Use the exact ENU <-> WGS84 conversion instead of the
+                flat-earth approximation, for areas wider than a few kilometers
+        """
+        self.ref_lat = ref_lat
+        self.ref_lon = ref_lon
+        self.ref_alt = ref_alt
+        self.accurate = accurate
+
+        # Cache the reference trig terms shared by every conversion
+        lat, lon = np.radians(ref_lat), np.radians(ref_lon)
+        sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+        sin_lon, cos_lon = np.sin(lon), np.cos(lon)
+        self._meters_per_lon_degree = METERS_PER_DEGREE * cos_lat
+        self._ref_ecef = geodetic_to_ecef(ref_lat, ref_lon, ref_alt)
+        # Rows are the east, north and up unit vectors in ECEF
+        self._enu_to_ecef = np.array(
+            [
+                [-sin_lon, cos_lon, 0.0],
+                [-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat],
+                [cos_lat * cos_lon, cos_lat * sin_lon, sin_lat],
+            ]
+        )
+
+    def to_geodetic(self, enu):
+        """
+        Convert local offsets to geodetic coordinates
+
+        Parameters:
+            enu (numpy.ndarray): The (..., 2) east/north or (..., 3) east/north/up offsets in meters
+
+        Returns:
+            numpy.ndarray: The (..., 3) latitude, longitude and altitude
+        """
+        enu = np.asarray(enu, dtype=float)
+        east, north = enu[..., 0], enu[..., 1]
+        up = enu[..., 2] if enu.shape[-1] > 2 else np.zeros_like(east)
+
+        if self.accurate:
+            offsets = np.stack([east, north, up], axis=-1)
+            lat, lon, alt = ecef_to_geodetic(
+                self._ref_ecef + offsets @ self._enu_to_ecef
+            )
+        else:
+            lat = self.ref_lat + north / METERS_PER_DEGREE
+            lon = self.ref_lon + east / self._meters_per_lon_degree
+            alt = self.ref_alt + up
+        return np.stack([lat, lon, alt], axis=-1)
+
+    def from_geodetic(self, geodetic):
+        """
+        Convert geodetic coordinates to local offsets
+
+        Parameters:
+            geodetic (numpy.ndarray): The (..., 3) latitude, longitude and altitude
+
+        Returns:
+            numpy.ndarray: The (..., 3) east/north/up offsets in meters
+        """
+        geodetic = np.asarray(geodetic, dtype=float)
+        lat, lon, alt = geodetic[..., 0], geodetic[..., 1], geodetic[..., 2]
+
+        if self.accurate:
+            ecef = geodetic_to_ecef(lat, lon, alt) - self._ref_ecef
+            return ecef @ self._enu_to_ecef.T
+        return np.stack(
+            [
+                (lon - self.ref_lon) * self._meters_per_lon_degree,
+                (lat - self.ref_lat) * METERS_PER_DEGREE,
+                alt - self.ref_alt,
+            ],
+            axis=-1,
+        )
+
+
+class BoxTransform:
+    """Map a rectangular simulation area linearly onto a lat/lon box"""
+
+    def __init__(self, x_range, y_range, lon_range, lat_range):
+        """
+        Parameters:
+            x_range (tuple): The (min, max) simulation x mapped onto lon_range
+            y_range (tuple): The (min, max) simulation y mapped onto lat_range
+            lon_range (tuple): The (min, max) longitude in degrees
+            lat_range (tuple): The (min, max) latitude in degrees
+        """
+        self.sim_x_min, self.sim_x_max = x_range
+        self.sim_y_min, self.sim_y_max = y_range
+        self.lon_min, self.lon_max = lon_range
+        self.lat_min, self.lat_max = lat_range
+
+        self.x_span = self.sim_x_max - self.sim_x_min
+        self.y_span = self.sim_y_max - self.sim_y_min
+        self.lon_span = self.lon_max - self.lon_min
+        self.lat_span = self.lat_max - self.lat_min
+
+        # Degrees per simulation unit
+        self._lon_scale = self.lon_span / self.x_span
+        self._lat_scale = self.lat_span / self.y_span
+
+    def sim_to_geo(self, x, y):
+        """Convert simulation coordinates (scalars or arrays) to (lat, lon)"""
+        lat = self.lat_min + (np.asarray(y) - self.sim_y_min) * self._lat_scale
+        lon = self.lon_min + (np.asarray(x) - self.sim_x_min) * self._lon_scale
+        return lat, lon
+
+    def to_geodetic(self, positions):
+        """
+        Convert simulation positions to geographic coordinates
+
+        Parameters:
+            positions (numpy.ndarray): The (..., 2) simulation positions
+
+        Returns:
+            numpy.ndarray: The (..., 2) latitude and longitude
+        """
+        positions = np.asarray(positions, dtype=float)
+        return np.stack(self.sim_to_geo(positions[..., 0], positions[..., 1]), axis=-1)
+
+
+def format_coordinates(*columns):
+    """
+    Join coordinate columns into "a, b, c" strings, one per row
+
+    Parameters:
+        *columns (numpy.ndarray): Equal-length columns, scalars are repeated
+
+    Returns:
+        list: The formatted rows
+    """
+    columns = np.broadcast_arrays(*[np.asarray(column) for column in columns])
+    return [", ".join(map(str, row)) for row in zip(*(c.tolist() for c in columns))]
@@ -0,0 +1,129 @@
+import time
+
+import numpy as np
+
+
+class SimulationClock:
+    """Fixed-timestep simulation clock with sub-stepping, catch-up and pacing"""
+
+    def __init__(self, tick_rate=10.0, dt=0.5, max_substeps=5, jitter_window=1000):
+        """
+        Parameters:
+            tick_rate (float): The target number of simulation steps per wall-clock second
+            dt (float): The simulated time advanced by every step in seconds
+            max_substeps (int): The most steps run at once to catch up, a larger
+                backlog is dropped instead of snowballing
+            jitter_window (int): The number of recent tick intervals kept for the statistics
+        """
+        self.tick_rate = tick_rate
+        self.period = 1.0 / tick_rate
+        self.dt = dt
+        self.max_substeps = max_substeps
+
+        self.ticks = 0
+        self.dropped_ticks = 0
+        self.sim_time = 0.0
+        self._start = None
+        self._last = None
+        self._accumulator = 0.0
+        self._last_tick = None
+        self._intervals = np.zeros(jitter_window)
+
+    def advance(self, step_fn, limit=None, until=None):
+        """
+        Run the steps that are due since the last call, without sleeping
+
+        Suited to being called from a GUI timer. When the caller fell behind,
+        up to max_substeps steps run back to back to catch up.
+
+        Parameters:
+            step_fn (callable): Advances the simulation by dt, called without arguments
+            limit (int): The most steps to take, None for max_substeps
+            until (callable): Take no further step once this returns True, checked
+                before every step
+
+        Returns:
+            int: The number of steps taken
+        """
+        return self._advance(step_fn, limit, until)[0]
+
+    def run(self, step_fn, until=None, max_ticks=None):
+        """
+        Run the simulation in real time, sleeping while ahead of schedule
+
+        Parameters:
+            step_fn (callable): Advances the simulation by dt, called without arguments
+            until (callable): Stop once this returns True, checked before every tick
+            max_ticks (int): Stop after this many ticks
+        """
+        while max_ticks is None or self.ticks < max_ticks:
+            limit = None if max_ticks is None else max_ticks - self.ticks
+            _, stopped = self._advance(step_fn, limit, until)
+            if stopped:
+                return
+            # Sleep until the next step is due
+            delay = self.period - self._accumulator
+            if delay > 0:
+                time.sleep(delay)
+
+    def _advance(self, step_fn, limit, until):
+        # Returns the steps taken and whether until stopped them
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = self._last = now
+            self._accumulator = self.period  # Take the first step right away
+        self._accumulator += now - self._last
+        self._last = now
+
+        limit = self.max_substeps if limit is None else min(limit, self.max_substeps)
+        steps = 0
+        while self._accumulator >= self.period and steps < limit:
+            if until is not None and until():
+                return steps, True
+            step_fn()
+            self._record_tick()
+            self._accumulator -= self.period
+            steps += 1
+
+        # Drop whatever backlog is left rather than trying to catch up forever
+        if steps == self.max_substeps and self._accumulator >= self.period:
+            backlog = int(self._accumulator // self.period)
+            self.dropped_ticks += backlog
+            self._accumulator -= backlog * self.period
+        return steps, False
+
+    def stats(self):
+        """
+        Return the timing statistics
+
+        Returns:
+            dict: ticks, dropped_ticks, sim_time, wall_time, real_time_factor
+                (simulated seconds per wall second), tick_rate (achieved) and the
+                jitter (mean, std and max absolute deviation of the tick interval
+                from its period, in seconds)
+        """
+        wall_time = 0.0 if self._start is None else time.perf_counter() - self._start
+        # The ring buffer holds one interval per tick after the first
+        intervals = self._intervals[: min(max(self.ticks - 1, 0), len(self._intervals))]
+        deviation = np.abs(intervals - self.period)
+        return {
+            "ticks": self.ticks,
+            "dropped_ticks": self.dropped_ticks,
+            "sim_time": self.sim_time,
+            "wall_time": wall_time,
+            "real_time_factor": self.sim_time / wall_time if wall_time > 0 else 0.0,
+            "tick_rate": self.ticks / wall_time if wall_time > 0 else 0.0,
+            "jitter_mean": float(deviation.mean()) if len(deviation) else 0.0,
+            "jitter_std": float(intervals.std()) if len(intervals) else 0.0,
+            "jitter_max": float(deviation.max()) if len(deviation) else 0.0,
+        }
+
+    def _record_tick(self):
+        now = time.perf_counter()
+        if self._last_tick is not None:
+            self._intervals[(self.ticks - 1) % len(self._intervals)] = (
+                now - self._last_tick
+            )
+        self._last_tick = now
+        self.ticks += 1
+        self.sim_time += self.dt
@@ -0,0 +1,159 @@
+import itertools
+
+import numpy as np
+
+
+class SpatialHash:
+    """Uniform-grid cell list for fixed-radius neighbor queries"""
+
+    def __init__(self, cell_size, bounds, max_candidates=1 << 20):
+        """
+        Parameters:
+            cell_size (float): The edge length of a cell, at least the largest query radius
+            bounds (array-like): The (lower, upper) extent of each axis, shape D x 2
+            max_candidates (int): The maximum number of candidate pairs tested per chunk
+        """
+        self.cell_size = float(cell_size)
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.shape = np.maximum(
+            np.ceil((self.bounds[:, 1] - self.bounds[:, 0]) / self.cell_size), 1
+        ).astype(np.int64)
+        self.max_candidates = max_candidates
+
+        # Half stencil: each pair of adjacent cells is visited exactly once
+        dims = len(self.shape)
+        self._offsets = [
+            np.array(offset)
+            for offset in itertools.product((-1, 0, 1), repeat=dims)
+            if offset > (0,) * dims
+        ]
+
+        self.order = None
+        self.cell_start = None
+        self.cell_count = None
+        self._sorted_cells = None
+        self._sorted_positions = None
+
+    def build(self, positions):
+        """
+        Bin the positions into cells
+
+        Points outside the bounds are clamped into the border cells, which keeps
+        the query exact. When the number of points is unchanged the previous
+        ordering is reused, so the sort only has to fix up the points that
+        changed cell since the last build.
+
+        Parameters:
+            positions (numpy.ndarray): The N x D positions
+
+        Returns:
+            SpatialHash: self
+        """
+        positions = np.asarray(positions, dtype=float)
+        cells = np.floor((positions - self.bounds[:, 0]) / self.cell_size).astype(
+            np.int64
+        )
+        np.clip(cells, 0, self.shape - 1, out=cells)
+        keys = np.ravel_multi_index(cells.T, self.shape)
+
+        if self.order is not None and len(self.order) == len(keys):
+            # Nearly sorted after one step, which the stable sort handles in ~O(N)
+            self.order = self.order[np.argsort(keys[self.order], kind="stable")]
+        else:
+            self.order = np.argsort(keys, kind="stable")
+
+        self.cell_count = np.bincount(keys, minlength=int(np.prod(self.shape)))
+        self.cell_start = np.cumsum(self.cell_count) - self.cell_count
+        self._sorted_cells = cells[self.order]
+        self._sorted_positions = positions[self.order]
+        return self
+
+    def iter_pairs(self, radius):
+        """
+        Yield every pair of points closer than radius, in chunks
+
+        Parameters:
+            radius (float): The query radius, at most the cell size
+
+        Yields:
+            tuple: (i, j, diff, dist) with i, j the point indices (each pair once),
+                diff = positions[i] - positions[j] and dist its norm
+        """
+        if radius > self.cell_size:
+            raise ValueError("Query radius must not exceed the cell size")
+
+        num_points = len(self.order)
+        sorted_index = np.arange(num_points)
+
+        # Pairs inside the same cell, keeping only j after i in sorted order
+        own_keys = np.ravel_multi_index(self._sorted_cells.T, self.shape)
+        cell_end = self.cell_start[own_keys] + self.cell_count[own_keys]
+        yield from self._pairs_in_ranges(
+            sorted_index + 1, cell_end - sorted_index - 1, radius
+        )
+
+        # Pairs between a cell and its forward neighbors
+        for offset in self._offsets:
+            neighbor_cells = self._sorted_cells + offset
+            valid = np.all(
+                (neighbor_cells >= 0) & (neighbor_cells < self.shape), axis=1
+            )
+            neighbor_keys = np.zeros(num_points, dtype=np.int64)
+            neighbor_keys[valid] = np.ravel_multi_index(
+                neighbor_cells[valid].T, self.shape
+            )
+            count = np.where(valid, self.cell_count[neighbor_keys], 0)
+            yield from self._pairs_in_ranges(
+                self.cell_start[neighbor_keys], count, radius
+            )
+
+    def _pairs_in_ranges(self, start, count, radius):
+        """Test each sorted point against the sorted range [start, start + count)"""
+        total = np.cumsum(count)
+        if len(total) == 0 or total[-1] == 0:
+            return
+
+        # Split the points so each chunk tests about max_candidates pairs
+        bounds = np.searchsorted(
+            total, np.arange(self.max_candidates, total[-1], self.max_candidates)
+        )
+        for lo, hi in zip(
+            np.concatenate([[0], bounds + 1]),
+            np.concatenate([bounds + 1, [len(count)]]),
+        ):
+            chunk_count = count[lo:hi]
+            num_candidates = int(chunk_count.sum())
+            if num_candidates == 0:
+                continue
+            a = np.repeat(np.arange(lo, hi), chunk_count)
+            first = np.cumsum(chunk_count) - chunk_count
+            b = np.repeat(start[lo:hi] - first, chunk_count) + np.arange(num_candidates)
+
+            diff = self._sorted_positions[a] - self._sorted_positions[b]
+            dist = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+            close = dist < radius
+            yield self.order[a[close]], self.order[b[close]], diff[close], dist[close]
+
+
+def brute_force_pairs(positions, radius, max_candidates=1 << 20):
+    """
+    Yield every pair of points closer than radius by testing all N^2 / 2 pairs
+
+    Parameters:
+        positions (numpy.ndarray): The N x D positions
+        radius (float): The query radius
+        max_candidates (int): The maximum number of candidate pairs tested per chunk
+
+    Yields:
+        tuple: (i, j, diff, dist) in the same layout as SpatialHash.iter_pairs
+    """
+    num_points = len(positions)
+    rows_per_chunk = max(1, max_candidates // max(num_points, 1))
+    for lo in range(0, num_points, rows_per_chunk):
+        hi = min(lo + rows_per_chunk, num_points)
+        diff = positions[lo:hi, None, :] - positions[None, :, :]
+        dist = np.sqrt(np.einsum("ijk,ijk->ij", diff, diff))
+        i, j = np.nonzero(
+            (dist < radius) & (np.arange(num_points) > np.arange(lo, hi)[:, None])
+        )
+        yield i + lo, j, diff[i, j], dist[i, j]
@@ -0,0 +1,455 @@
+import json
+import math
+import os
+import threading
+import time
+from itertools import repeat
+
+import pandas as pd
+
+from utils.db_connection import ConnectionManager
+from utils.db_schema import PRIMARY_KEY, TABLES, quote
+
+# The history database, kept apart from the dashboard tables since it grows
+# with every tick
+HISTORY_DB_PATH = "./src/data/telemetry_history.db"
+
+# Environment variable that turns the process-wide history of get_history()
+# on and names its database
+HISTORY_DB_ENV = "SWARM_SQUAD_HISTORY_DB"
+
+# Seconds of samples per partition table
+PARTITION_SECONDS = 300
+
+# Seconds of history kept, older partitions are dropped
+RETENTION_SECONDS = 24 * 3600
+
+# (age, interval) tiers: samples older than age seconds are thinned to the
+# first sample of each agent per interval seconds
+DOWNSAMPLING = ((600, 1.0), (3600, 10.0))
+
+# Columns added in front of the telemetry columns of every sample; ticks
+# are numbered per source, the producer that appended the sample
+TIME = "Time"
+TICK = "Tick"
+SOURCE = "Source"
+
+REGISTRY = "telemetry_history_partitions"
+SOURCES = "telemetry_history_sources"
+
+
+def partition_name(start):
+    """Return the table holding the samples of the partition starting at start"""
+    return f"telemetry_history_{int(start)}"
+
+
+class TelemetryHistory:
+    """
+    Append-only history of the telemetry table, partitioned by time
+
+    Every append stores a snapshot of the telemetry table with its timestamp,
+    source and tick number in the table of its time window, indexed on
+    ("Agent Name", "Time") for per-agent reads and on ("Time", "Source") for
+    time ranges.
+    Queries only touch the partitions overlapping the requested range, and
+    retention drops whole partitions, so neither slows down as the history
+    grows. Older partitions are thinned in place according to the
+    downsampling tiers.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        partition_seconds=PARTITION_SECONDS,
+        retention=RETENTION_SECONDS,
+        downsampling=DOWNSAMPLING,
+        readonly=False,
+        source=None,
+        **kwargs,
+    ):
+        """
+        Parameters:
+            path (str): The database file, defaults to $SWARM_SQUAD_HISTORY_DB or
+                HISTORY_DB_PATH
+            partition_seconds (int): The seconds of samples per partition
+            retention (float): The seconds of history kept, None to keep everything
+            downsampling (tuple): (age, interval) tiers, samples older than age
+                seconds keep one sample per agent and interval seconds
+            readonly (bool): Open read-only connections, for readers of a history
+                another process writes
+            source (str): The name appended samples are stored under, defaults to
+                one unique to the process
+            **kwargs: Further ConnectionManager arguments
+        """
+        self.manager = ConnectionManager(
+            path or os.environ.get(HISTORY_DB_ENV, HISTORY_DB_PATH),
+            readonly=readonly,
+            **kwargs,
+        )
+        self.partition_seconds = int(partition_seconds)
+        self.retention = retention
+        self.downsampling = tuple(sorted(downsampling))
+        self.columns = tuple(TABLES["telemetry"])
+        self.source = source or f"pid-{os.getpid()}"
+        # The last tick of every source this history appended for
+        self.ticks = {}
+        self._partition = None
+        self._lock = threading.Lock()
+        if not readonly:
+            self.manager.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(REGISTRY)} "
+                '("Start" INTEGER PRIMARY KEY, "End" INTEGER NOT NULL, '
+                '"Resolution" REAL NOT NULL DEFAULT 0)'
+            )
+            self.manager.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(SOURCES)} "
+                f"({quote(SOURCE)} TEXT PRIMARY KEY)"
+            )
+
+    def _create_partition(self, start):
+        name = partition_name(start)
+        columns = ", ".join(
+            f"{quote(column)} {kind}" for column, kind in TABLES["telemetry"].items()
+        )
+        conn = self.manager.connection()
+        with conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(name)} "
+                f"({quote(TIME)} REAL NOT NULL, {quote(TICK)} INTEGER NOT NULL, "
+                f"{quote(SOURCE)} TEXT NOT NULL, {columns})"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(name + '_agent_time')} "
+                f"ON {quote(name)} ({quote(PRIMARY_KEY)}, {quote(TIME)})"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(name + '_time')} "
+                f"ON {quote(name)} ({quote(TIME)}, {quote(SOURCE)})"
+            )
+            conn.execute(
+                f'INSERT OR IGNORE INTO {quote(REGISTRY)} ("Start", "End") VALUES (?, ?)',
+                (start, start + self.partition_seconds),
+            )
+        return name
+
+    def partitions(self, start=None, end=None):
+        """
+        Return the partitions overlapping a time range, oldest first
+
+        Parameters:
+            start (float): The earliest timestamp, None for no bound
+            end (float): The timestamp the range ends before, None for no bound
+
+        Returns:
+            pandas.DataFrame: The "Start", "End" and "Resolution" of every partition,
+                a resolution of 0 meaning full rate
+        """
+        return self.manager.read_frame(
+            f'SELECT "Start", "End", "Resolution" FROM {quote(REGISTRY)} '
+            'WHERE (? IS NULL OR "End" > ?) AND (? IS NULL OR "Start" < ?) '
+            'ORDER BY "Start"',
+            (start, start, end, end),
+        )
+
+    def append(self, df, timestamp=None, tick=None, source=None):
+        """
+        Store a snapshot of the telemetry table
+
+        Parameters:
+            df (pandas.DataFrame): The telemetry rows, in the layout of the
+                telemetry table
+            timestamp (float): The Unix time of the snapshot, defaults to now
+            tick (int): The producer's tick number, defaults to one more than the
+                last one of the source
+            source (str): The producer, defaults to the history's source
+
+        Returns:
+            int: The tick number stored
+        """
+        return self.extend([(df, timestamp, tick)], source)[0]
+
+    def extend(self, snapshots, source=None):
+        """
+        Store several snapshots of the telemetry table in a single transaction
+
+        Parameters:
+            snapshots (list): (df, timestamp, tick) triples in time order, with
+                timestamp and tick None for their defaults as in append
+            source (str): The producer, defaults to the history's source
+
+        Returns:
+            list: The tick numbers stored
+        """
+        source = source or self.source
+        inserts = []
+        with self._lock:
+            if source not in self.ticks:
+                self.manager.execute(
+                    f"INSERT OR IGNORE INTO {quote(SOURCES)} VALUES (?)", (source,)
+                )
+                self.ticks[source] = self._last_tick(source)
+            for df, timestamp, tick in snapshots:
+                unknown = set(df.columns) - set(self.columns)
+                if unknown:
+                    raise ValueError(f"Unknown telemetry columns: {sorted(unknown)}")
+                timestamp = time.time() if timestamp is None else float(timestamp)
+                start = (
+                    int(timestamp // self.partition_seconds) * self.partition_seconds
+                )
+                if self._partition != start:
+                    self._create_partition(start)
+                    if self._partition is not None:
+                        # A window has just closed, apply the policies to the old ones
+                        self.maintain(timestamp)
+                    self._partition = start
+                if tick is None:
+                    tick = self.ticks[source] + 1
+                self.ticks[source] = tick
+                inserts.append((df, timestamp, int(tick), start))
+
+        conn = self.manager.connection()
+        with conn:
+            for df, timestamp, tick, start in inserts:
+                columns = (TIME, TICK, SOURCE, *df.columns)
+                names = ", ".join(quote(column) for column in columns)
+                values = ", ".join("?" for _ in columns)
+                rows = zip(
+                    repeat(timestamp),
+                    repeat(tick),
+                    repeat(source),
+                    *(df[column].tolist() for column in df.columns),
+                )
+                conn.executemany(
+                    f"INSERT INTO {quote(partition_name(start))} ({names}) "
+                    f"VALUES ({values})",
+                    rows,
+                )
+        return [tick for _, _, tick, _ in inserts]
+
+    def sources(self):
+        """Return the names of the sources that appended samples"""
+        return [
+            row[0]
+            for row in self.manager.connection().execute(
+                f"SELECT {quote(SOURCE)} FROM {quote(SOURCES)} ORDER BY 1"
+            )
+        ]
+
+    def _latest(self, partition, source, start=None, end=None):
+        # Walks the ("Time", "Source") index back from end
+        where, params = self._where(start, end, source=source)
+        row = (
+            self.manager.connection()
+            .execute(
+                f"SELECT {quote(TIME)}, {quote(TICK)} "
+                f"FROM {quote(partition_name(partition))} "
+                f"WHERE {where} ORDER BY {quote(TIME)} DESC LIMIT 1",
+                params,
+            )
+            .fetchone()
+        )
+        return row
+
+    def _last_tick(self, source):
+        # The newest partitions may hold no sample of the source yet
+        for partition in reversed(self.partitions()["Start"].tolist()):
+            latest = self._latest(partition, source)
+            if latest is not None:
+                return latest[1]
+        return -1
+
+    def maintain(self, now=None):
+        """
+        Apply the retention and downsampling policies
+
+        Drops the partitions that ended more than retention seconds ago and
+        thins those that ended more than a tier's age ago to the tier's
+        interval. Called whenever append opens a new partition.
+
+        Parameters:
+            now (float): The current Unix time, defaults to now
+
+        Returns:
+            dict: The number of "dropped" and "downsampled" partitions
+        """
+        now = time.time() if now is None else now
+        partitions = self.partitions()
+        conn = self.manager.connection()
+        dropped = downsampled = 0
+
+        for start, end, resolution in partitions.itertuples(index=False):
+            name = partition_name(start)
+            if self.retention is not None and end <= now - self.retention:
+                with conn:
+                    conn.execute(f"DROP TABLE IF EXISTS {quote(name)}")
+                    conn.execute(
+                        f'DELETE FROM {quote(REGISTRY)} WHERE "Start" = ?', (start,)
+                    )
+                dropped += 1
+                continue
+
+            interval = max(
+                (interval for age, interval in self.downsampling if end <= now - age),
+                default=0,
+            )
+            if interval > resolution:
+                with conn:
+                    # The bare rowid is taken from the row holding the MIN()
+                    conn.execute(
+                        f"DELETE FROM {quote(name)} WHERE rowid NOT IN ("
+                        f"SELECT rowid FROM (SELECT rowid, MIN({quote(TIME)}) "
+                        f"FROM {quote(name)} GROUP BY {quote(SOURCE)}, {quote(PRIMARY_KEY)}, "
+                        f"CAST({quote(TIME)} / ? AS INTEGER)))",
+                        (interval,),
+                    )
+                    conn.execute(
+                        f'UPDATE {quote(REGISTRY)} SET "Resolution" = ? WHERE "Start" = ?',
+                        (interval, start),
+                    )
+                downsampled += 1
+        return {"dropped": dropped, "downsampled": downsampled}
+
+    def _select(self, columns):
+        columns = self.columns if columns is None else tuple(columns)
+        added = (TIME, TICK, SOURCE, PRIMARY_KEY)
+        unknown = set(columns) - set(self.columns) - set(added)
+        if unknown:
+            raise ValueError(f"Unknown telemetry columns: {sorted(unknown)}")
+        return list(added) + [column for column in columns if column not in added]
+
+    def _where(self, start=None, end=None, agents=None, source=None):
+        # Only bounds that are set, "? IS NULL OR" would keep the indexes unused
+        clauses, params = [], []
+        if start is not None:
+            clauses.append(f"{quote(TIME)} >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append(f"{quote(TIME)} < ?")
+            params.append(end)
+        if source is not None:
+            clauses.append(f"{quote(SOURCE)} = ?")
+            params.append(source)
+        if agents is not None:
+            clauses.append(f"{quote(PRIMARY_KEY)} IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps([int(agent) for agent in agents]))
+        return " AND ".join(clauses) or "1", tuple(params)
+
+    def query(self, start=None, end=None, agents=None, columns=None, source=None):
+        """
+        Read the samples of a time range
+
+        Parameters:
+            start (float): The earliest Unix time, None for the start of the history
+            end (float): The Unix time the range ends before, None for now
+            agents (list): The agent names to read, None for every agent
+            columns (list): The telemetry columns to read, None for all of them
+            source (str): The producer to read, None for every source
+
+        Returns:
+            pandas.DataFrame: The "Time", "Tick", "Source", "Agent Name" and requested
+                columns of every sample, ordered by time and agent
+        """
+        selected = self._select(columns)
+        names = ", ".join(quote(column) for column in selected)
+        where, params = self._where(start, end, agents, source)
+        frames = [
+            self.manager.read_frame(
+                f"SELECT {names} FROM {quote(partition_name(partition))} "
+                f"WHERE {where} ORDER BY {quote(TIME)}, {quote(PRIMARY_KEY)}",
+                params,
+            )
+            for partition in self.partitions(start, end)["Start"]
+        ]
+        if not frames:
+            return pd.DataFrame(columns=selected)
+        return pd.concat(frames, ignore_index=True)
+
+    def snapshot(self, at, agents=None, columns=None, lookback=None, source=None):
+        """
+        Read the telemetry table as it was at a point in time
+
+        Takes the last snapshot each source stored at or before at, and the
+        newest sample of an agent that several sources wrote.
+
+        Parameters:
+            at (float): The Unix time
+            agents (list): The agent names to read, None for every agent
+            columns (list): The telemetry columns to read, None for all of them
+            lookback (float): The seconds before at searched for a snapshot, defaults
+                to the partition length
+            source (str): The producer to read, None for every source
+
+        Returns:
+            pandas.DataFrame: One sample per agent, ordered by agent, empty if no
+                snapshot was stored within lookback
+        """
+        lookback = self.partition_seconds if lookback is None else lookback
+        selected = self._select(columns)
+        names = ", ".join(quote(column) for column in selected)
+        end = math.nextafter(at, math.inf)
+        partitions = self.partitions(at - lookback, end)["Start"].tolist()
+
+        frames = []
+        for name in self.sources() if source is None else [source]:
+            for partition in reversed(partitions):
+                latest = self._latest(partition, name, at - lookback, end)
+                if latest is not None:
+                    where, params = self._where(agents=agents, source=name)
+                    frames.append(
+                        self.manager.read_frame(
+                            f"SELECT {names} FROM {quote(partition_name(partition))} "
+                            f"WHERE {quote(TIME)} = ? AND {where}",
+                            (latest[0], *params),
+                        )
+                    )
+                    break
+        if not frames:
+            return pd.DataFrame(columns=selected)
+        samples = pd.concat(frames, ignore_index=True)
+        samples = samples.sort_values(TIME).drop_duplicates(PRIMARY_KEY, keep="last")
+        return samples.sort_values(PRIMARY_KEY, ignore_index=True)
+
+    def close(self):
+        """Close the connections of every thread"""
+        self.manager.close_all()
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history():
+    """
+    Return the process-wide TelemetryHistory, None while the history is off
+
+    The history is kept only when $SWARM_SQUAD_HISTORY_DB names its database or
+    configure_history() turned it on.
+    """
+    global _history
+    if _history is None and os.environ.get(HISTORY_DB_ENV):
+        with _history_lock:
+            if _history is None:
+                _history = TelemetryHistory()
+    return _history
+
+
+def configure_history(path=None, **kwargs):
+    """
+    Turn the process-wide history on
+
+    Closes the connections of the previous one.
+
+    Parameters:
+        path (str): The database file, defaults to $SWARM_SQUAD_HISTORY_DB or
+            HISTORY_DB_PATH
+        **kwargs: Further TelemetryHistory arguments
+
+    Returns:
+        TelemetryHistory: The new history
+    """
+    global _history
+    with _history_lock:
+        if _history is not None:
+            _history.close()
+        _history = TelemetryHistory(path, **kwargs)
+    return _history
@@ -0,0 +1,92 @@
+import threading
+import time
+
+
+class TelemetryPublisher:
+    """Publish the latest simulation snapshot to the sinks from a background thread"""
+
+    def __init__(self, format_fn, sinks, rate=10.0):
+        """
+        Parameters:
+            format_fn (callable): Turns a snapshot into the telemetry data dict
+            sinks (list): Callables that receive the telemetry data
+            rate (float): The maximum number of publishes per second
+        """
+        self.format_fn = format_fn
+        self.sinks = list(sinks)
+        self.period = 1.0 / rate
+
+        # Latest-value hand-off: a newer snapshot replaces an unpublished one
+        self._latest = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.submitted = 0
+        self.published = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def start(self):
+        """Start the publisher thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, snapshot):
+        """Hand a snapshot to the publisher without waiting for any I/O"""
+        with self._lock:
+            if self._latest is not None:
+                self.coalesced += 1
+            self._latest = snapshot
+            self.submitted += 1
+        self._ready.set()
+
+    def stop(self, flush=True):
+        """Stop the publisher thread, publishing the pending snapshot if flush is set"""
+        self._stopped.set()
+        self._ready.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            self._publish_latest()
+
+    def stats(self):
+        """Return the publish counters"""
+        return {
+            "submitted": self.submitted,
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+    def _run(self):
+        next_publish = time.monotonic()
+        while not self._stopped.is_set():
+            self._ready.wait()
+            # Hold back until the next publish slot, newer snapshots keep replacing the pending one
+            delay = next_publish - time.monotonic()
+            if delay > 0 and self._stopped.wait(delay):
+                break
+            next_publish = max(next_publish + self.period, time.monotonic())
+            self._publish_latest()
+
+    def _publish_latest(self):
+        with self._lock:
+            snapshot, self._latest = self._latest, None
+            self._ready.clear()
+        if snapshot is None:
+            return
+
+        try:
+            data = self.format_fn(snapshot)
+            for sink in self.sinks:
+                sink(data)
+            self.published += 1
+        except Exception as e:
+            self.dropped += 1
+            print(f"[ERROR] Failed to publish telemetry: {e}")
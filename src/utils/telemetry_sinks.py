@@ -0,0 +1,88 @@
+import csv
+
+import pandas as pd
+
+from utils.db_write_behind import WriteBehindWriter
+from utils.db_writer import telemetry_tbl_writer
+from utils.telemetry_history import get_history
+
+
+def db_sink(data):
+    """Write the telemetry data to the SQLite database"""
+    telemetry_tbl_writer(pd.DataFrame(data))
+
+
+class WriteBehindSink:
+    """Queue the telemetry data for a background thread that batches database writes"""
+
+    def __init__(self, **kwargs):
+        """
+        Parameters:
+            **kwargs: WriteBehindWriter arguments, such as flush_interval or max_queue
+        """
+        self.writer = WriteBehindWriter(history=get_history(), **kwargs).start()
+
+    def __call__(self, data):
+        self.writer.submit(pd.DataFrame(data), "telemetry")
+
+    def close(self):
+        self.writer.close()
+        stats = self.writer.stats()
+        print(
+            f"[INFO] Database writer: {stats['flushes']} flushes of "
+            f"{stats['submitted']} frames, {stats['rows_per_second']:.0f} rows/sec, "
+            f"flush latency {stats['flush_latency_mean'] * 1e3:.2f} ms mean / "
+            f"{stats['flush_latency_max'] * 1e3:.2f} ms max, "
+            f"{stats['dropped']} frames dropped"
+        )
+
+
+def ws_sink(data):
+    """Send the telemetry data to the WebSocket clients"""
+    # Imported on first use, the writer starts the WebSocket server subprocess
+    from utils.websocket_writer import ws_writer
+
+    ws_writer(data)
+
+
+class CsvSink:
+    """Append the telemetry data of every update to a CSV file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.frame = 0
+        self._file = open(path, "w", newline="")
+        self._writer = None
+
+    def __call__(self, data):
+        if self._writer is None:
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["Frame", *data.keys()])
+        self._writer.writerows(
+            [self.frame, *row] for row in zip(*(data[key] for key in data))
+        )
+        self.frame += 1
+
+    def close(self):
+        self._file.close()
+
+
+def make_sink(spec):
+    """
+    Create a telemetry sink from its command line name
+
+    Parameters:
+        spec (str): "db", "db-async", "ws" or "csv:<path>"
+
+    Returns:
+        callable: The sink
+    """
+    if spec == "db":
+        return db_sink
+    if spec == "db-async":
+        return WriteBehindSink()
+    if spec == "ws":
+        return ws_sink
+    if spec.startswith("csv:"):
+        return CsvSink(spec[len("csv:") :])
+    raise ValueError(f"Unknown sink: {spec}")
@@ -0,0 +1,170 @@
+import numpy as np
+
+
+class TrajectoryStore:
+    """
+    Preallocated T x N x D history of swarm positions
+
+    Without a capacity the buffer grows by doubling and keeps every sample.
+    With a capacity the memory is fixed: by default the store is a ring buffer
+    of the latest capacity samples, with decimate=True it keeps the whole run
+    instead, dropping every other sample and halving the sampling rate each
+    time it fills up.
+
+    view() returns the stored samples in order as a read-only view without
+    copying. Ring buffers write every sample twice, at i and i + capacity, so
+    the latest window is always contiguous. A view stays valid until the next
+    append.
+    """
+
+    def __init__(self, swarm_size, dims=2, capacity=None, decimate=False):
+        """
+        Parameters:
+            swarm_size (int): The number of agents N
+            dims (int): The number of coordinates D of a position
+            capacity (int): The most samples kept, None to keep all
+            decimate (bool): Thin out old samples instead of dropping them once full
+        """
+        if capacity is not None and capacity < 2:
+            raise ValueError("The capacity must be at least 2 samples")
+        if decimate and capacity is None:
+            raise ValueError("Decimation needs a capacity")
+        self.swarm_size = swarm_size
+        self.dims = dims
+        self.capacity = capacity
+        self.decimate = decimate
+        self.clear()
+
+    @property
+    def ring(self):
+        return self.capacity is not None and not self.decimate
+
+    def clear(self):
+        """Forget every sample"""
+        if self.capacity is None:
+            length = 64
+        else:
+            length = 2 * self.capacity if self.ring else self.capacity
+        self._buffer = np.empty((length, self.swarm_size, self.dims))
+        self._steps = np.empty(length, dtype=np.int64)
+        self._start = 0
+        self._size = 0
+        self.total = 0  # Samples appended since the last clear
+        self.stride = 1  # Appended samples per stored sample
+
+    def __len__(self):
+        return self._size
+
+    def append(self, positions):
+        """
+        Record the positions of the next step
+
+        Parameters:
+            positions (numpy.ndarray): The N x D positions, copied into the store
+
+        Returns:
+            bool: Whether the sample was stored, False when decimation skipped it
+        """
+        step = self.total
+        self.total += 1
+        if self.ring:
+            self._append_ring(step, positions)
+            return True
+
+        if step % self.stride:
+            return False
+        if self._size == len(self._buffer):
+            if self.capacity is None:
+                self._grow()
+            else:
+                self._thin()
+                if step % self.stride:
+                    return False
+        self._buffer[self._size] = positions
+        self._steps[self._size] = step
+        self._size += 1
+        return True
+
+    def view(self):
+        """Return the stored samples, oldest first, as a read-only T x N x D view"""
+        return self._readonly(self._buffer[self._start : self._start + self._size])
+
+    def steps(self):
+        """Return the step index of every stored sample as a read-only view"""
+        return self._readonly(self._steps[self._start : self._start + self._size])
+
+    def latest(self):
+        """Return the most recent stored sample"""
+        if not self._size:
+            raise IndexError("The trajectory store is empty")
+        return self.view()[-1]
+
+    def load(self, samples, steps=None, total=None, stride=None):
+        """
+        Replace the contents with samples, e.g. from a checkpoint
+
+        Parameters:
+            samples (numpy.ndarray): The T x N x D samples, oldest first
+            steps (numpy.ndarray): The step index of every sample, 0..T-1 by default
+            total (int): The number of samples appended so far, last step + 1 by default
+            stride (int): The decimation stride, the spacing of the steps by default
+        """
+        samples = np.asarray(samples, dtype=float).reshape(
+            -1, self.swarm_size, self.dims
+        )
+        steps = np.arange(len(samples)) if steps is None else np.asarray(steps)
+        self.clear()
+        if self.capacity is None:
+            while len(self._buffer) < len(samples):
+                self._grow()
+        elif self.decimate:
+            if stride is None and len(steps) > 1:
+                stride = int(steps[1] - steps[0])
+            self.stride = stride or 1
+        # Keep what the store would hold had the samples been appended
+        keep = (
+            len(samples) if self.capacity is None else min(len(samples), self.capacity)
+        )
+        samples, steps = samples[len(samples) - keep :], steps[len(steps) - keep :]
+        self._buffer[:keep] = samples
+        self._steps[:keep] = steps
+        if self.ring:
+            self._buffer[self.capacity : self.capacity + keep] = samples
+            self._steps[self.capacity : self.capacity + keep] = steps
+            self._start = 0
+        self._size = keep
+        if total is None:
+            total = int(steps[-1]) + 1 if keep else 0
+        self.total = int(total)
+
+    def _append_ring(self, step, positions):
+        if self._size < self.capacity:
+            index = self._size
+            self._size += 1
+        else:
+            index = self._start
+            self._start = (self._start + 1) % self.capacity
+        for i in (index, index + self.capacity):
+            self._buffer[i] = positions
+            self._steps[i] = step
+
+    def _grow(self):
+        buffer = np.empty((2 * len(self._buffer), self.swarm_size, self.dims))
+        steps = np.empty(2 * len(self._steps), dtype=np.int64)
+        buffer[: self._size] = self._buffer[: self._size]
+        steps[: self._size] = self._steps[: self._size]
+        self._buffer, self._steps = buffer, steps
+
+    def _thin(self):
+        # Keep every other sample, the first one included, and halve the rate
+        kept = (self._size + 1) // 2
+        self._buffer[:kept] = self._buffer[: self._size : 2].copy()
+        self._steps[:kept] = self._steps[: self._size : 2].copy()
+        self._size = kept
+        self.stride *= 2
+
+    @staticmethod
+    def _readonly(array):
+        array = array.view()
+        array.flags.writeable = False
+        return array
@@ -1,14 +1,20 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
 import asyncio
 import json
-import sqlite3
 from datetime import datetime
 from functools import lru_cache
 from time import time
 
-import pandas as pd
 import websockets
 from websockets.exceptions import ConnectionClosedError
 
+from utils.db_connection import get_reader
+
 
 class DroneWebsocketServer:
     def __init__(self, host="localhost", port=8051):
@@ -21,9 +27,7 @@ class DroneWebsocketServer:
     @lru_cache(maxsize=1)
     def get_drone_data(self, timestamp):
         """Cache drone data for short periods to reduce database load"""
-        conn = sqlite3.connect("./src/data/swarm_squad.db")
-        df = pd.read_sql_query("SELECT * from telemetry", conn)
-        conn.close()
+        df = get_reader().read_frame("SELECT * from telemetry")
 
         return {
             "droneCoords": [[row["Location"]] for _, row in df.iterrows()],
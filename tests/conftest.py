@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the source directory to the Python path, as the scripts do for themselves
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+
+@pytest.fixture(autouse=True)
+def temp_databases(tmp_path, monkeypatch):
+    """Point the default databases at temporary files, never at src/data"""
+    monkeypatch.setenv("SWARM_SQUAD_DB", str(tmp_path / "swarm_squad.db"))
+    monkeypatch.delenv("SWARM_SQUAD_HISTORY_DB", raising=False)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from utils.checkpoint import load_checkpoint, save_checkpoint
+
+
+@pytest.mark.parametrize("mmap_mode", ["c", "r", None])
+def test_round_trip(tmp_path, mmap_mode):
+    rng = np.random.default_rng(0)
+    arrays = {
+        "positions": rng.normal(size=(50, 3)),
+        "steps": np.arange(7, dtype=np.int64),
+        "flags": np.array([True, False, True]),
+        "empty": np.zeros((0, 2)),
+        # Not contiguous, saved as a contiguous copy
+        "strided": np.arange(20.0).reshape(4, 5)[:, ::2],
+    }
+    meta = {"kind": "test", "tick": 12, "rng_state": rng.bit_generator.state}
+    path = tmp_path / "state.ckpt"
+
+    save_checkpoint(path, arrays, meta)
+    loaded, loaded_meta = load_checkpoint(path, mmap_mode=mmap_mode)
+
+    assert loaded_meta == meta
+    assert list(loaded) == list(arrays)
+    for name, array in arrays.items():
+        assert loaded[name].dtype == array.dtype
+        np.testing.assert_array_equal(loaded[name], array)
+    assert not (tmp_path / "state.ckpt.tmp").exists()
+
+
+def test_copy_on_write_leaves_the_file_unchanged(tmp_path):
+    path = tmp_path / "state.ckpt"
+    save_checkpoint(path, {"positions": np.zeros((4, 2))})
+
+    arrays, _ = load_checkpoint(path, mmap_mode="c")
+    arrays["positions"] += 1.0
+
+    again, _ = load_checkpoint(path, mmap_mode=None)
+    np.testing.assert_array_equal(again["positions"], np.zeros((4, 2)))
+
+
+def test_not_a_checkpoint(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a checkpoint at all")
+    with pytest.raises(ValueError):
+        load_checkpoint(path)
@@ -0,0 +1,138 @@
+import sqlite3
+import threading
+
+import pandas as pd
+import pytest
+
+from utils import db_connection
+from utils.db_connection import ConnectionManager
+
+
+def agents(rows):
+    """Return an agent table with the given {agent name: status} rows"""
+    return pd.DataFrame(
+        {
+            "Agent Name": list(rows),
+            "Agent Type": ["Drone"] * len(rows),
+            "Status": list(rows.values()),
+            "Mode": ["Auto"] * len(rows),
+            "Alert Count": [0] * len(rows),
+        }
+    )
+
+
+def table(manager):
+    df = manager.read_frame('SELECT "Agent Name", "Status" FROM agent')
+    return dict(zip(df["Agent Name"], df["Status"]))
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "test.db"))
+    yield manager
+    manager.close_all()
+
+
+def test_connection_is_kept_per_thread(manager):
+    conn = manager.connection()
+    assert manager.connection() is conn
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(manager.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_write_and_read_frames(manager):
+    df = pd.DataFrame({"Agent Name": [1, 2], "Status": ["A1", "A2"]})
+    manager.write_frame(df, "agent")
+    pd.testing.assert_frame_equal(manager.read_frame("SELECT * FROM agent"), df)
+
+    manager.execute('UPDATE agent SET "Status" = ? WHERE "Agent Name" = ?', ("B1", 1))
+    assert manager.read_frame("SELECT * FROM agent")["Status"].tolist() == [
+        "B1",
+        "A2",
+    ]
+
+
+def test_default_path_follows_the_environment(tmp_path):
+    assert ConnectionManager().path == str(tmp_path / "swarm_squad.db")
+
+
+def test_close_all_closes_every_connection(manager):
+    conn = manager.connection()
+    manager.close_all()
+    assert manager.connection() is not conn
+
+
+def test_configure_points_the_shared_manager_at_a_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_connection, "_manager", None)
+    manager = db_connection.configure(str(tmp_path / "other.db"))
+    assert db_connection.get_manager() is manager
+    assert manager.path == str(tmp_path / "other.db")
+    manager.close_all()
+
+
+def test_upsert_inserts_and_updates(manager):
+    manager.upsert_frame(agents({1: "A1", 2: "A2"}), "agent")
+    manager.upsert_frame(agents({1: "A1", 2: "B2"}), "agent")
+    assert table(manager) == {1: "A1", 2: "B2"}
+
+
+def test_prune_deletes_missing_agents(manager):
+    manager.upsert_frame(agents({1: "A1", 2: "A2", 3: "A3"}), "agent")
+    manager.upsert_frame(agents({1: "A1", 3: "A3"}), "agent")
+    assert table(manager) == {1: "A1", 3: "A3"}
+
+
+def test_upsert_without_prune_keeps_missing_agents(manager):
+    manager.upsert_frame(agents({1: "A1", 2: "A2"}), "agent")
+    manager.upsert_frame(agents({3: "A3"}), "agent", prune=False)
+    assert table(manager) == {1: "A1", 2: "A2", 3: "A3"}
+
+
+def test_upsert_counts_the_changed_rows(manager):
+    assert manager.upsert_frame(agents({1: "A1", 2: "A2"}), "agent") == 2
+    # Unchanged rows are skipped
+    assert manager.upsert_frame(agents({1: "A1", 2: "A2"}), "agent") == 0
+    assert manager.upsert_frame(agents({1: "A1", 2: "B2"}), "agent") == 1
+    # A pruned agent counts as well
+    assert manager.upsert_frame(agents({1: "A1"}), "agent") == 1
+
+
+def test_readonly_manager_cannot_write(tmp_path):
+    path = str(tmp_path / "test.db")
+    writer = ConnectionManager(path)
+    writer.upsert_frame(agents({1: "A1"}), "agent")
+    reader = ConnectionManager(path, readonly=True)
+    try:
+        assert table(reader) == {1: "A1"}
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute("DELETE FROM agent")
+    finally:
+        reader.close_all()
+        writer.close_all()
+
+
+def test_upsert_frames_writes_several_tables(manager):
+    telemetry = pd.DataFrame({"Agent Name": [1], "Altitude": [10.0]})
+    manager.upsert_frames([(agents({1: "A1"}), "agent"), (telemetry, "telemetry")])
+    assert table(manager) == {1: "A1"}
+    altitudes = manager.read_frame('SELECT "Altitude" FROM telemetry')["Altitude"]
+    assert altitudes.tolist() == [10.0]
+
+
+def test_two_writers_leave_the_last_frame(tmp_path):
+    path = str(tmp_path / "shared.db")
+    a, b = ConnectionManager(path), ConnectionManager(path)
+    try:
+        a.upsert_frame(agents({1: "A1", 2: "A2"}), "agent")
+        b.upsert_frame(agents({1: "B1", 2: "B2", 3: "B3"}), "agent")
+        # A writes the same frame again, the table must be A's frame only
+        a.upsert_frame(agents({1: "A1", 2: "A2"}), "agent")
+        assert table(a) == {1: "A1", 2: "A2"}
+        assert table(b) == {1: "A1", 2: "A2"}
+    finally:
+        a.close_all()
+        b.close_all()
@@ -0,0 +1,67 @@
+import threading
+
+import pandas as pd
+
+from utils.db_connection import ConnectionManager
+from utils.db_write_behind import WriteBehindWriter
+from utils.telemetry_history import TelemetryHistory
+
+
+def telemetry(altitudes):
+    return pd.DataFrame(
+        {"Agent Name": list(altitudes), "Altitude": list(altitudes.values())}
+    )
+
+
+def test_batches_coalesce_to_the_latest_frame(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "test.db"))
+    history = TelemetryHistory(str(tmp_path / "history.db"))
+    writer = WriteBehindWriter(manager, history, flush_interval=10.0)
+    for k in range(5):
+        writer.submit(telemetry({1: float(k), 2: float(k)}), "telemetry")
+    assert writer.flush(timeout=10.0)
+    writer.close()
+
+    table = manager.read_frame('SELECT "Altitude" FROM telemetry')
+    assert table["Altitude"].tolist() == [4.0, 4.0]
+    # Every frame reaches the history, only the rows sent are counted
+    assert len(history.query()) == 10
+    stats = writer.stats()
+    assert stats["submitted"] == 5
+    assert stats["coalesced"] == 4
+    assert stats["rows"] == 2 + 10
+    manager.close_all()
+    history.close()
+
+
+def test_concurrent_submits_start_one_thread(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "test.db"))
+    writer = WriteBehindWriter(manager)
+    barrier = threading.Barrier(8)
+
+    def submit():
+        barrier.wait()
+        writer.submit(telemetry({1: 0.0}), "telemetry")
+
+    before = threading.active_count()
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert threading.active_count() == before + 1
+    writer.close()
+    manager.close_all()
+
+
+def test_flush_reports_a_failed_batch(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "test.db"))
+    writer = WriteBehindWriter(manager)
+    writer.submit(telemetry({1: 0.0}), "no_such_table")
+    assert not writer.flush(timeout=10.0)
+    assert writer.stats()["failed"] == 1
+
+    writer.submit(telemetry({1: 0.0}), "telemetry")
+    assert writer.flush(timeout=10.0)
+    writer.close()
+    manager.close_all()
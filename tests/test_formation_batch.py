@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from scripts.formation_batch import FormationBatch, random_layouts
+from scripts.formation_kernel import formation_step
+from scripts.formation_metrics import FormationMetrics, calculate_indicators
+from scripts.formation_sim import (
+    ALPHA,
+    DELTA,
+    DESTINATION,
+    PT,
+    R0,
+    FormationController,
+    V,
+)
+
+PARAMS = (ALPHA, DELTA, R0, V, PT)
+
+
+@pytest.mark.parametrize("mode", ["jacobi", "sequential"])
+def test_batched_step_matches_single_steps(mode):
+    layouts = random_layouts(4, seed=0)
+    batched = layouts.copy()
+    singles = layouts.copy()
+    for _ in range(3):
+        _, *batch_matrices = formation_step(batched, *PARAMS, mode=mode)
+        for k in range(len(singles)):
+            _, *matrices = formation_step(singles[k], *PARAMS, mode=mode)
+            for batch_matrix, matrix in zip(batch_matrices, matrices):
+                np.testing.assert_array_equal(batch_matrix[k], matrix)
+        np.testing.assert_array_equal(batched, singles)
+
+
+@pytest.mark.parametrize("mode", ["jacobi", "sequential"])
+def test_batch_matches_individual_controllers(mode):
+    layouts = random_layouts(3, seed=1)
+    batch = FormationBatch(layouts, mode=mode)
+    batch.run(max_iter=300)
+
+    for k, layout in enumerate(layouts):
+        controller = FormationController(
+            layout, DESTINATION, mode=mode, neighbors="dense"
+        )
+        controller.run(max_iter=300)
+        np.testing.assert_array_equal(batch.positions[k], controller.positions)
+        assert controller.converged and batch.converged[k]
+        assert batch.converged_at[k] == controller.converged_at
+        np.testing.assert_allclose(
+            batch.Jn[: controller.iteration, k], controller.metrics.Jn, rtol=1e-12
+        )
+
+
+def test_converged_swarms_stop():
+    batch = FormationBatch(random_layouts(3, seed=1))
+    batch.run(max_iter=300)
+    summary = batch.summary()
+    assert summary["converged"].all()
+    # Nothing is recorded for a swarm after it converged
+    for k, converged_at in enumerate(batch.converged_at):
+        assert np.isnan(batch.Jn[converged_at:, k]).all()
+    assert len(batch.series()) == summary["iterations"].sum()
+
+
+def test_indicators_match_the_metrics():
+    layouts = random_layouts(3, seed=3)
+    _, distances, aij, qualities = formation_step(layouts, *PARAMS)
+    Jn, rn = calculate_indicators(distances, aij, qualities, PT)
+    for k in range(len(layouts)):
+        metrics = FormationMetrics(PT)
+        assert metrics.update(distances[k], aij[k], qualities[k]) == pytest.approx(
+            (Jn[k], rn[k]), rel=1e-12
+        )
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from scripts.formation_kernel import (
+    calculate_aij,
+    calculate_distance,
+    calculate_gij,
+    calculate_rho_ij,
+    formation_step,
+    sparse_formation_step,
+)
+from scripts.formation_metrics import FormationMetrics
+
+# alpha, delta, r0, v and PT of the formation scripts
+PARAMS = (1e-5, 2, 5, 3, 0.94)
+
+
+def reference_step(positions, alpha, delta, r0, v, PT):
+    """The original per-pair loop the sequential mode reproduces"""
+    beta = alpha * (2**delta - 1)
+    swarm_size = len(positions)
+    distances = np.zeros((swarm_size, swarm_size))
+    neighbors = np.zeros((swarm_size, swarm_size))
+    qualities = np.zeros((swarm_size, swarm_size))
+    for i in range(swarm_size):
+        control = np.zeros(2)
+        for j in [j for j in range(swarm_size) if j != i]:
+            rij = calculate_distance(positions[i], positions[j])
+            aij = calculate_aij(alpha, delta, rij, r0, v)
+            gij = calculate_gij(rij, r0)
+            rho_ij = calculate_rho_ij(beta, v, rij, r0) if aij >= PT else 0
+            eij = (positions[i] - positions[j]) / np.sqrt(rij)
+            control[0] += rho_ij * eij[0]
+            control[1] += rho_ij * eij[1]
+            distances[i, j] = distances[j, i] = rij
+            neighbors[i, j] = neighbors[j, i] = aij
+            qualities[i, j] = qualities[j, i] = gij * aij
+        positions[i] += control
+    return distances, neighbors, qualities
+
+
+@pytest.mark.parametrize("swarm_size", [7, 40])
+def test_sequential_mode_is_bit_identical_to_the_loop(swarm_size):
+    rng = np.random.default_rng(swarm_size)
+    expected = rng.uniform(-40, 70, (swarm_size, 2))
+    positions = expected.copy()
+    for _ in range(5):
+        matrices = reference_step(expected, *PARAMS)
+        _, *result = formation_step(positions, *PARAMS, mode="sequential")
+        np.testing.assert_array_equal(positions, expected)
+        for actual, reference in zip(result, matrices):
+            np.testing.assert_array_equal(actual, reference)
+
+
+def test_jacobi_mode_moves_against_the_same_snapshot():
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(-40, 70, (20, 2))
+    start = positions.copy()
+    control, distances, _, _ = formation_step(positions, *PARAMS, mode="jacobi")
+    np.testing.assert_array_equal(positions, start + control)
+    np.testing.assert_allclose(
+        distances, np.linalg.norm(start[:, None] - start[None], axis=-1), rtol=1e-12
+    )
+
+
+def test_unknown_update_mode_is_rejected():
+    with pytest.raises(ValueError):
+        formation_step(np.zeros((3, 2)), *PARAMS, mode="gauss")
+
+
+def test_sparse_step_matches_dense_jacobi():
+    rng = np.random.default_rng(2)
+    dense = rng.uniform(0, 60, (80, 2))
+    for _ in range(5):
+        # Equal up to rounding, so compare single steps from the same positions
+        sparse = dense.copy()
+        dense_control, *_ = formation_step(dense, *PARAMS, mode="jacobi")
+        sparse_control, graph = sparse_formation_step(sparse, *PARAMS)
+        np.testing.assert_allclose(sparse_control, dense_control, atol=1e-9)
+        np.testing.assert_allclose(sparse, dense, rtol=1e-12)
+
+    dense_metrics, sparse_metrics = (
+        FormationMetrics(PARAMS[-1]),
+        FormationMetrics(PARAMS[-1]),
+    )
+    dense_metrics.update(*graph.to_dense())
+    sparse_metrics.update_graph(graph)
+    np.testing.assert_allclose(sparse_metrics.current, dense_metrics.current)
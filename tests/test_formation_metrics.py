@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from scripts.formation_kernel import formation_step
+from scripts.formation_metrics import FormationMetrics, calculate_Jn, calculate_rn
+
+# alpha, delta, r0, v and PT of the formation scripts
+PARAMS = (1e-5, 2, 5, 3, 0.94)
+PT = PARAMS[-1]
+
+
+def pair_matrices(positions):
+    """Return the distances, aij and gij * aij matrices of a layout"""
+    _, *matrices = formation_step(positions.copy(), *PARAMS, mode="jacobi")
+    return matrices
+
+
+@pytest.fixture
+def layout():
+    # Clusters close enough to be neighbors, far enough apart not to be
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 200, (6, 2))
+    return np.repeat(centers, 5, axis=0) + rng.normal(0, 2, (30, 2))
+
+
+def test_update_matches_the_pairwise_functions(layout):
+    distances, aij, qualities = pair_matrices(layout)
+    metrics = FormationMetrics(PT)
+    Jn, rn = metrics.update(distances, aij, qualities)
+    assert Jn == pytest.approx(calculate_Jn(qualities, aij, PT), rel=1e-12)
+    assert rn == pytest.approx(calculate_rn(distances, aij, PT), rel=1e-12)
+
+
+def test_no_neighbors_gives_nan():
+    metrics = FormationMetrics(PT)
+    distances, aij, qualities = pair_matrices(np.array([[0.0, 0.0], [500.0, 0.0]]))
+    assert np.isnan(metrics.update(distances, aij, qualities)).all()
+
+
+def test_update_agents_matches_a_full_update(layout):
+    rng = np.random.default_rng(1)
+    metrics = FormationMetrics(PT)
+    metrics.update(*pair_matrices(layout))
+    for _ in range(10):
+        moved = rng.choice(len(layout), 3, replace=False)
+        layout[moved] += rng.normal(0, 3, (3, 2))
+        matrices = pair_matrices(layout)
+        incremental = metrics.update_agents(moved, *matrices)
+        assert incremental == pytest.approx(FormationMetrics(PT).update(*matrices))
+
+
+def test_update_agents_accepts_repeated_agents_and_a_single_index(layout):
+    metrics = FormationMetrics(PT)
+    metrics.update(*pair_matrices(layout))
+    layout[[2, 3, 7]] += 4.0
+    matrices = pair_matrices(layout)
+    metrics.update_agents([3, 7, 3, 2], *matrices)
+    layout[5] -= 6.0
+    matrices = pair_matrices(layout)
+    assert metrics.update_agents(5, *matrices) == pytest.approx(
+        FormationMetrics(PT).update(*matrices), rel=1e-12
+    )
+
+
+def test_update_agents_needs_a_dense_update_first(layout):
+    with pytest.raises(RuntimeError):
+        FormationMetrics(PT).update_agents([0], *pair_matrices(layout))
+
+
+def test_update_pairs_accepts_either_orientation_and_duplicates(layout):
+    distances, aij, qualities = pair_matrices(layout)
+    metrics = FormationMetrics(PT)
+    metrics.update(distances, aij, qualities)
+
+    # Break the neighbor pair (0, 1), listed twice and reversed, the last wins
+    i, j = np.array([0, 1, 1]), np.array([1, 0, 0])
+    metrics.update_pairs(i, j, [9.0, 9.0, 50.0], [1.0, 1.0, 0.0], [0.5, 0.5, 0.0])
+    aij[0, 1] = aij[1, 0] = 0.0
+    assert metrics.current == pytest.approx(
+        FormationMetrics(PT).update(distances, aij, qualities)
+    )
+
+
+def test_update_pairs_needs_a_dense_update_first():
+    with pytest.raises(RuntimeError):
+        FormationMetrics(PT).update_pairs([0], [1], [1.0], [1.0], [1.0])
+
+
+def test_resync_sheds_the_running_sums(layout):
+    metrics = FormationMetrics(PT, resync_every=3)
+    metrics.update(*pair_matrices(layout))
+    for _ in range(3):
+        current = metrics.update_agents([0], *pair_matrices(layout))
+    assert metrics._updates == 0
+    assert current == FormationMetrics(PT).update(*pair_matrices(layout))
+
+
+def test_series_and_subscribers(layout):
+    metrics = FormationMetrics(PT)
+    samples = []
+    metrics.subscribe(lambda t, Jn, rn: samples.append((t, Jn, rn)))
+    metrics.update(*pair_matrices(layout))
+    metrics.record()
+    metrics.record(t=2.5)
+
+    series = metrics.series()
+    np.testing.assert_array_equal(series["t"], [0.0, 2.5])
+    assert samples == list(zip(series["t"], series["Jn"], series["rn"]))
+    metrics.clear()
+    assert len(metrics.series()["t"]) == 0
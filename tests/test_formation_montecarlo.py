@@ -0,0 +1,19 @@
+from scripts.formation_montecarlo import (
+    aggregate,
+    default_checkpoint,
+    run_sweep,
+    sweep_config,
+)
+
+
+def test_no_tasks_aggregate_without_a_failure_rate():
+    statistics = aggregate(run_sweep(0))
+    assert statistics["runs"] == 0
+    assert statistics["failure_rate"] is None
+
+
+def test_default_checkpoint_follows_the_configuration():
+    assert default_checkpoint(sweep_config()) == default_checkpoint(sweep_config())
+    assert default_checkpoint(sweep_config()) != default_checkpoint(
+        sweep_config(runs_per_task=8)
+    )
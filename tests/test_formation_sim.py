@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from scripts.formation_kernel import formation_step
+from scripts.formation_metrics import FormationMetrics
+from scripts.formation_sim import (
+    ALPHA,
+    DELTA,
+    DESTINATION,
+    INITIAL_POSITIONS,
+    PT,
+    R0,
+    FormationController,
+    V,
+)
+
+PARAMS = (ALPHA, DELTA, R0, V, PT)
+
+
+def test_sequential_controller_follows_the_kernel():
+    controller = FormationController(INITIAL_POSITIONS, DESTINATION)
+    expected = INITIAL_POSITIONS.copy()
+    metrics = FormationMetrics(PT)
+    for iteration in range(30):
+        _, *matrices = formation_step(expected, *PARAMS, mode="sequential")
+        metrics.update(*matrices)
+        controller.step()
+        np.testing.assert_array_equal(controller.positions, expected)
+        # The controller sums its metrics one agent at a time
+        assert controller.metrics.current == pytest.approx(metrics.current, rel=1e-12)
+        assert controller.iteration == iteration + 1
+
+
+def test_sequential_controller_updates_the_metrics_per_agent(monkeypatch):
+    controller = FormationController(INITIAL_POSITIONS, DESTINATION)
+    moved = []
+    update_agents = controller.metrics.update_agents
+
+    def record(agents, *matrices):
+        moved.append(agents)
+        return update_agents(agents, *matrices)
+
+    monkeypatch.setattr(controller.metrics, "update_agents", record)
+    monkeypatch.setattr(
+        controller.metrics, "update", lambda *_: pytest.fail("full update")
+    )
+    controller.step()
+    assert moved == list(range(controller.swarm_size))
+
+
+def test_run_stops_at_max_iter_and_reset_starts_over():
+    controller = FormationController(INITIAL_POSITIONS, DESTINATION)
+    controller.run(max_iter=5)
+    assert controller.iteration == 5
+    assert len(controller.Jn) == 5
+
+    controller.reset()
+    assert controller.iteration == 0
+    np.testing.assert_array_equal(controller.positions, INITIAL_POSITIONS)
+
+
+def test_save_and_restore_continue_the_run(tmp_path):
+    path = str(tmp_path / "formation.ckpt")
+    controller = FormationController(INITIAL_POSITIONS, DESTINATION)
+    controller.run(max_iter=10)
+    controller.save(path)
+    restored = FormationController.restore(path)
+
+    controller.run(max_iter=20)
+    restored.run(max_iter=20)
+    np.testing.assert_array_equal(restored.positions, controller.positions)
+    assert restored.Jn == controller.Jn
@@ -0,0 +1,51 @@
+import time
+
+from utils.sim_clock import SimulationClock
+
+
+def test_first_step_is_taken_at_once():
+    clock = SimulationClock(tick_rate=10.0)
+    assert clock.advance(lambda: None) == 1
+    assert clock.advance(lambda: None) == 0
+
+
+def test_catch_up_is_capped_and_the_backlog_dropped():
+    clock = SimulationClock(tick_rate=1000.0, max_substeps=3)
+    clock.advance(lambda: None)
+    time.sleep(0.02)
+    assert clock.advance(lambda: None) == 3
+    assert clock.dropped_ticks > 0
+
+
+def test_stats_count_the_simulated_time():
+    clock = SimulationClock(tick_rate=1000.0, dt=0.25)
+    clock.run(lambda: None, max_ticks=20)
+    stats = clock.stats()
+    assert stats["ticks"] == 20
+    assert stats["sim_time"] == clock.ticks * 0.25
+    assert stats["wall_time"] > 0
+
+
+def test_run_stops_exactly_at_max_ticks():
+    # Steps slower than the period, so every advance wants to catch up
+    clock = SimulationClock(tick_rate=1000.0, max_substeps=5)
+    steps = []
+    clock.run(lambda: (steps.append(1), time.sleep(0.003)), max_ticks=7)
+    assert clock.ticks == len(steps) == 7
+
+
+def test_until_is_checked_before_every_tick():
+    clock = SimulationClock(tick_rate=1000.0, max_substeps=5)
+    steps = []
+    clock.run(
+        lambda: (steps.append(1), time.sleep(0.003)), until=lambda: len(steps) >= 3
+    )
+    assert clock.ticks == len(steps) == 3
+
+
+def test_advance_respects_the_limit():
+    clock = SimulationClock(tick_rate=1000.0, max_substeps=5)
+    clock.advance(lambda: None)
+    time.sleep(0.01)
+    assert clock.advance(lambda: None, limit=2) == 2
+    assert clock.dropped_ticks == 0
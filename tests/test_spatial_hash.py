@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from utils.spatial_hash import SpatialHash, brute_force_pairs
+
+
+def pair_set(chunks):
+    return {
+        (min(i, j), max(i, j))
+        for chunk_i, chunk_j, _, _ in chunks
+        for i, j in zip(chunk_i.tolist(), chunk_j.tolist())
+    }
+
+
+@pytest.mark.parametrize("dims", [2, 3])
+@pytest.mark.parametrize("max_candidates", [1 << 20, 7])
+def test_grid_matches_brute_force(dims, max_candidates):
+    rng = np.random.default_rng(dims)
+    bounds = np.array([[0.0, 100.0]] * dims)
+    # Some points outside the bounds, which are clamped into the border cells
+    positions = rng.uniform(-10, 110, (400, dims))
+    radius = 12.0
+
+    index = SpatialHash(radius, bounds, max_candidates).build(positions)
+    grid = pair_set(index.iter_pairs(radius))
+    brute = pair_set(brute_force_pairs(positions, radius, max_candidates))
+
+    assert grid == brute
+    assert len(grid) > 0
+
+
+def test_grid_pairs_once_with_matching_distances():
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(0, 50, (300, 2))
+    index = SpatialHash(5.0, [[0, 50], [0, 50]]).build(positions)
+
+    pairs = []
+    for i, j, diff, dist in index.iter_pairs(5.0):
+        np.testing.assert_array_equal(diff, positions[i] - positions[j])
+        np.testing.assert_allclose(dist, np.linalg.norm(diff, axis=1))
+        assert np.all(dist < 5.0)
+        pairs.extend(zip(i.tolist(), j.tolist()))
+    assert len(pairs) == len({(min(i, j), max(i, j)) for i, j in pairs})
+
+
+def test_rebuild_after_moving_matches_brute_force():
+    rng = np.random.default_rng(1)
+    positions = rng.uniform(0, 100, (200, 2))
+    index = SpatialHash(10.0, [[0, 100], [0, 100]])
+    for _ in range(3):
+        index.build(positions)
+        assert pair_set(index.iter_pairs(10.0)) == pair_set(
+            brute_force_pairs(positions, 10.0)
+        )
+        positions = positions + rng.normal(0, 3, positions.shape)
+
+
+def test_radius_larger_than_cell_is_rejected():
+    index = SpatialHash(1.0, [[0, 10], [0, 10]]).build(np.zeros((2, 2)))
+    with pytest.raises(ValueError):
+        next(index.iter_pairs(2.0))
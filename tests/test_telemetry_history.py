@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import telemetry_history
+from utils.telemetry_history import TelemetryHistory
+
+# A partition boundary, so the samples below start a fresh 10 s window
+T0 = 1_000_000.0
+
+
+def telemetry(altitudes):
+    """Return a telemetry table with one row per {agent name: altitude}"""
+    return pd.DataFrame(
+        {"Agent Name": list(altitudes), "Altitude": list(altitudes.values())}
+    )
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = TelemetryHistory(
+        str(tmp_path / "history.db"),
+        partition_seconds=10,
+        retention=100,
+        downsampling=((20, 1.0), (50, 5.0)),
+        source="test",
+    )
+    yield history
+    history.close()
+
+
+def test_query_returns_samples_in_range(history):
+    for k in range(30):
+        history.append(telemetry({1: float(k), 2: -float(k)}), T0 + k)
+
+    assert len(history.partitions()) == 3
+    samples = history.query(T0 + 5, T0 + 15, agents=[1])
+    assert samples["Time"].tolist() == [T0 + k for k in range(5, 15)]
+    assert samples["Altitude"].tolist() == [float(k) for k in range(5, 15)]
+    assert samples["Tick"].tolist() == list(range(5, 15))
+    assert set(samples["Source"]) == {"test"}
+    assert len(history.query()) == 60
+
+
+def test_snapshot_returns_the_last_state_at_a_time(history):
+    history.append(telemetry({1: 1.0, 2: 2.0}), T0)
+    history.append(telemetry({1: 10.0, 2: 20.0}), T0 + 12)
+
+    assert history.snapshot(T0 + 9)["Altitude"].tolist() == [1.0, 2.0]
+    assert history.snapshot(T0 + 12)["Altitude"].tolist() == [10.0, 20.0]
+    assert history.snapshot(T0 - 1).empty
+    # Only lookback seconds are searched, the partition length by default
+    assert history.snapshot(T0 + 11).empty
+    snapshot = history.snapshot(T0 + 11, lookback=20)
+    assert snapshot["Altitude"].tolist() == [1.0, 2.0]
+
+
+def test_downsampling_and_retention(history):
+    # Four samples a second over the first window
+    for k in range(40):
+        history.append(telemetry({1: float(k), 2: float(k)}), T0 + k / 4)
+    assert len(history.query()) == 80
+
+    # The window ended 20 s ago: one sample per agent and second, the first one
+    history.maintain(T0 + 10 + 20)
+    samples = history.query(agents=[1])
+    assert samples["Time"].tolist() == [T0 + k for k in range(10)]
+    assert history.partitions()["Resolution"].tolist() == [1.0]
+
+    # 50 s ago: one per 5 s
+    history.maintain(T0 + 10 + 50)
+    assert history.query(agents=[1])["Time"].tolist() == [T0, T0 + 5]
+    assert len(history.query()) == 4
+
+    # Past the retention the window is dropped
+    assert history.maintain(T0 + 10 + 100)["dropped"] == 1
+    assert history.partitions().empty
+    assert history.query().empty
+
+
+def test_new_partition_applies_the_policies(history):
+    for k in range(40):
+        history.append(telemetry({1: float(k)}), T0 + k / 4)
+    # Opening a window 100 s later drops the first one
+    history.append(telemetry({1: 0.0}), T0 + 110)
+    assert history.partitions()["Start"].tolist() == [T0 + 110]
+
+
+def test_ticks_are_numbered_per_source(tmp_path):
+    path = str(tmp_path / "history.db")
+    generator = TelemetryHistory(path, source="generator")
+    simulator = TelemetryHistory(path, source="simulator")
+    try:
+        assert generator.append(telemetry({1: 0.0}), T0) == 0
+        assert simulator.append(telemetry({1: 5.0}), T0 + 1) == 0
+        assert generator.append(telemetry({1: 1.0}), T0 + 2) == 1
+        # A producer's own tick is kept
+        assert simulator.append(telemetry({1: 6.0}), T0 + 3, tick=42) == 42
+
+        samples = generator.query()
+        assert not samples.duplicated(["Source", "Tick", "Agent Name"]).any()
+        assert generator.sources() == ["generator", "simulator"]
+        assert generator.query(source="simulator")["Tick"].tolist() == [0, 42]
+
+        # A new process of the same source continues its numbering
+        restarted = TelemetryHistory(path, source="simulator")
+        assert restarted.append(telemetry({1: 7.0}), T0 + 4) == 43
+        restarted.close()
+
+        # Without a source the snapshot combines the latest of every source
+        assert generator.snapshot(T0 + 10)["Altitude"].tolist() == [7.0]
+        assert generator.snapshot(T0 + 10, source="generator")["Altitude"].tolist() == [
+            1.0
+        ]
+    finally:
+        generator.close()
+        simulator.close()
+
+
+def test_unknown_columns_are_rejected(history):
+    with pytest.raises(ValueError):
+        history.append(pd.DataFrame({"Agent Name": [1], "Speed": [1.0]}), T0)
+    with pytest.raises(ValueError):
+        history.query(columns=["Speed"])
+
+
+def test_history_is_off_unless_configured(tmp_path, monkeypatch):
+    monkeypatch.setattr(telemetry_history, "_history", None)
+    assert telemetry_history.get_history() is None
+
+    monkeypatch.setenv(telemetry_history.HISTORY_DB_ENV, str(tmp_path / "env.db"))
+    history = telemetry_history.get_history()
+    assert history is not None
+    assert history.manager.path == str(tmp_path / "env.db")
+    history.close()
+
+
+def test_extend_stores_several_snapshots(history):
+    ticks = history.extend([(telemetry({1: float(k)}), T0 + k, None) for k in range(3)])
+    assert ticks == [0, 1, 2]
+    np.testing.assert_array_equal(history.query()["Altitude"], [0.0, 1.0, 2.0])
+
+
+def test_ticks_continue_after_reopening(tmp_path):
+    path = str(tmp_path / "history.db")
+    history = TelemetryHistory(path)
+    assert history.append(telemetry({1: 0.0}), T0) == 0
+    assert history.append(telemetry({1: 1.0}), T0 + 1) == 1
+    history.close()
+
+    reopened = TelemetryHistory(path)
+    assert reopened.append(telemetry({1: 2.0}), T0 + 2) == 2
+    assert reopened.append(telemetry({1: 3.0}), T0 + 3, tick=42) == 42
+    reopened.close()
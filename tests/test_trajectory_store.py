@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from utils.trajectory_store import TrajectoryStore
+
+
+def sample(step, swarm_size=3):
+    # Every coordinate encodes its step, so the samples identify themselves
+    return np.full((swarm_size, 2), float(step))
+
+
+def test_unbounded_keeps_every_sample_in_order():
+    store = TrajectoryStore(3)
+    for step in range(200):
+        assert store.append(sample(step))
+
+    assert len(store) == 200
+    np.testing.assert_array_equal(store.steps(), np.arange(200))
+    np.testing.assert_array_equal(store.view()[:, 0, 0], np.arange(200))
+
+
+def test_ring_keeps_the_latest_window_in_order():
+    store = TrajectoryStore(3, capacity=5)
+    for step in range(13):
+        store.append(sample(step))
+        expected = np.arange(max(0, step - 4), step + 1)
+        np.testing.assert_array_equal(store.steps(), expected)
+        np.testing.assert_array_equal(store.view()[:, 0, 0], expected)
+        np.testing.assert_array_equal(store.latest(), sample(step))
+    assert store.total == 13
+
+
+def test_decimation_keeps_the_whole_run_evenly_spaced():
+    store = TrajectoryStore(3, capacity=4, decimate=True)
+    for step in range(9):
+        store.append(sample(step))
+
+    # Full at 4, thinned to every 2nd sample, full again at 8, thinned to every 4th
+    np.testing.assert_array_equal(store.steps(), [0, 4, 8])
+    np.testing.assert_array_equal(store.view()[:, 0, 0], [0, 4, 8])
+    assert store.stride == 4
+
+    for step in range(9, 1000):
+        store.append(sample(step))
+        steps = store.steps()
+        assert len(steps) <= 4
+        assert steps[0] == 0
+        assert np.all(np.diff(steps) == store.stride)
+        np.testing.assert_array_equal(store.view()[:, 0, 0], steps)
+
+
+def test_views_are_read_only():
+    store = TrajectoryStore(3, capacity=4)
+    store.append(sample(0))
+    with pytest.raises(ValueError):
+        store.view()[0, 0, 0] = 1.0
+
+
+@pytest.mark.parametrize("capacity, decimate", [(None, False), (6, False), (6, True)])
+def test_load_matches_appending(capacity, decimate):
+    appended = TrajectoryStore(3, capacity=capacity, decimate=decimate)
+    for step in range(40):
+        appended.append(sample(step))
+
+    loaded = TrajectoryStore(3, capacity=capacity, decimate=decimate)
+    loaded.load(appended.view(), appended.steps(), appended.total, appended.stride)
+    for step in range(40, 60):
+        appended.append(sample(step))
+        loaded.append(sample(step))
+
+    np.testing.assert_array_equal(loaded.steps(), appended.steps())
+    np.testing.assert_array_equal(loaded.view(), appended.view())
+
+
+def test_invalid_configurations():
+    with pytest.raises(ValueError):
+        TrajectoryStore(3, capacity=1)
+    with pytest.raises(ValueError):
+        TrajectoryStore(3, decimate=True)
+    with pytest.raises(IndexError):
+        TrajectoryStore(3).latest()